@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(RAIZ, "rifa-app.py")
+# ----------------------------
+# BENCHMARK DE ARRANQUE EN FRÍO Y REEJECUCIONES DE LA APP
+# ----------------------------
+# Cada arranque corre en un intérprete nuevo (como un worker o contenedor recién creado) y
+# ejecuta la página con el AppTest de Streamlit, sin navegador ni servidor.
+MODULOS_PESADOS = ("pandas", "numpy", "pyarrow", "requests", "urllib3", "smtplib", "email.mime.multipart")
+def medir_en_proceso(pagina, reejecuciones):
+    """Se ejecuta en el intérprete hijo: importación, primera ejecución y reejecuciones de la página"""
+    inicio = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    importacion = time.perf_counter() - inicio
+    app = AppTest.from_file(APP, default_timeout=60)
+    app.query_params["page"] = pagina
+    inicio = time.perf_counter()
+    app.run()
+    primera = time.perf_counter() - inicio
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    tiempos = []
+    for _ in range(reejecuciones):
+        inicio = time.perf_counter()
+        app.run()
+        tiempos.append(time.perf_counter() - inicio)
+    return {
+        "importar_streamlit_ms": importacion * 1000,
+        "primera_ejecucion_ms": primera * 1000,
+        "reejecucion_ms": statistics.median(tiempos) * 1000 if tiempos else 0.0,
+        "modulos_pesados": [m for m in MODULOS_PESADOS if m in sys.modules],
+    }
+def entorno_aislado(carpeta):
+    """Variables de entorno para que el benchmark no toque los datos reales"""
+    return {
+        **os.environ,
+        "RUTA_BD": os.path.join(carpeta, "rifa.db"),
+        "RUTA_COLA": os.path.join(carpeta, "cola.db"),
+        "RUTA_RESULTADOS": os.path.join(carpeta, "rifa.db"),
+        "CARPETA_BACKUPS": os.path.join(carpeta, "backups"),
+        "CARPETA_EXPORTACIONES": os.path.join(carpeta, "exportaciones"),
+        "RUTA_PREMIOS": os.path.join(carpeta, "premios.json"),
+        "RUTA_MENSAJES": os.path.join(carpeta, "mensajes.json"),
+        "RIFAS_ARCHIVO": os.path.join(carpeta, "rifas.json"),
+        "BACKUP_INTERVALO_MIN": "0",
+    }
+def medir_arranques(pagina="registro", arranques=5, reejecuciones=20):
+    """Lanza 'arranques' intérpretes nuevos y devuelve las medianas de cada medición"""
+    muestras = []
+    with tempfile.TemporaryDirectory() as carpeta:
+        for _ in range(arranques):
+            inicio = time.perf_counter()
+            salida = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--hijo", "--pagina", pagina,
+                 "--reejecuciones", str(reejecuciones)],
+                cwd=carpeta, env=entorno_aislado(carpeta), capture_output=True, text=True, check=True
+            )
+            muestra = json.loads(salida.stdout.strip().splitlines()[-1])
+            muestra["arranque_total_ms"] = (time.perf_counter() - inicio) * 1000
+            muestras.append(muestra)
+    return {
+        "pagina": pagina,
+        "arranques": arranques,
+        "reejecuciones": reejecuciones,
+        **{
+            clave: round(statistics.median(m[clave] for m in muestras), 1)
+            for clave in ("arranque_total_ms", "importar_streamlit_ms", "primera_ejecucion_ms", "reejecucion_ms")
+        },
+        "modulos_pesados": muestras[-1]["modulos_pesados"],
+    }
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mide el arranque en frío y el costo por reejecución de una página")
+    parser.add_argument("--pagina", default="registro")
+    parser.add_argument("--arranques", type=int, default=5, help="Intérpretes nuevos a lanzar")
+    parser.add_argument("--reejecuciones", type=int, default=20, help="Reejecuciones medidas por arranque")
+    parser.add_argument("--hijo", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.hijo:
+        sys.path.insert(0, RAIZ)
+        print(json.dumps(medir_en_proceso(args.pagina, args.reejecuciones)))
+        sys.exit(0)
+    resultado = medir_arranques(args.pagina, args.arranques, args.reejecuciones)
+    print(f"Página: {resultado['pagina']} ({resultado['arranques']} arranques, {resultado['reejecuciones']} reejecuciones c/u)")
+    print(f"Arranque en frío total:      {resultado['arranque_total_ms']:8.1f} ms")
+    print(f"  importar Streamlit:        {resultado['importar_streamlit_ms']:8.1f} ms")
+    print(f"  primera ejecución:         {resultado['primera_ejecucion_ms']:8.1f} ms")
+    print(f"Reejecución (mediana):       {resultado['reejecucion_ms']:8.1f} ms")
+    print(f"Módulos pesados cargados:    {', '.join(resultado['modulos_pesados']) or 'ninguno'}")
@@ -0,0 +1,63 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import timeit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rifa.almacen import AlmacenParticipantes
+# ----------------------------
+# BENCHMARK DEL LISTADO PAGINADO Y LA BÚSQUEDA DE PARTICIPANTES
+# ----------------------------
+NOMBRES = ["José", "Ana", "María", "Juan", "Lucía", "Martín", "Sofía", "Diego"]
+APELLIDOS = ["Pérez", "Gómez", "López", "Fernández", "Martínez", "Díaz"]
+CIUDADES = ["Rosario", "Córdoba", "Mendoza", "La Plata", "Salta"]
+def participantes_sinteticos(cantidad, semilla=42):
+    azar = random.Random(semilla)
+    return [
+        {
+            "boleto": f"{b:05d}",
+            "nombre": f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)}",
+            "email": f"participante{b}@correo.com",
+            "ciudad": azar.choice(CIUDADES),
+            "fecha_registro": f"2026-01-{1 + b % 28:02d}T{b % 24:02d}:{b % 60:02d}:00",
+            "estado_pago": "pagado" if azar.random() < 0.6 else "pendiente"
+        }
+        for b in azar.sample(range(100000), cantidad)
+    ]
+def filtrado_lineal(participantes, texto, estado):
+    """Forma anterior: recorrer a todos en memoria buscando la subcadena"""
+    return [
+        p for p in participantes
+        if (texto.lower() in p["nombre"].lower() or texto in p["boleto"]) and p["estado_pago"] == estado
+    ]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mide una página del listado de participantes con y sin búsqueda")
+    parser.add_argument("--participantes", type=int, default=100000)
+    parser.add_argument("--repeticiones", type=int, default=50)
+    args = parser.parse_args()
+    participantes = participantes_sinteticos(args.participantes)
+    with tempfile.TemporaryDirectory() as carpeta:
+        almacen = AlmacenParticipantes(os.path.join(carpeta, "bench.db"))
+        almacen.insertar_muchos(participantes)
+        inicio = time.perf_counter()
+        almacen.buscar("indexar")
+        indexado = time.perf_counter() - inicio
+        casos = [
+            ("sin filtro", "", None),
+            ("por estado", "", "pagado"),
+            ("página 100 por estado", "", "pagado"),
+            ("texto común", "maría", "pagado"),
+            ("texto raro", "participante4242", None),
+            ("boleto", "123", None),
+        ]
+        print(f"Participantes: {args.participantes:,} (búsqueda indexada: {almacen.busqueda_indexada})")
+        print(f"Indexado inicial del texto: {indexado * 1000:.0f} ms")
+        for nombre, texto, estado in casos:
+            offset = 2500 if nombre.startswith("página") else 0
+            tiempo = timeit.timeit(lambda: almacen.buscar(texto, estado, offset, 25), number=args.repeticiones)
+            total, _ = almacen.buscar(texto, estado, offset, 25)
+            print(f"{nombre:<24} {tiempo / args.repeticiones * 1000:8.2f} ms  ({total:,} coincidencias)")
+        lineal = timeit.timeit(lambda: filtrado_lineal(participantes, "maría", "pagado"), number=5) / 5
+        print(f"{'filtrado lineal anterior':<24} {lineal * 1000:8.2f} ms  (sin contar los widgets por fila)")
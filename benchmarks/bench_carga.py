@@ -0,0 +1,194 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from bench_arranque import APP, entorno_aislado
+from bench_operaciones import rss_pico_mb
+# ----------------------------
+# PRUEBA DE CARGA: ESPECTADORES CON AUTORREFRESCO Y REGISTROS CONCURRENTES
+# ----------------------------
+# Simula la media hora previa al sorteo en un único proceso "servidor": cada espectador y cada registro
+# es una sesión propia del AppTest de Streamlit, y todas comparten los recursos de st.cache_resource
+# (registro de rifas, almacén, caché) como en una instancia real. Mercado Pago se reemplaza por rifa.stub_mp.
+# El CPU informado es el del proceso completo, por lo que incluye el (pequeño) costo del generador de carga.
+ETIQUETAS_FORMULARIO = {
+    "nombre": "Nombre completo *",
+    "boleto": "Número de boleto *",
+    "email": "Correo electrónico *",
+    "telefono": "Teléfono con código de país *",
+}
+BOTON_REGISTRO = "✅ Registrarme y Participar"
+def percentiles(valores):
+    """p50/p95/p99 y máximo en milisegundos"""
+    if not valores:
+        return {"cantidad": 0}
+    ordenados = sorted(valores)
+    def p(q):
+        return round(ordenados[min(len(ordenados) - 1, round(q / 100 * (len(ordenados) - 1)))] * 1000, 1)
+    return {
+        "cantidad": len(ordenados),
+        "p50_ms": round(statistics.median(ordenados) * 1000, 1),
+        "p95_ms": p(95),
+        "p99_ms": p(99),
+        "max_ms": round(ordenados[-1] * 1000, 1),
+    }
+class Medicion:
+    """Resultados compartidos por los hilos de la prueba"""
+    def __init__(self):
+        self.reejecuciones = []
+        self.registros = []
+        self.resultados = Counter()
+        self.boletos_confirmados = Counter()
+        self.errores = []
+        self._lock = threading.Lock()
+    def reejecucion(self, segundos):
+        with self._lock:
+            self.reejecuciones.append(segundos)
+    def registro(self, segundos, resultado, boleto=None):
+        with self._lock:
+            self.registros.append(segundos)
+            self.resultados[resultado] += 1
+            if resultado == "ok":
+                self.boletos_confirmados[boleto] += 1
+    def error(self, detalle):
+        with self._lock:
+            self.resultados["error"] += 1
+            if len(self.errores) < 20:
+                self.errores.append(detalle)
+def nueva_sesion(pagina="registro"):
+    from streamlit.testing.v1 import AppTest
+    app = AppTest.from_file(APP, default_timeout=60)
+    app.query_params["page"] = pagina
+    return app
+def espectador(medicion, fin, refresco):
+    """Sesión que solo mira la página de registro y se reejecuta cada 'refresco' segundos"""
+    try:
+        app = nueva_sesion()
+        app.run()
+        while time.monotonic() < fin:
+            inicio = time.perf_counter()
+            app.run()
+            medicion.reejecucion(time.perf_counter() - inicio)
+            time.sleep(max(refresco - (time.perf_counter() - inicio), 0))
+    except Exception as e:
+        medicion.error(f"espectador: {e}")
+def registrar(medicion, boleto, numero):
+    """Una persona abre la página, completa el formulario y lo envía; se mide solo el envío"""
+    try:
+        app = nueva_sesion()
+        app.run()
+        valores = {
+            "nombre": f"Carga {numero}",
+            "boleto": boleto,
+            "email": f"carga{numero}@ejemplo.com",
+            "telefono": f"+54911{numero:08d}",
+        }
+        for campo, etiqueta in ETIQUETAS_FORMULARIO.items():
+            next(t for t in app.text_input if t.label == etiqueta).input(valores[campo])
+        next(b for b in app.button if b.label == BOTON_REGISTRO).click()
+        inicio = time.perf_counter()
+        app.run()
+        segundos = time.perf_counter() - inicio
+        if app.exception:
+            medicion.error(f"registro {boleto}: {app.exception[0].message}")
+        elif "form_submitted" in app.session_state and app.session_state["form_submitted"]:
+            medicion.registro(segundos, "ok", boleto)
+        elif any("ya está tomado" in e.value for e in app.error):
+            medicion.registro(segundos, "boleto_tomado")
+        else:
+            medicion.registro(segundos, "rechazado")
+    except Exception as e:
+        medicion.error(f"registro {boleto}: {e}")
+def ejecutar_carga(espectadores, registros_por_seg, duracion, refresco, rango_boletos, hilos_registro, semilla=42):
+    """Lanza los espectadores y los registros a ritmo constante; devuelve el informe"""
+    from rifa.almacen import AlmacenParticipantes
+    medicion = Medicion()
+    azar = random.Random(semilla)
+    # Una primera ejecución carga módulos y recursos compartidos, como el primer visitante
+    nueva_sesion().run()
+    cpu_inicio, pared_inicio = time.process_time(), time.perf_counter()
+    fin = time.monotonic() + duracion
+    hilos = [
+        threading.Thread(target=espectador, args=(medicion, fin, refresco), name=f"espectador-{i}", daemon=True)
+        for i in range(espectadores)
+    ]
+    for hilo in hilos:
+        hilo.start()
+    with ThreadPoolExecutor(max_workers=hilos_registro, thread_name_prefix="registro") as ejecutor:
+        numero = 0
+        siguiente = time.monotonic()
+        while registros_por_seg > 0 and time.monotonic() < fin:
+            ejecutor.submit(registrar, medicion, f"{azar.randrange(rango_boletos):05d}", numero)
+            numero += 1
+            siguiente += 1 / registros_por_seg
+            time.sleep(max(siguiente - time.monotonic(), 0))
+    for hilo in hilos:
+        hilo.join()
+    pared = time.perf_counter() - pared_inicio
+    cpu = time.process_time() - cpu_inicio
+    guardados = AlmacenParticipantes(os.environ["RUTA_BD"]).contar()
+    confirmados = medicion.boletos_confirmados
+    return {
+        "espectadores": espectadores,
+        "registros_por_seg": registros_por_seg,
+        "duracion_seg": round(pared, 1),
+        "refresco_seg": refresco,
+        "reejecucion": percentiles(medicion.reejecuciones),
+        "reejecuciones_por_seg": round(len(medicion.reejecuciones) / pared, 1),
+        "registro": percentiles(medicion.registros),
+        "resultados_registro": dict(medicion.resultados),
+        # Un boleto confirmado a dos personas, o más confirmaciones que filas guardadas, es un incidente
+        "boletos_duplicados": sum(n - 1 for n in confirmados.values() if n > 1),
+        "confirmados_sin_fila": max(sum(confirmados.values()) - guardados, 0),
+        "cpu_proceso_pct": round(cpu / pared * 100, 1),
+        "cpu_nucleos": os.cpu_count(),
+        "rss_pico_mb": rss_pico_mb(),
+        "errores": medicion.errores,
+    }
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simula espectadores con autorrefresco y registros concurrentes")
+    parser.add_argument("--espectadores", type=int, default=100, help="Sesiones mirando ?page=registro")
+    parser.add_argument("--registros", type=float, default=2.0, help="Registros enviados por segundo")
+    parser.add_argument("--duracion", type=float, default=60.0, help="Segundos de carga")
+    parser.add_argument("--refresco", type=float, default=1.0, help="Segundos entre reejecuciones de cada espectador")
+    parser.add_argument("--boletos", type=int, default=100000, help="Rango de boletos elegidos (menor = más choques)")
+    parser.add_argument("--hilos-registro", type=int, default=16, help="Registros en curso a la vez como máximo")
+    parser.add_argument("--latencia-mp", type=float, default=0.2, help="Latencia simulada de Mercado Pago (s)")
+    parser.add_argument("--salida", help="Guardar el informe en este archivo JSON")
+    args = parser.parse_args()
+    from rifa.stub_mp import iniciar_servidor
+    servidor, estado_mp, url_mp = iniciar_servidor(latencia=args.latencia_mp)
+    with tempfile.TemporaryDirectory() as carpeta:
+        # Antes de la primera ejecución: la app lee la configuración una sola vez por proceso
+        os.environ.update(entorno_aislado(carpeta))
+        os.environ.update({"MP_API_URL": url_mp, "MP_ACCESS_TOKEN": "TEST-carga", "MP_ENLACE_DIFERIDO": "0"})
+        os.chdir(carpeta)
+        informe = ejecutar_carga(
+            args.espectadores, args.registros, args.duracion, args.refresco, args.boletos, args.hilos_registro
+        )
+    informe["solicitudes_mp"] = estado_mp.solicitudes
+    servidor.shutdown()
+    r, g = informe["reejecucion"], informe["registro"]
+    print(f"{informe['espectadores']} espectadores (refresco {informe['refresco_seg']} s), "
+          f"{informe['registros_por_seg']} registros/s durante {informe['duracion_seg']} s")
+    if r["cantidad"]:
+        print(f"Reejecución: p50 {r['p50_ms']} ms  p95 {r['p95_ms']} ms  p99 {r['p99_ms']} ms  "
+              f"({informe['reejecuciones_por_seg']}/s)")
+    if g["cantidad"]:
+        print(f"Registro:    p50 {g['p50_ms']} ms  p95 {g['p95_ms']} ms  p99 {g['p99_ms']} ms")
+    print(f"Resultados de registro: {informe['resultados_registro']}")
+    print(f"Incidentes de boleto duplicado: {informe['boletos_duplicados']} "
+          f"(confirmados sin fila: {informe['confirmados_sin_fila']})")
+    print(f"CPU del proceso: {informe['cpu_proceso_pct']}% de un núcleo ({informe['cpu_nucleos']} disponibles), "
+          f"pico RSS {informe['rss_pico_mb']} MB, {informe['solicitudes_mp']} solicitudes a Mercado Pago")
+    for error in informe["errores"]:
+        print(f"  ⚠️ {error}")
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(informe, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,294 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+from rifa import operaciones
+from rifa.almacen import AlmacenParticipantes
+from rifa.cache import CacheParticipantes
+from rifa.config import cargar_configuracion
+from rifa.rifas import ContextoRifa
+from rifa.sorteo import DIGITOS_POR_PUESTO, IndiceSorteo, crear_premio, reglas_desde_premios
+# ----------------------------
+# SUITE DE BENCHMARKS DE PARTICIPANTES, SORTEO, EXPORTACIONES Y RESPALDOS
+# ----------------------------
+# Cada tamaño corre en un intérprete nuevo, así el pico de RSS informado es el de ese tamaño.
+# Los resultados se guardan en JSON y --comparar los contrasta con una corrida anterior.
+TAMANOS = (1000, 10000, 100000)
+CARPETA_RESULTADOS = os.path.join(RAIZ, "benchmarks", "resultados")
+NOMBRES = ["José", "Ana", "María", "Juan", "Lucía", "Martín", "Sofía", "Diego"]
+APELLIDOS = ["Pérez", "Gómez", "López", "Fernández", "Martínez", "Díaz"]
+CIUDADES = ["Rosario", "Córdoba", "Mendoza", "La Plata", "Salta"]
+PREMIOS = ["1.º premio", "2.º premio", "3.º premio", "4.º premio"]
+# Una regla por cada cantidad de cifras que admite el índice
+PREMIOS_CON_REGLAS = [crear_premio(premio, digitos) for premio, digitos in zip(PREMIOS, DIGITOS_POR_PUESTO)]
+def participantes_sinteticos(cantidad, semilla=42):
+    azar = random.Random(semilla)
+    inicio = datetime(2026, 1, 1)
+    participantes = []
+    for b in azar.sample(range(100000), cantidad):
+        pagado = azar.random() < 0.7
+        registro = inicio + timedelta(minutes=azar.randrange(60 * 24 * 90))
+        participantes.append({
+            "nombre": f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)}",
+            "boleto": f"{b:05d}",
+            "email": f"participante{b}@correo.com",
+            "telefono": f"+54911{b:08d}",
+            "direccion": f"Calle {b % 500}",
+            "ciudad": azar.choice(CIUDADES),
+            "localidad": "Centro",
+            "fecha_registro": registro.isoformat(),
+            "estado_pago": "pagado" if pagado else "pendiente",
+            "fecha_pago": (registro + timedelta(hours=2)).isoformat() if pagado else "",
+            "id_pago": f"{b:05d}",
+            "link_pago": "https://mpago.la/ejemplo"
+        })
+    return participantes
+def sorteos_sinteticos(participantes, cantidad=365, semilla=7):
+    """Historial de un año de sorteos con algunos ganadores cada uno"""
+    azar = random.Random(semilla)
+    pagados = [p for p in participantes if p["estado_pago"] == "pagado"]
+    return [
+        {
+            "fecha": (datetime(2025, 1, 1) + timedelta(days=d)).date().isoformat(),
+            "numero_oficial": f"{azar.randrange(100000):05d}",
+            "premio": PREMIOS[0],
+            "ganadores": [{**g, "premio": azar.choice(PREMIOS)} for g in azar.sample(pagados, min(3, len(pagados)))]
+        }
+        for d in range(cantidad)
+    ]
+def escribir_carpeta_legado(carpeta, participantes):
+    """Formato anterior a SQLite: un archivo Nombre_Boleto.json por participante"""
+    os.makedirs(carpeta, exist_ok=True)
+    for p in participantes:
+        with open(os.path.join(carpeta, f"{p['nombre'].replace(' ', '_')}_{p['boleto']}.json"), "w", encoding="utf-8") as f:
+            json.dump(p, f, ensure_ascii=False)
+def escribir_csv(ruta, participantes):
+    import csv
+    with open(ruta, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["nombre", "boleto", "email", "telefono", "direccion", "ciudad", "localidad"])
+        for p in participantes:
+            writer.writerow([p["nombre"], p["boleto"], p["email"], p["telefono"], p["direccion"], p["ciudad"], p["localidad"]])
+def series_estadisticas(estadisticas, pd):
+    """Mismas series que arma mostrar_estadisticas_avanzadas para sus gráficos"""
+    por_dia = pd.Series({dia: n for dia, n in estadisticas["dia"].items() if dia})
+    por_dia.index = pd.to_datetime(por_dia.index, errors='coerce')
+    por_dia = por_dia[por_dia.index.notna()].sort_index().resample('D').sum()
+    por_estado = pd.Series(estadisticas["estado"]).sort_values(ascending=False)
+    ciudades = pd.Series({c: n for c, n in estadisticas["ciudad"].items() if c}, dtype=int)
+    return por_dia, por_estado, ciudades.sort_values(ascending=False).head(10)
+# --- Medición ---
+def rss_pico_mb():
+    """Pico de memoria residente del proceso (ru_maxrss está en KB en Linux y en bytes en macOS)"""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+def percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, round(p / 100 * (len(ordenados) - 1)))]
+def medir(caso, funcion, repeticiones, elementos=1, preparar=None):
+    """Latencias p50/p99 de 'funcion' (preparar corre antes de cada repetición, sin medirse)"""
+    tiempos = []
+    for i in range(repeticiones):
+        argumento = preparar(i) if preparar else None
+        inicio = time.perf_counter()
+        funcion(argumento) if preparar else funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    tiempos.sort()
+    mediana = statistics.median(tiempos)
+    return {
+        "caso": caso,
+        "repeticiones": repeticiones,
+        "p50_ms": round(mediana * 1000, 3),
+        "p99_ms": round(percentil(tiempos, 99) * 1000, 3),
+        "elementos_por_seg": round(elementos / mediana) if mediana else None,
+        "rss_pico_mb": rss_pico_mb(),
+    }
+def medir_tamano(cantidad, repeticiones):
+    """Corre todos los casos para una rifa sintética de 'cantidad' participantes"""
+    participantes = participantes_sinteticos(cantidad)
+    azar = random.Random(99)
+    casos = []
+    with tempfile.TemporaryDirectory() as carpeta:
+        config = {
+            **cargar_configuracion(),
+            "RIFA_ID": "bench",
+            "COLA_ESPACIO": "bench",
+            "RUTA_BD": os.path.join(carpeta, "rifa.db"),
+            "RUTA_COLA": os.path.join(carpeta, "cola.db"),
+            "CARPETA_BACKUPS": os.path.join(carpeta, "backups"),
+            "CARPETA_EXPORTACIONES": os.path.join(carpeta, "exportaciones"),
+            "RUTA_PREMIOS": os.path.join(carpeta, "premios.json"),
+            "RUTA_MENSAJES": os.path.join(carpeta, "mensajes.json"),
+            "BACKUP_INTERVALO_MIN": 0,
+        }
+        rifa = ContextoRifa("bench", config)
+        legado = os.path.join(carpeta, "participantes")
+        escribir_carpeta_legado(legado, participantes)
+        casos.append(medir(
+            "migrar_participantes_json", lambda ruta: AlmacenParticipantes(ruta, carpeta_legado=legado),
+            min(repeticiones, 3), cantidad, preparar=lambda i: os.path.join(carpeta, f"migracion_{i}.db")
+        ))
+        shutil.rmtree(legado)
+        almacen = rifa.almacen()
+        casos.append(medir("insertar_participantes", lambda: almacen.insertar_muchos(participantes), 1, cantidad))
+        rifa.historial().reemplazar(sorteos_sinteticos(participantes))
+        operaciones.guardar_premios(rifa, PREMIOS_CON_REGLAS)
+        casos.append(medir(
+            "cargar_todos_participantes", lambda: CacheParticipantes(almacen).todos(), repeticiones, cantidad
+        ))
+        cache = rifa.cache()
+        cache.todos()
+        boletos = [f"{azar.randrange(100000):05d}" for _ in range(2000)]
+        casos.append(medir(
+            "verificar_boleto_duplicado", cache.boleto_ocupado, len(boletos), preparar=lambda i: boletos[i]
+        ))
+        casos.append(medir(
+            "reservar_boleto", almacen.reservar, min(len(boletos), 500), preparar=lambda i: boletos[i]
+        ))
+        limpiar_exportaciones = lambda i: shutil.rmtree(config["CARPETA_EXPORTACIONES"], ignore_errors=True)
+        casos.append(medir(
+            "exportar_participantes_csv", lambda _: operaciones.exportar_participantes_csv(rifa),
+            repeticiones, cantidad, preparar=limpiar_exportaciones
+        ))
+        casos.append(medir(
+            "exportar_resultados_csv", lambda _: operaciones.exportar_resultados_csv(rifa),
+            repeticiones, rifa.historial().contar(), preparar=limpiar_exportaciones
+        ))
+        casos.append(medir(
+            "exportar_json", lambda _: operaciones.exportar_json(rifa),
+            repeticiones, cantidad, preparar=limpiar_exportaciones
+        ))
+        try:
+            import pandas as pd
+        except ImportError:
+            pd = None
+        if pd is not None:
+            casos.append(medir(
+                "estadisticas_avanzadas", lambda: series_estadisticas(almacen.estadisticas(), pd), repeticiones
+            ))
+            ruta_csv = os.path.join(carpeta, "importar.csv")
+            escribir_csv(ruta_csv, participantes)
+            def importar(destino):
+                from rifa.importacion import importar_csv
+                with open(ruta_csv, "rb") as f:
+                    importar_csv(f, AlmacenParticipantes(destino), config["ENLACE_PAGO_FALLBACK"])
+            casos.append(medir(
+                "importar_csv", importar, min(repeticiones, 3), cantidad,
+                preparar=lambda i: os.path.join(carpeta, f"importacion_{i}.db")
+            ))
+        else:
+            casos.append(medir("estadisticas_avanzadas", almacen.estadisticas, repeticiones))
+            casos[-1]["nota"] = "sin pandas: solo la lectura de agregados"
+        casos.append(medir(
+            "respaldo_instantanea", lambda: operaciones.crear_respaldo(rifa, forzar_instantanea=True),
+            min(repeticiones, 5), cantidad
+        ))
+        cambios = max(cantidad // 100, 1)
+        def modificar(i):
+            almacen.actualizar_muchos({
+                p["boleto"]: {"ciudad": f"Ciudad {i}"} for p in azar.sample(participantes, cambios)
+            })
+        casos.append(medir(
+            "respaldo_delta", lambda _: operaciones.crear_respaldo(rifa), repeticiones, cambios, preparar=modificar
+        ))
+        ultimo = rifa.respaldos().listar()[-1]["archivo"]
+        casos.append(medir(
+            "restaurar_respaldo", lambda: operaciones.restaurar_respaldo(rifa, ultimo), min(repeticiones, 5), cantidad
+        ))
+        casos.append(medir(
+            "indice_sorteo", lambda: IndiceSorteo(almacen.listar(estado_pago="pagado")), repeticiones, cantidad
+        ))
+        indice = IndiceSorteo(almacen.listar(estado_pago="pagado"))
+        reglas = reglas_desde_premios(PREMIOS_CON_REGLAS)
+        numeros = [f"{azar.randrange(100000):05d}" for _ in range(2000)]
+        casos.append(medir(
+            "evaluar_ganadores", lambda numero: indice.evaluar(numero, reglas), len(numeros),
+            preparar=lambda i: numeros[i]
+        ))
+        rifa.cerrar()
+    return {"participantes": cantidad, "rss_pico_mb": rss_pico_mb(), "casos": casos}
+# --- Corrida completa, guardado y comparación ---
+def version_codigo():
+    try:
+        salida = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True
+        )
+        return salida.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocida"
+def ejecutar_suite(tamanos, repeticiones):
+    resultados = []
+    for cantidad in tamanos:
+        salida = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--hijo", "--tamanos", str(cantidad),
+             "--repeticiones", str(repeticiones)],
+            capture_output=True, text=True, check=True
+        )
+        resultados.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+    return {
+        "version": version_codigo(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "repeticiones": repeticiones,
+        "tamanos": resultados,
+    }
+def comparar(actual, anterior, umbral=0.1):
+    """Cambio de p50 por caso respecto de otra corrida; marca las regresiones mayores al umbral"""
+    previos = {
+        (t["participantes"], c["caso"]): c for t in anterior["tamanos"] for c in t["casos"]
+    }
+    filas = []
+    for tamano in actual["tamanos"]:
+        for caso in tamano["casos"]:
+            previo = previos.get((tamano["participantes"], caso["caso"]))
+            if previo and previo["p50_ms"]:
+                cambio = caso["p50_ms"] / previo["p50_ms"] - 1
+                filas.append((tamano["participantes"], caso["caso"], previo["p50_ms"], caso["p50_ms"], cambio, cambio > umbral))
+    return filas
+def imprimir(resultado):
+    for tamano in resultado["tamanos"]:
+        print(f"\n{tamano['participantes']:,} participantes (pico RSS {tamano['rss_pico_mb']} MB)")
+        for c in tamano["casos"]:
+            ritmo = f"{c['elementos_por_seg']:>12,}/s" if c["elementos_por_seg"] else ""
+            print(f"  {c['caso']:<28} p50 {c['p50_ms']:>10.3f} ms  p99 {c['p99_ms']:>10.3f} ms  {ritmo}")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks de las operaciones principales con rifas sintéticas")
+    parser.add_argument("--tamanos", default=",".join(map(str, TAMANOS)), help="Participantes por rifa, separados por comas")
+    parser.add_argument("--repeticiones", type=int, default=10, help="Repeticiones por caso (las consultas puntuales usan más)")
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto en benchmarks/resultados/)")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior para detectar regresiones")
+    parser.add_argument("--umbral", type=float, default=0.1, help="Aumento relativo de p50 considerado regresión")
+    parser.add_argument("--hijo", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    tamanos = [int(t) for t in args.tamanos.split(",") if t]
+    if args.hijo:
+        print(json.dumps(medir_tamano(tamanos[0], args.repeticiones)))
+        sys.exit(0)
+    resultado = ejecutar_suite(tamanos, args.repeticiones)
+    imprimir(resultado)
+    salida = args.salida or os.path.join(
+        CARPETA_RESULTADOS, f"operaciones_{datetime.now():%Y%m%d_%H%M%S}_{resultado['version']}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {salida}")
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            filas = comparar(resultado, json.load(f), args.umbral)
+        print(f"\nComparación con {args.comparar}:")
+        for cantidad, caso, antes, despues, cambio, regresion in filas:
+            print(f"  {cantidad:>7,} {caso:<28} {antes:>10.3f} -> {despues:>10.3f} ms  {cambio:+7.1%}{'  ⚠️ regresión' if regresion else ''}")
+        if any(f[-1] for f in filas):
+            sys.exit(1)
@@ -0,0 +1,45 @@
+import argparse
+import os
+import random
+import sys
+import time
+import timeit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rifa.sorteo import DIGITOS_POR_PUESTO, IndiceSorteo, crear_premio, reglas_desde_premios
+# ----------------------------
+# BENCHMARK DEL MOTOR DE SORTEO
+# ----------------------------
+def participantes_sinteticos(cantidad, proporcion_pagos=0.8, semilla=42):
+    azar = random.Random(semilla)
+    boletos = azar.sample(range(100000), cantidad)
+    return [
+        {
+            "boleto": f"{b:05d}",
+            "nombre": f"Participante {b}",
+            "estado_pago": "pagado" if azar.random() < proporcion_pagos else "pendiente"
+        }
+        for b in boletos
+    ]
+def filtrado_lineal(participantes, numero):
+    """Forma anterior: recorrer a todos buscando el número exacto"""
+    return [p for p in participantes if p.get("boleto") == numero and p.get("estado_pago") == "pagado"]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mide la construcción del índice y la evaluación de un sorteo")
+    parser.add_argument("--boletos", type=int, default=100000)
+    parser.add_argument("--repeticiones", type=int, default=1000)
+    args = parser.parse_args()
+    participantes = participantes_sinteticos(args.boletos)
+    reglas = reglas_desde_premios(
+        [crear_premio(f"{puesto}.º premio", digitos) for puesto, digitos in enumerate(DIGITOS_POR_PUESTO, start=1)]
+    )
+    inicio = time.perf_counter()
+    indice = IndiceSorteo(participantes)
+    construccion = time.perf_counter() - inicio
+    numeros = [f"{n:05d}" for n in random.Random(7).sample(range(100000), args.repeticiones)]
+    it = iter(numeros * 2)
+    evaluacion = timeit.timeit(lambda: indice.evaluar(next(it), reglas), number=args.repeticiones) / args.repeticiones
+    lineal = timeit.timeit(lambda: filtrado_lineal(participantes, numeros[0]), number=5) / 5
+    print(f"Boletos: {args.boletos:,} ({indice.total_pagados:,} pagos), reglas: {len(reglas)}")
+    print(f"Construcción del índice: {construccion * 1000:.1f} ms")
+    print(f"Evaluación de un sorteo: {evaluacion * 1e6:.1f} µs")
+    print(f"Filtrado lineal anterior (solo número exacto): {lineal * 1000:.2f} ms")
@@ -1,20 +1,16 @@
 import streamlit as st
 import json
-import csv
-import smtplib
 import re
 import os
-import requests
-from bs4 import BeautifulSoup
-from datetime import datetime, timedelta, date
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from twilio.rest import Client
-from io import StringIO
-from streamlit_autorefresh import st_autorefresh
+from datetime import datetime, timedelta
+import streamlit.components.v1 as components
 import logging
-import pandas as pd
-import time
+from rifa.config import configuracion
+from rifa import metricas, operaciones
+from rifa.rifas import RifaCerrada, crear_registro
+from rifa.sorteo import (
+    DIGITOS_POR_PUESTO, crear_premio, descripcion_regla, digitos_premio, hora_argentina, nombre_premio, proximo_sorteo
+)
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,86 +20,76 @@ logger = logging.getLogger(__name__)
 def guardar_premios(premios):
     """Guarda la lista de premios en un archivo JSON"""
     try:
-        with open("premios.json", "w", encoding="utf-8") as f:
-            json.dump(premios, f, indent=4, ensure_ascii=False)
-        logger.info("Premios guardados en premios.json")
+        operaciones.guardar_premios(RIFA, premios)
     except Exception as e:
         logger.error(f"Error al guardar premios: {e}")
 def cargar_premios():
     """Carga los premios desde un archivo JSON o devuelve lista vacía"""
-    if os.path.exists("premios.json"):
-        try:
-            with open("premios.json", "r", encoding="utf-8") as f:
-                premios = json.load(f)
-            logger.info("Premios cargados desde premios.json")
-            return premios
-        except Exception as e:
-            logger.error(f"Error al cargar premios: {e}")
-            return []
-    return []
+    return operaciones.cargar_premios(RIFA)
 # ----------------------------
 # CONFIGURACIÓN MEJORADA
 # ----------------------------
-def cargar_configuracion():
-    """Carga configuración con validación robusta"""
-    try:
-        from dotenv import load_dotenv
-        load_dotenv()
-    except ImportError:
-        pass
-    config = {
-        "ADMIN_USER": os.getenv("ADMIN_USER", "admin"),
-        "ADMIN_PASS": os.getenv("ADMIN_PASS", "rifa123"),
-        "SMTP_SERVER": os.getenv("SMTP_SERVER", "smtp.gmail.com"),
-        "SMTP_PORT": int(os.getenv("SMTP_PORT", 587)),
-        "SMTP_EMAIL": os.getenv("SMTP_EMAIL", ""),
-        "SMTP_PASSWORD": os.getenv("SMTP_PASSWORD", ""),
-        "TWILIO_ACCOUNT_SID": os.getenv("TWILIO_ACCOUNT_SID", ""),
-        "TWILIO_AUTH_TOKEN": os.getenv("TWILIO_AUTH_TOKEN", ""),
-        "TWILIO_WHATSAPP_FROM": os.getenv("TWILIO_WHATSAPP_FROM", ""),
-        "MP_ACCESS_TOKEN": os.getenv("MP_ACCESS_TOKEN", ""),
-        "WEBHOOK_URL": os.getenv("WEBHOOK_URL", ""),
-        "ENLACE_PAGO_FALLBACK": os.getenv("ENLACE_PAGO_FALLBACK", "https://www.mercadopago.com.ar/"),
-        "RIFA_NOMBRE": os.getenv("RIFA_NOMBRE", "Rifa Beneficio"),
-        "RIFA_DESCRIPCION": os.getenv("RIFA_DESCRIPCION", ""),
-    }
-    # Validar MONTO_RIFA
-    monto_raw = os.getenv("MONTO_RIFA", "30000")
-    monto_limpio = re.sub(r'[^\d.]', '', monto_raw)
-    try:
-        config["MONTO_RIFA"] = float(monto_limpio) if monto_limpio else 30000.0
-    except ValueError:
-        config["MONTO_RIFA"] = 30000.0
-        logger.warning("MONTO_RIFA inválido, usando valor por defecto: 30000.0")
-    return config
-# Cargar configuración
-CONFIG = cargar_configuracion()
+# Cargar configuración (una vez por proceso)
+CONFIG = configuracion()
+metricas.configurar(CONFIG)
+# ----------------------------
+# RIFA ACTIVA (?rifa=<id>; sin parámetro, la primera del registro)
+# ----------------------------
+@st.cache_resource
+def obtener_registro():
+    """Rifas del proceso: cada una carga sus datos al usarse y los libera si queda inactiva (LRU)"""
+    return crear_registro(CONFIG)
+RIFA_ID = st.query_params.get("rifa") or obtener_registro().por_defecto
+try:
+    RIFA = obtener_registro().obtener(RIFA_ID)
+except KeyError:
+    st.set_page_config(page_title="Rifa no encontrada", page_icon="🎟️", layout="centered")
+    st.error(f"❌ La rifa '{RIFA_ID}' no existe.")
+    st.stop()
+RIFA_CONFIG = RIFA.config
 # ----------------------------
 # CONSTANTES Y CONFIGURACIÓN
 # ----------------------------
-ADMIN_USER = CONFIG["ADMIN_USER"]
-ADMIN_PASS = CONFIG["ADMIN_PASS"]
-SMTP_SERVER = CONFIG["SMTP_SERVER"]
-SMTP_PORT = CONFIG["SMTP_PORT"]
-SMTP_EMAIL = CONFIG["SMTP_EMAIL"]
-SMTP_PASSWORD = CONFIG["SMTP_PASSWORD"]
-TWILIO_ACCOUNT_SID = CONFIG["TWILIO_ACCOUNT_SID"]
-TWILIO_AUTH_TOKEN = CONFIG["TWILIO_AUTH_TOKEN"]
-TWILIO_WHATSAPP_FROM = CONFIG["TWILIO_WHATSAPP_FROM"]
-MP_ACCESS_TOKEN = CONFIG["MP_ACCESS_TOKEN"]
-WEBHOOK_URL = CONFIG["WEBHOOK_URL"]
-ENLACE_PAGO_FALLBACK = CONFIG["ENLACE_PAGO_FALLBACK"]
-MONTO_RIFA = CONFIG["MONTO_RIFA"]
-RIFA_NOMBRE = CONFIG["RIFA_NOMBRE"]
-RIFA_DESCRIPCION = CONFIG["RIFA_DESCRIPCION"]
-# Carpetas para datos
+ADMIN_USER = RIFA_CONFIG["ADMIN_USER"]
+ADMIN_PASS = RIFA_CONFIG["ADMIN_PASS"]
+SMTP_SERVER = RIFA_CONFIG["SMTP_SERVER"]
+SMTP_PORT = RIFA_CONFIG["SMTP_PORT"]
+SMTP_EMAIL = RIFA_CONFIG["SMTP_EMAIL"]
+SMTP_PASSWORD = RIFA_CONFIG["SMTP_PASSWORD"]
+TWILIO_ACCOUNT_SID = RIFA_CONFIG["TWILIO_ACCOUNT_SID"]
+TWILIO_AUTH_TOKEN = RIFA_CONFIG["TWILIO_AUTH_TOKEN"]
+TWILIO_WHATSAPP_FROM = RIFA_CONFIG["TWILIO_WHATSAPP_FROM"]
+MP_ACCESS_TOKEN = RIFA_CONFIG["MP_ACCESS_TOKEN"]
+MP_API_URL = RIFA_CONFIG["MP_API_URL"]
+MP_ENLACE_DIFERIDO = RIFA_CONFIG["MP_ENLACE_DIFERIDO"]
+MP_CONCURRENCIA = RIFA_CONFIG["MP_CONCURRENCIA"]
+WEBHOOK_URL = RIFA_CONFIG["WEBHOOK_URL"]
+ENLACE_PAGO_FALLBACK = RIFA_CONFIG["ENLACE_PAGO_FALLBACK"]
+MONTO_RIFA = RIFA_CONFIG["MONTO_RIFA"]
+RIFA_NOMBRE = RIFA_CONFIG["RIFA_NOMBRE"]
+RIFA_DESCRIPCION = RIFA_CONFIG["RIFA_DESCRIPCION"]
+RUTA_BD = RIFA_CONFIG["RUTA_BD"]
+REFRESCO_REGISTRO_SEG = RIFA_CONFIG["REFRESCO_REGISTRO_SEG"]
+REFRESCO_ADMIN_SEG = RIFA_CONFIG["REFRESCO_ADMIN_SEG"]
+RUTA_COLA = RIFA_CONFIG["RUTA_COLA"]
+COLA_MAX_INTENTOS = RIFA_CONFIG["COLA_MAX_INTENTOS"]
+# Carpetas para datos (participantes/ solo se usa para migrar el formato anterior)
 CARPETA_PARTICIPANTES = "participantes"
-CARPETA_BACKUPS = "backups"
+CARPETA_BACKUPS = RIFA_CONFIG["CARPETA_BACKUPS"]
+BACKUP_INTERVALO_MIN = RIFA_CONFIG["BACKUP_INTERVALO_MIN"]
+CARPETA_EXPORTACIONES = RIFA_CONFIG["CARPETA_EXPORTACIONES"]
+RUTA_PREMIOS = RIFA_CONFIG["RUTA_PREMIOS"]
+RUTA_MENSAJES = RIFA_CONFIG["RUTA_MENSAJES"]
+SORTEOS_POR_PAGINA = 10
+PARTICIPANTES_POR_PAGINA = 25
 os.makedirs(CARPETA_PARTICIPANTES, exist_ok=True)
 os.makedirs(CARPETA_BACKUPS, exist_ok=True)
 # ----------------------------
 # FUNCIONES AUXILIARES MEJORADAS
 # ----------------------------
+def enlace_pagina(pagina):
+    """Enlace relativo a una página de la rifa activa"""
+    return f"?page={pagina}" + (f"&rifa={RIFA_ID}" if RIFA_CONFIG["RIFA_ID"] else "")
 def es_email_valido(email):
     """Valida formato de email"""
     return re.match(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$", email)
@@ -120,131 +106,46 @@ def normalizar_boleto(boleto):
     if clean.isdigit() and 1 <= len(clean) <= 5:
         return clean.zfill(5)
     return boleto
-def guardar_participante_archivo(participante):
-    """Guarda participante en archivo JSON individual"""
-    nombre_archivo = f"{participante['nombre'].replace(' ', '_')}_{participante['boleto']}.json"
-    ruta = os.path.join(CARPETA_PARTICIPANTES, nombre_archivo)
-    try:
-        with open(ruta, "w", encoding="utf-8") as f:
-            json.dump(participante, f, indent=4, default=str, ensure_ascii=False)
-        return ruta
-    except Exception as e:
-        logger.error(f"Error guardando participante {participante['nombre']}: {e}")
-        return None
+def obtener_almacen():
+    """Almacén de participantes de la rifa, compartido por todas sus sesiones"""
+    return RIFA.almacen()
+def obtener_cache():
+    """Caché de participantes compartida entre sesiones; recarga solo lo modificado"""
+    return RIFA.cache()
+def marcar_pagado(boleto, **datos_pago):
+    """Marca como pagado el participante del boleto; devuelve el registro o None"""
+    return operaciones.marcar_pagado(RIFA, boleto, **datos_pago)
 def cargar_todos_participantes():
-    """Carga todos los participantes desde archivos JSON"""
-    participantes = []
-    for archivo in os.listdir(CARPETA_PARTICIPANTES):
-        if archivo.endswith(".json"):
-            ruta = os.path.join(CARPETA_PARTICIPANTES, archivo)
-            try:
-                with open(ruta, "r", encoding="utf-8") as f:
-                    p = json.load(f)
-                    participantes.append(p)
-            except Exception as e:
-                logger.warning(f"Error al cargar {archivo}: {e}")
-    return sorted(participantes, key=lambda x: x.get('fecha_registro', ''))
+    """Carga todos los participantes ordenados por fecha de registro"""
+    return obtener_cache().todos()
+def obtener_cliente_mp():
+    """Cliente de Mercado Pago con sesión HTTP persistente compartida por las sesiones de la rifa"""
+    return RIFA.cliente_mp()
 def crear_enlace_pago_mercadopago(boleto, nombre, email, monto=MONTO_RIFA):
     """Crea un enlace de pago personalizado en Mercado Pago"""
-    if not MP_ACCESS_TOKEN:
-        logger.warning("MP_ACCESS_TOKEN no configurado. Usando enlace genérico.")
-        return ENLACE_PAGO_FALLBACK
-    try:
-        headers = {
-            "Authorization": f"Bearer {MP_ACCESS_TOKEN}",
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "transaction_amount": float(monto),
-            "description": f"{RIFA_NOMBRE} - Boleto {boleto}",
-            "payment_method_id": "ticket",
-            "payer": {
-                "email": email,
-                "first_name": nombre.split()[0],
-                "last_name": " ".join(nombre.split()[1:]) if len(nombre.split()) > 1 else ""
-            },
-            "external_reference": boleto,
-            "notification_url": f"{WEBHOOK_URL}/webhook" if WEBHOOK_URL else None,
-            "back_urls": {
-                "success": f"{WEBHOOK_URL}?page=exito&boleto={boleto}",
-                "pending": f"{WEBHOOK_URL}?page=pending",
-                "failure": f"{WEBHOOK_URL}?page=error"
-            },
-            "auto_return": "approved"
-        }
-        response = requests.post(
-            "https://api.mercadopago.com/checkout/preferences",
-            json=payload,
-            headers=headers,
-            timeout=10
-        )
-        if response.status_code == 201:
-            return response.json()["init_point"]
-        else:
-            logger.error(f"Error MP API ({response.status_code}): {response.text[:200]}")
-            return ENLACE_PAGO_FALLBACK
-    except Exception as e:
-        logger.error(f"Excepción al crear enlace de pago: {e}")
-        return ENLACE_PAGO_FALLBACK
+    return obtener_cliente_mp().crear_enlace(boleto, nombre, email, monto)
+def guardar_enlaces_pago(enlaces):
+    """Guarda los enlaces {boleto: enlace} creados en segundo plano"""
+    operaciones.guardar_enlaces_pago(RIFA, enlaces)
+def mensaje_boleto_tomado(boleto):
+    """Mensaje de boleto tomado con los números libres más cercanos"""
+    return operaciones.mensaje_boleto_tomado(RIFA, boleto)
+def registrar_participante(participante):
+    """Reserva el boleto, crea el enlace de pago y confirma el registro de forma atómica"""
+    return operaciones.registrar_participante(RIFA, participante)
 def procesar_webhook_mercadopago(datos_webhook):
     """Procesa notificaciones de webhook de Mercado Pago"""
-    try:
-        if datos_webhook.get("type") == "payment":
-            payment_id = datos_webhook.get("data", {}).get("id")
-            if not MP_ACCESS_TOKEN:
-                return False, "MP_ACCESS_TOKEN no configurado"
-            headers = {
-                "Authorization": f"Bearer {MP_ACCESS_TOKEN}",
-                "Content-Type": "application/json"
-            }
-            response = requests.get(
-                f"https://api.mercadopago.com/v1/payments/{payment_id}",
-                headers=headers,
-                timeout=10
-            )
-            # ✅ CORREGIDO: status_code debe ser 200, no 30000
-            if response.status_code == 200:
-                pago = response.json()
-                external_reference = pago.get("external_reference")
-                status = pago.get("status")
-                if status == "approved" and external_reference:
-                    participantes = cargar_todos_participantes()
-                    for participante in participantes:
-                        if participante['boleto'] == external_reference:
-                            nombre_archivo = f"{participante['nombre'].replace(' ', '_')}_{participante['boleto']}.json"
-                            ruta = os.path.join(CARPETA_PARTICIPANTES, nombre_archivo)
-                            participante['estado_pago'] = 'pagado'
-                            participante['fecha_pago'] = datetime.now().isoformat()
-                            participante['id_pago_mp'] = payment_id
-                            participante['metodo_pago'] = pago.get('payment_method_id', '')
-                            with open(ruta, "w", encoding="utf-8") as f:
-                                json.dump(participante, f, indent=4, default=str, ensure_ascii=False)
-                            logger.info(f"Pago confirmado para boleto {external_reference}")
-                            return True, "Pago procesado correctamente"
-        return False, "Webhook no procesado"
-    except Exception as e:
-        logger.error(f"Error en webhook: {e}")
-        return False, str(e)
+    return operaciones.procesar_notificacion_pago(RIFA, datos_webhook)
+def obtener_historial():
+    """Historial de sorteos de la rifa (importa el historial_sorteos.json anterior)"""
+    return RIFA.historial()
+def obtener_respaldos():
+    """Gestor de respaldos de la rifa; los programados corren mientras la rifa está activa"""
+    return RIFA.respaldos()
 def crear_backup_automatico():
     """Crea backup automático de los datos"""
     try:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        participantes = cargar_todos_participantes()
-        backup_data = {
-            "timestamp": timestamp,
-            "rifa_nombre": RIFA_NOMBRE,
-            "participantes": participantes,
-            "premios": st.session_state.get('premios', []),
-            "historial_sorteos": st.session_state.get('historial_sorteos', [])
-        }
-        backup_file = os.path.join(CARPETA_BACKUPS, f"backup_{timestamp}.json")
-        with open(backup_file, "w", encoding="utf-8") as f:
-            json.dump(backup_data, f, indent=4, default=str, ensure_ascii=False)
-        backups = sorted([f for f in os.listdir(CARPETA_BACKUPS) if f.startswith("backup_")])
-        if len(backups) > 10:
-            for old_backup in backups[:-10]:
-                os.remove(os.path.join(CARPETA_BACKUPS, old_backup))
-        logger.info(f"Backup creado: {backup_file}")
+        operaciones.crear_respaldo(RIFA)
         return True
     except Exception as e:
         logger.error(f"Error en backup: {e}")
@@ -252,29 +153,23 @@ def crear_backup_automatico():
 def restaurar_backup(archivo_backup):
     """Restaura datos desde un backup"""
     try:
-        with open(archivo_backup, "r", encoding="utf-8") as f:
-            backup_data = json.load(f)
-        for archivo in os.listdir(CARPETA_PARTICIPANTES):
-            if archivo.endswith(".json"):
-                os.remove(os.path.join(CARPETA_PARTICIPANTES, archivo))
-        for participante in backup_data.get("participantes", []):
-            guardar_participante_archivo(participante)
-        st.session_state.premios = backup_data.get("premios", [])
-        guardar_premios(st.session_state.premios)  # Guardar también en premios.json
-        st.session_state.historial_sorteos = backup_data.get("historial_sorteos", [])
-        logger.info("Backup restaurado correctamente")
+        st.session_state.premios = operaciones.restaurar_respaldo(RIFA, archivo_backup).get("premios", [])
         return True
     except Exception as e:
         logger.error(f"Error restaurando backup: {e}")
         return False
+@metricas.medido("estadisticas_panel")
 def mostrar_estadisticas_avanzadas():
     """Muestra estadísticas detalladas de la rifa"""
-    participantes = cargar_todos_participantes()
-    if not participantes:
+    import pandas as pd
+    # Agregados mantenidos por el almacén en cada registro o pago: no se recorre a los participantes
+    estadisticas = obtener_almacen().estadisticas()
+    por_estado = estadisticas["estado"]
+    total_participantes = sum(por_estado.values())
+    if not total_participantes:
         st.info("📊 No hay participantes registrados")
         return
-    total_participantes = len(participantes)
-    pagados = sum(1 for p in participantes if p.get('estado_pago') == 'pagado')
+    pagados = por_estado.get('pagado', 0)
     pendientes = total_participantes - pagados
     recaudacion_total = pagados * MONTO_RIFA
     recaudacion_potencial = total_participantes * MONTO_RIFA
@@ -288,31 +183,38 @@ def mostrar_estadisticas_avanzadas():
         st.metric("Por Pagar", pendientes)
     with col4:
         st.metric("Recaudación", f"${recaudacion_total:,.2f}")
-    if total_participantes > 0:
-        try:
-            df = pd.DataFrame(participantes)
-            df['fecha_registro'] = pd.to_datetime(df['fecha_registro'])
-            st.subheader("📈 Evolución de Registros")
-            registros_por_dia = df.set_index('fecha_registro').resample('D').size()
-            if not registros_por_dia.empty:
-                st.line_chart(registros_por_dia)
-            else:
-                st.info("No hay suficientes datos para mostrar la evolución")
-            st.subheader("💰 Distribución por Estado de Pago")
-            estado_counts = df['estado_pago'].value_counts()
-            if not estado_counts.empty:
-                st.bar_chart(estado_counts)
-            if 'ciudad' in df.columns and not df['ciudad'].empty:
-                st.subheader("🏙️ Top Ciudades")
-                ciudad_counts = df[df['ciudad'] != '']['ciudad'].value_counts().head(10)
-                if not ciudad_counts.empty:
-                    st.bar_chart(ciudad_counts)
-        except Exception as e:
-            st.warning(f"No se pudieron generar gráficos: {e}")
+    try:
+        st.subheader("📈 Evolución de Registros")
+        por_dia = {dia: n for dia, n in estadisticas["dia"].items() if dia}
+        if por_dia:
+            registros_por_dia = pd.Series(por_dia)
+            registros_por_dia.index = pd.to_datetime(registros_por_dia.index, errors='coerce')
+            st.line_chart(registros_por_dia[registros_por_dia.index.notna()].sort_index().resample('D').sum())
+        else:
+            st.info("No hay suficientes datos para mostrar la evolución")
+        st.subheader("💰 Distribución por Estado de Pago")
+        st.bar_chart(pd.Series(por_estado).sort_values(ascending=False))
+        ciudad_counts = pd.Series({c: n for c, n in estadisticas["ciudad"].items() if c}, dtype=int)
+        if not ciudad_counts.empty:
+            st.subheader("🏙️ Top Ciudades")
+            st.bar_chart(ciudad_counts.sort_values(ascending=False).head(10))
+    except Exception as e:
+        st.warning(f"No se pudieron generar gráficos: {e}")
+def mostrar_rendimiento():
+    """Tiempos recientes por operación medidos en este proceso"""
+    if not metricas.METRICAS.activas:
+        st.info("Métricas desactivadas. Configura METRICAS=1 para medir los tiempos de cada operación.")
+        return
+    filas = metricas.METRICAS.resumen()
+    if filas:
+        st.dataframe(filas, use_container_width=True, hide_index=True)
+    else:
+        st.caption("Todavía no hay mediciones en este proceso.")
+    if CONFIG["METRICAS_PUERTO"]:
+        st.caption(f"Prometheus: `http://{CONFIG['METRICAS_HOST']}:{CONFIG['METRICAS_PUERTO']}/metrics`")
 def enviar_recordatorio_pago():
     """Envía recordatorios de pago a participantes pendientes"""
-    participantes = cargar_todos_participantes()
-    pendientes = [p for p in participantes if p.get('estado_pago') == 'pendiente']
+    pendientes = obtener_almacen().listar(estado_pago="pendiente")
     if not pendientes:
         st.info("✅ No hay participantes pendientes de pago")
         return
@@ -321,14 +223,7 @@ def enviar_recordatorio_pago():
         asunto = st.text_input("Asunto", value="Recordatorio de Pago - Rifa")
         mensaje_personalizado = st.text_area(
             "Mensaje de recordatorio",
-            value="""Hola {nombre},
-Te recordamos que tu pago para la rifa está pendiente.
-Detalles:
-- Boleto: {boleto}
-- Monto: ${monto}
-- Enlace de pago: {enlace_pago}
-Por favor, realiza el pago para confirmar tu participación.
-¡Gracias!""",
+            value=operaciones.MENSAJE_RECORDATORIO_POR_DEFECTO,
             height=200
         )
         enviar_emails = st.checkbox("Enviar por email", value=True)
@@ -340,204 +235,147 @@ Por favor, realiza el pago para confirmar tu participación.
             if not TWILIO_ACCOUNT_SID and enviar_whatsapp:
                 st.error("❌ Twilio no configurado para WhatsApp")
                 return
-            resultados = []
-            progress_bar = st.progress(0)
-            for i, participante in enumerate(pendientes):
-                try:
-                    mensaje = mensaje_personalizado.format(
-                        nombre=participante['nombre'],
-                        boleto=participante['boleto'],
-                        monto=MONTO_RIFA,
-                        enlace_pago=participante.get('link_pago', ENLACE_PAGO_FALLBACK)
-                    )
-                    if enviar_emails and participante.get('email'):
-                        msg = MIMEMultipart()
-                        msg['From'] = SMTP_EMAIL
-                        msg['To'] = participante['email']
-                        msg['Subject'] = asunto
-                        msg.attach(MIMEText(mensaje, 'plain', 'utf-8'))
-                        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-                            server.starttls()
-                            server.login(SMTP_EMAIL, SMTP_PASSWORD)
-                            server.send_message(msg)
-                        resultados.append(f"✅ Email enviado a {participante['nombre']}")
-                    if enviar_whatsapp and participante.get('telefono'):
-                        try:
-                            client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-                            to_num = "+" + re.sub(r"[^\d]", "", participante['telefono'].lstrip("+"))
-                            client.messages.create(
-                                body=mensaje,
-                                from_=TWILIO_WHATSAPP_FROM,
-                                to=f"whatsapp:{to_num}"
-                            )
-                            resultados.append(f"✅ WhatsApp enviado a {participante['nombre']}")
-                        except Exception as wa_error:
-                            resultados.append(f"❌ WhatsApp falló para {participante['nombre']}: {wa_error}")
-                    time.sleep(0.5)
-                except Exception as e:
-                    resultados.append(f"❌ Error con {participante['nombre']}: {str(e)}")
-                progress_bar.progress((i + 1) / len(pendientes))
-            st.success(f"✅ Proceso completado. {len(resultados)} acciones realizadas")
-            for resultado in resultados:
-                st.write(resultado)
+            try:
+                trabajos = operaciones.trabajos_recordatorio(
+                    RIFA, pendientes, asunto, mensaje_personalizado, enviar_emails, enviar_whatsapp
+                )
+            except Exception as e:
+                st.error(f"❌ Error en la plantilla del mensaje: {e}")
+                return
+            nuevos = obtener_cola().encolar_muchos(trabajos)
+            st.success(f"✅ {nuevos} recordatorios encolados")
+            if nuevos < len(trabajos):
+                st.info(f"ℹ️ {len(trabajos) - nuevos} ya se habían encolado hoy y no se repiten")
 # ----------------------------
 # FUNCIONES DE NOTIFICACIÓN
 # ----------------------------
-def enviar_email_ganador(ganador, premio, mensaje_personalizado=None):
-    if not SMTP_EMAIL or not SMTP_PASSWORD:
-        return False, "SMTP no configurado"
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = SMTP_EMAIL
-        msg['To'] = ganador['email']
-        msg['Subject'] = "🎉 ¡Felicidades! Ganaste en la rifa"
-        cuerpo = (mensaje_personalizado or 
-                 f"""¡Hola {ganador['nombre']}!
-¡Felicidades! Has ganado el premio: **{premio}** en nuestra rifa.
-Detalles:
-- Boleto: {ganador['boleto']}
-- Premio: {premio}
-Pronto nos pondremos en contacto para coordinar la entrega.
-¡Gracias por participar!""")
-        msg.attach(MIMEText(cuerpo, 'plain', 'utf-8'))
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_EMAIL, SMTP_PASSWORD)
-            server.send_message(msg)
-        logger.info(f"Email enviado a ganador: {ganador['nombre']}")
-        return True, "Éxito"
-    except Exception as e:
-        logger.error(f"Error enviando email a {ganador['nombre']}: {e}")
-        return False, str(e)
-def enviar_whatsapp_ganador(ganador, premio, mensaje_personalizado=None):
-    if not TWILIO_ACCOUNT_SID or not TWILIO_AUTH_TOKEN or not TWILIO_WHATSAPP_FROM:
-        return False, "Twilio no configurado"
-    try:
-        client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-        mensaje = (mensaje_personalizado or 
-                  f"🎉 ¡Felicidades, {ganador['nombre']}! Ganaste: *{premio}* en la rifa. Boleto: {ganador['boleto']}. Pronto te contactaremos.")
-        to_num = "+" + re.sub(r"[^\d]", "", ganador['telefono'].lstrip("+"))
-        message = client.messages.create(
-            body=mensaje,
-            from_=TWILIO_WHATSAPP_FROM,
-            to=f"whatsapp:{to_num}"
-        )
-        logger.info(f"WhatsApp enviado a ganador: {ganador['nombre']} - SID: {message.sid}")
-        return True, "Éxito"
-    except Exception as e:
-        logger.error(f"Error enviando WhatsApp a {ganador['nombre']}: {e}")
-        return False, str(e)
+def obtener_cola():
+    """Cola persistente de notificaciones (la procesa `python -m rifa.worker`)"""
+    return RIFA.cola()
+def plantillas_mensajes():
+    return {"mensaje_email": st.session_state.mensaje_email, "mensaje_whatsapp": st.session_state.mensaje_whatsapp}
+def mostrar_cola_notificaciones():
+    """Estado de la cola de notificaciones y lista de descarte"""
+    cola = obtener_cola()
+    resumen = cola.resumen()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Pendientes", resumen["pendiente"])
+    col2.metric("En curso", resumen["en_curso"])
+    col3.metric("Enviadas", resumen["hecho"])
+    col4.metric("Descartadas", resumen["fallido"])
+    if resumen["pendiente"] or resumen["en_curso"]:
+        st.caption("💡 Los envíos los realiza el worker: `python -m rifa.worker`")
+    for trabajo in cola.fallidos():
+        col_info, col_reintentar, col_descartar = st.columns([4, 1, 1])
+        with col_info:
+            st.markdown(f"**{trabajo['payload'].get('etiqueta', '')}** · {trabajo['canal']} · `{trabajo['clave']}`")
+            st.caption(f"❌ {trabajo['error']} ({trabajo['intentos']} intentos)")
+        with col_reintentar:
+            if st.button("🔁", key=f"reintentar_{trabajo['id']}", help="Reintentar", use_container_width=True):
+                cola.reintentar(trabajo['id'])
+                st.rerun()
+        with col_descartar:
+            if st.button("🗑️", key=f"descartar_{trabajo['id']}", help="Descartar", use_container_width=True):
+                cola.descartar(trabajo['id'])
+                st.rerun()
 # ----------------------------
 # FUNCIONES DE EXPORTACIÓN
 # ----------------------------
-def guardar_datos():
-    participantes = cargar_todos_participantes()
-    return json.dumps({
-        "rifa_nombre": RIFA_NOMBRE,
-        "fecha_exportacion": datetime.now().isoformat(),
-        "premios": st.session_state.premios,
-        "participantes": participantes,
-        "historial_sorteos": st.session_state.historial_sorteos,
-        "mensaje_email": st.session_state.mensaje_email,
-        "mensaje_whatsapp": st.session_state.mensaje_whatsapp,
-    }, indent=4, default=str, ensure_ascii=False)
+def preparar_exportacion_json():
+    """Archivo JSON para la versión actual de los datos (se regenera solo si cambiaron)"""
+    return operaciones.exportar_json(RIFA, st.session_state.premios, plantillas_mensajes())
+def preparar_exportacion_csv():
+    """Archivo CSV de participantes para la versión actual de los datos"""
+    return operaciones.exportar_participantes_csv(RIFA)
 def cargar_datos(uploaded_file):
     try:
-        data = json.load(uploaded_file)
-        st.session_state.premios = data.get("premios", [])
-        guardar_premios(st.session_state.premios)  # Persistir
-        st.session_state.historial_sorteos = data.get("historial_sorteos", [])
-        st.session_state.mensaje_email = data.get("mensaje_email", st.session_state.mensaje_email)
-        st.session_state.mensaje_whatsapp = data.get("mensaje_whatsapp", st.session_state.mensaje_whatsapp)
-        for archivo in os.listdir(CARPETA_PARTICIPANTES):
-            if archivo.endswith(".json"):
-                os.remove(os.path.join(CARPETA_PARTICIPANTES, archivo))
-        for participante in data.get("participantes", []):
-            guardar_participante_archivo(participante)
+        premios, plantillas = operaciones.importar_datos(RIFA, json.load(uploaded_file))
+        st.session_state.premios = premios
+        st.session_state.update(plantillas)
         st.success("✅ Datos cargados correctamente.")
-        logger.info("Datos cargados desde archivo")
     except Exception as e:
         st.error(f"❌ Error cargando datos: {e}")
         logger.error(f"Error cargando datos: {e}")
-def exportar_resultados_csv(historial=None):
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["Fecha", "Premio", "Nombre", "Boleto", "Email", "Teléfono", "Dirección", "Ciudad", "Localidad", "Estado Pago", "Fecha Registro"])
-    registros = historial or []
-    for sorteo in registros:
-        for res in sorteo.get("ganadores", []):
-            g = res
-            writer.writerow([
-                sorteo.get("fecha", ""),
-                sorteo.get("premio", "Lotería Nocturna"),
-                g.get('nombre', ''),
-                g.get('boleto', ''),
-                g.get('email', ''),
-                g.get('telefono', ''),
-                g.get('direccion', ''),
-                g.get('ciudad', ''),
-                g.get('localidad', ''),
-                g.get('estado_pago', 'pendiente'),
-                g.get('fecha_registro', '')
-            ])
-    return output.getvalue()
-def exportar_participantes_csv():
-    participantes = cargar_todos_participantes()
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["Nombre", "Boleto", "Email", "Teléfono", "Dirección", "Ciudad", "Localidad", "Estado Pago", "Fecha Registro", "Fecha Pago"])
-    for p in participantes:
-        writer.writerow([
-            p.get('nombre', ''),
-            p.get('boleto', ''),
-            p.get('email', ''),
-            p.get('telefono', ''),
-            p.get('direccion', ''),
-            p.get('ciudad', ''),
-            p.get('localidad', ''),
-            p.get('estado_pago', 'pendiente'),
-            p.get('fecha_registro', ''),
-            p.get('fecha_pago', '')
-        ])
-    return output.getvalue()
+def exportar_resultados_csv():
+    """Archivo CSV con los ganadores de todos los sorteos, generado por bloques desde el historial"""
+    return operaciones.exportar_resultados_csv(RIFA)
 # ----------------------------
 # FUNCIONES DE SORTEO
 # ----------------------------
 def get_next_draw_time():
-    now = datetime.utcnow() - timedelta(hours=3)
-    draw_time = now.replace(hour=21, minute=30, second=0, microsecond=0)
-    if now > draw_time:
-        draw_time += timedelta(days=1)
-    return draw_time
-@st.cache_data(ttl=300)
-def obtener_numero_nocturna():
+    return proximo_sorteo()
+CONTADOR_HTML = """
+<div style="background: linear-gradient(120deg, #89f7fe 0%, #66a6ff 100%); padding: 20px; border-radius: 15px;
+            text-align: center; color: white; font-weight: bold; font-family: sans-serif;
+            box-shadow: 0 4px 8px rgba(0,0,0,0.2);">
+    <h3 style="margin: 0 0 10px 0;">⏳ {titulo}</h3>
+    <p id="contador" style="margin: 0;"></p>
+</div>
+<script>
+    const fin = Date.now() + {restante_ms};
+    const num = (v) => '<span style="font-size: 2.2em; margin: 0 8px;">' + v + '</span>';
+    const dos = (v) => String(v).padStart(2, "0");
+    function actualizar() {{
+        const s = Math.max(0, Math.floor((fin - Date.now()) / 1000));
+        document.getElementById("contador").innerHTML =
+            num(Math.floor(s / 86400)) + "d &nbsp; " + num(dos(Math.floor(s % 86400 / 3600))) + "h &nbsp; " +
+            num(dos(Math.floor(s % 3600 / 60))) + "m &nbsp; " + num(dos(s % 60)) + "s";
+    }}
+    actualizar();
+    setInterval(actualizar, 1000);
+</script>
+"""
+def _dibujar_contador(titulo, mensaje_realizado):
+    """Cuenta regresiva que avanza en el navegador, sin reejecutar el script cada segundo"""
+    next_draw = get_next_draw_time()
+    now_arg = datetime.utcnow() - timedelta(hours=3)
+    diff = next_draw - now_arg
+    if diff.total_seconds() > 0:
+        components.html(
+            CONTADOR_HTML.format(titulo=titulo, restante_ms=int(diff.total_seconds() * 1000)),
+            height=150
+        )
+    else:
+        st.markdown('<div class="contador-box" style="background: linear-gradient(120deg, #ff9a9e 0%, #fad0c4 100%);">', unsafe_allow_html=True)
+        st.markdown(f"### 🎉 {mensaje_realizado}")
+        st.markdown('</div>', unsafe_allow_html=True)
+def mostrar_contador(titulo, mensaje_realizado, refresco_seg):
+    """Muestra el contador; si refresco_seg > 0 solo este fragmento se resincroniza con el servidor"""
+    if refresco_seg > 0:
+        st.fragment(run_every=refresco_seg)(_dibujar_contador)(titulo, mensaje_realizado)
+    else:
+        _dibujar_contador(titulo, mensaje_realizado)
+@st.cache_resource
+def obtener_proveedor_resultados():
+    """Proveedor de resultados oficiales con caché persistente por fecha de sorteo"""
+    from rifa.resultados import ProveedorResultados, fuentes_desde_config
+    return ProveedorResultados(CONFIG["RUTA_RESULTADOS"], fuentes_desde_config(CONFIG["RESULTADOS_FUENTES"]))
+def obtener_numero_nocturna(fecha=None):
+    """Número ganador de la Nocturna del día (None si aún no se publicó o no hubo respuesta)"""
     try:
-        url = "https://www.resultadosloterias.com.ar/cordoba/nocturna/"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        numero_tag = soup.find('span', class_='numero')
-        if numero_tag:
-            numero = re.sub(r'\D', '', numero_tag.get_text())
-            if len(numero) == 5:
-                return numero
-        for span in soup.find_all('span'):
-            texto = span.get_text()
-            match = re.search(r'\b\d{5}\b', texto)
-            if match:
-                return match.group()
-        for div in soup.find_all('div'):
-            texto = div.get_text()
-            match = re.search(r'\b\d{5}\b', texto)
-            if match:
-                return match.group()
-        return None
+        return obtener_proveedor_resultados().obtener(fecha)
     except Exception as e:
         logger.error(f"Error al obtener resultados oficiales: {e}")
         return None
+def resolver_sorteo(numero_oficial, fecha=None):
+    """Resuelve el sorteo con el número oficial y muestra ganadores y avisos encolados"""
+    st.session_state.numero_ganador_oficial = numero_oficial
+    st.session_state.ultimo_sorteo_verificado = datetime.now().date()
+    st.success(f"✅ Número ganador oficial: **{numero_oficial}**")
+    sorteo, nuevo, avisos = operaciones.realizar_sorteo(
+        RIFA, numero_oficial, fecha, premios=st.session_state.premios, plantillas=plantillas_mensajes()
+    )
+    if not nuevo:
+        st.info("ℹ️ Este sorteo ya estaba procesado (por el programador o por otro administrador).")
+    ganadores = sorteo["ganadores"]
+    if ganadores:
+        st.subheader(f"🎉 ¡{len(ganadores)} Ganador(es) Encontrado(s)!")
+        st.success(f"📬 Notificaciones nuevas encoladas: {avisos}")
+        for g in ganadores:
+            st.markdown(f"**{g['nombre']}** (Boleto: `{g['boleto']}`) — {g.get('premio', sorteo['premio'])} ({g.get('regla', 'exacto')})")
+        st.balloons()
+    else:
+        st.info("ℹ️ No hay participantes **pagos** con el número ganador.")
 # ----------------------------
 # GESTIÓN MEJORADA DE PREMIOS (CON PERSISTENCIA)
 # ----------------------------
@@ -555,11 +393,12 @@ def gestionar_premios():
         st.subheader("➕ Agregar Nuevo Premio")
         col1, col2 = st.columns([3, 1])
         with col1:
+            premio_actual = None
             if st.session_state.editando_premio_idx is not None:
                 premio_actual = st.session_state.premios[st.session_state.editando_premio_idx]
                 nuevo_premio = st.text_input(
                     "Nombre del premio", 
-                    value=premio_actual,
+                    value=nombre_premio(premio_actual),
                     placeholder="Ej: Primer Premio - $50,000",
                     help="Describe el premio de forma atractiva para los participantes"
                 )
@@ -569,6 +408,13 @@ def gestionar_premios():
                     placeholder="Ej: Primer Premio - $50,000",
                     help="Describe el premio de forma atractiva para los participantes"
                 )
+            digitos = st.selectbox(
+                "¿Qué debe coincidir con el número de la Nocturna?",
+                DIGITOS_POR_PUESTO,
+                index=DIGITOS_POR_PUESTO.index(digitos_premio(premio_actual)) if premio_actual is not None else 0,
+                format_func=lambda d: "Número exacto (5 cifras)" if d == 5 else f"Últimas {d} cifras",
+                help="Cada boleto se lleva solo el primer premio de la lista que le toque"
+            )
         with col2:
             st.write("")
             st.write("")
@@ -580,11 +426,11 @@ def gestionar_premios():
                 if nuevo_premio.strip():
                     premio_limpio = " ".join(nuevo_premio.split())
                     if st.session_state.editando_premio_idx is not None:
-                        st.session_state.premios[st.session_state.editando_premio_idx] = premio_limpio
+                        st.session_state.premios[st.session_state.editando_premio_idx] = crear_premio(premio_limpio, digitos)
                         st.success(f"✅ Premio actualizado: '{premio_limpio}'")
                         st.session_state.editando_premio_idx = None
                     else:
-                        st.session_state.premios.append(premio_limpio)
+                        st.session_state.premios.append(crear_premio(premio_limpio, digitos))
                         st.success(f"✅ Premio agregado: '{premio_limpio}'")
                     guardar_premios(st.session_state.premios)  # ✅ Persistir cambios
                     st.rerun()
@@ -600,7 +446,8 @@ def gestionar_premios():
                     st.markdown(f"""
                     <div style='padding: 10px; background: #f8f9fa; border-radius: 8px; border-left: 4px solid #FFD700; margin: 5px 0;'>
                         <span style='background: #FFD700; color: #000; padding: 2px 8px; border-radius: 12px; font-weight: bold; margin-right: 10px;'>#{idx+1}</span>
-                        <strong>{premio}</strong>
+                        <strong>{nombre_premio(premio)}</strong>
+                        <span style='color: #666; margin-left: 8px;'>({descripcion_regla(digitos_premio(premio))})</span>
                     </div>
                     """, unsafe_allow_html=True)
                 with col_acciones:
@@ -641,7 +488,7 @@ def gestionar_premios():
                         st.rerun()
         with col_export:
             # ✅ CORREGIDO: cadena multilínea
-            premios_texto = "\n".join([f"{i+1}. {premio}" for i, premio in enumerate(st.session_state.premios)])
+            premios_texto = "\n".join([f"{i+1}. {nombre_premio(premio)}" for i, premio in enumerate(st.session_state.premios)])
             st.download_button(
                 "📥 Exportar Lista",
                 premios_texto,
@@ -697,7 +544,7 @@ def gestionar_premios():
                         <span style='background: #FFD700; color: #2c3e50; border-radius: 50%; 
                                     width: 30px; height: 30px; display: inline-flex; align-items: center; 
                                     justify-content: center; font-weight: bold; margin-right: 10px;'>{idx + 1}</span>
-                        {premio}
+                        {nombre_premio(premio)}
                     </div>
                 </div>
                 """, unsafe_allow_html=True)
@@ -705,12 +552,22 @@ def gestionar_premios():
 # ----------------------------
 # INICIALIZACIÓN DE SESIÓN (CON CARGA PERSISTENTE DE PREMIOS)
 # ----------------------------
+try:
+    obtener_respaldos()  # Arranca los respaldos programados de la rifa cuando se activa
+except RifaCerrada:
+    # Otra sesión desalojó la rifa entre que esta ejecución la obtuvo y ahora: el registro arma una nueva
+    st.rerun()
+if st.session_state.get('rifa_id') != RIFA_ID:
+    # Los datos de sesión son de una sola rifa: al cambiar de rifa se vuelven a cargar
+    for clave in ('premios', 'mensaje_email', 'mensaje_whatsapp', 'editando_premio_idx', 'editando_participante_idx',
+                  'numero_ganador_oficial', 'ultimo_sorteo_verificado', 'form_submitted', 'exportaciones_preparadas',
+                  'filtro_participantes', 'pagina_participantes'):
+        st.session_state.pop(clave, None)
+    st.session_state.rifa_id = RIFA_ID
 if 'logueado' not in st.session_state:
     st.session_state.logueado = False
 if 'premios' not in st.session_state:
     st.session_state.premios = cargar_premios()  # ✅ Cargar desde archivo
-if 'historial_sorteos' not in st.session_state:
-    st.session_state.historial_sorteos = []
 if 'editando_premio_idx' not in st.session_state:
     st.session_state.editando_premio_idx = None
 if 'editando_participante_idx' not in st.session_state:
@@ -721,10 +578,8 @@ if 'ultimo_sorteo_verificado' not in st.session_state:
     st.session_state.ultimo_sorteo_verificado = None
 if 'form_submitted' not in st.session_state:
     st.session_state.form_submitted = False
-if 'mensaje_email' not in st.session_state:
-    st.session_state.mensaje_email = "¡Hola {nombre}!\n¡Felicidades! Has ganado el premio: **{premio}** en nuestra rifa.\nDetalles:\n- Boleto: {boleto}\n- Premio: {premio}\nPronto nos pondremos en contacto para coordinar la entrega.\n¡Gracias por participar!"
-if 'mensaje_whatsapp' not in st.session_state:
-    st.session_state.mensaje_whatsapp = "🎉 ¡Felicidades, {nombre}! Ganaste: *{premio}* en la rifa. Boleto: {boleto}. Pronto te contactaremos."
+if 'mensaje_email' not in st.session_state or 'mensaje_whatsapp' not in st.session_state:
+    st.session_state.update(operaciones.cargar_plantillas(RIFA))
 # ----------------------------
 # ESTILOS COMUNES
 # ----------------------------
@@ -792,8 +647,8 @@ if not st.session_state.logueado and page not in ["registro", "resultados", "exi
                 else:
                     st.error("❌ Usuario o contraseña incorrectos")
         st.markdown("---")
-        st.markdown("¿Eres participante? [Regístrate aquí](?page=registro)")
-        st.markdown("[Ver resultados](?page=resultados)")
+        st.markdown(f"¿Eres participante? [Regístrate aquí]({enlace_pagina('registro')})")
+        st.markdown(f"[Ver resultados]({enlace_pagina('resultados')})")
     st.stop()
 # ----------------------------
 # PÁGINAS PÚBLICAS
@@ -806,6 +661,11 @@ if page == "registro":
         st.balloons()
         st.markdown("¡Gracias por participar! Tu boleto ha sido reservado.")
         st.markdown("### 💳 Para confirmar tu participación, realiza el pago:")
+        if MP_ENLACE_DIFERIDO and st.session_state.get("boleto_registrado"):
+            # El enlace personalizado se crea en segundo plano; tomar el más reciente
+            registrado = obtener_almacen().obtener(st.session_state.boleto_registrado)
+            if registrado and registrado.get("link_pago"):
+                st.session_state.enlace_pago = registrado["link_pago"]
         st.markdown(f'<div style="text-align: center; margin: 20px 0;">'
                    f'<a href="{st.session_state.enlace_pago}" target="_blank" style="background: #00bb2d; color: white; padding: 15px 30px; text-decoration: none; border-radius: 10px; font-weight: bold; display: inline-block;">'
                    f'👉 Pagar ${MONTO_RIFA} con Mercado Pago</a></div>', unsafe_allow_html=True)
@@ -822,7 +682,6 @@ if page == "registro":
                 st.rerun()
         st.stop()
     st.set_page_config(page_title="🎟️ ¡Regístrate en la Rifa!", page_icon="📝", layout="centered")
-    st_autorefresh(interval=1000, key="public_contador_refresh")
     premios_css = """
     <style>
     .contador-box { background: linear-gradient(120deg, #89f7fe 0%, #66a6ff 100%); padding: 20px; border-radius: 15px; text-align: center; margin: 15px 0; color: white; font-weight: bold; box-shadow: 0 4px 8px rgba(0,0,0,0.2); }
@@ -852,7 +711,7 @@ if page == "registro":
             <div class="premio-card">
                 <div class="premio-titulo">
                     <span class="premio-numero">{idx + 1}</span>
-                    {premio}
+                    {nombre_premio(premio)}
                 </div>
             </div>
             """, unsafe_allow_html=True)
@@ -864,24 +723,11 @@ if page == "registro":
         st.markdown("¡Premios increíbles te esperan! Los detalles se revelarán pronto.")
         st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
-    next_draw = get_next_draw_time()
-    now_arg = datetime.utcnow() - timedelta(hours=3)
-    diff = next_draw - now_arg
-    if diff.total_seconds() > 0:
-        days = diff.days
-        hours, remainder = divmod(diff.seconds, 3600)
-        minutes, seconds = divmod(remainder, 60)
-        st.markdown('<div class="contador-box">', unsafe_allow_html=True)
-        st.markdown(f"### ⏳ ¡El próximo sorteo es en!")
-        st.markdown(
-            f'<p><span class="contador-num">{days}</span>d &nbsp; <span class="contador-num">{hours:02d}</span>h &nbsp; <span class="contador-num">{minutes:02d}</span>m &nbsp; <span class="contador-num">{seconds:02d}</span>s</p>',
-            unsafe_allow_html=True
-        )
-        st.markdown('</div>', unsafe_allow_html=True)
-    else:
-        st.markdown('<div class="contador-box" style="background: linear-gradient(120deg, #ff9a9e 0%, #fad0c4 100%);">', unsafe_allow_html=True)
-        st.markdown("### 🎉 ¡El sorteo ya se realizó hoy! Los resultados se publicarán pronto.")
-        st.markdown('</div>', unsafe_allow_html=True)
+    mostrar_contador(
+        "¡El próximo sorteo es en!",
+        "¡El sorteo ya se realizó hoy! Los resultados se publicarán pronto.",
+        REFRESCO_REGISTRO_SEG
+    )
     st.markdown("### 📝 Completa el formulario para participar:")
     with st.form("form_registro_publico"):
         col1, col2 = st.columns(2)
@@ -903,7 +749,7 @@ if page == "registro":
         with col_info1:
             st.metric("🎫 Valor del boleto", f"${MONTO_RIFA}")
         with col_info2:
-            participantes_count = len(cargar_todos_participantes())
+            participantes_count = obtener_cache().contar()
             st.metric("👥 Participantes", participantes_count)
         with col_info3:
             st.metric("🏆 Premios", len(st.session_state.premios))
@@ -925,15 +771,12 @@ if page == "registro":
                 errores.append("Email inválido.")
             if telefono.strip() and not es_telefono_valido(telefono.strip()):
                 errores.append("Teléfono debe ser número internacional válido (ej: +5491112345678).")
-            participantes_existentes = cargar_todos_participantes()
-            if boleto_norm and any(p['boleto'] == boleto_norm for p in participantes_existentes):
-                errores.append("Ese boleto ya está tomado. Elige otro.")
+            if boleto_norm and es_boleto_valido(boleto_norm) and obtener_cache().boleto_ocupado(boleto_norm):
+                errores.append(mensaje_boleto_tomado(boleto_norm))
             if errores:
                 for e in errores:
                     st.error(f"❌ {e}")
             else:
-                enlace_pago = crear_enlace_pago_mercadopago(boleto_norm, nombre.strip(), email.strip())
-                st.session_state.enlace_pago = enlace_pago
                 participante = {
                     "nombre": nombre.strip(),
                     "boleto": boleto_norm,
@@ -944,14 +787,16 @@ if page == "registro":
                     "localidad": localidad.strip(),
                     "fecha_registro": datetime.now().isoformat(),
                     "estado_pago": "pendiente",
-                    "id_pago": boleto_norm,
-                    "link_pago": enlace_pago
+                    "id_pago": boleto_norm
                 }
-                if guardar_participante_archivo(participante):
+                ok, resultado = registrar_participante(participante)
+                if ok:
+                    st.session_state.enlace_pago = resultado
+                    st.session_state.boleto_registrado = boleto_norm
                     st.session_state.form_submitted = True
                     st.rerun()
                 else:
-                    st.error("❌ Error al guardar el registro. Intenta nuevamente.")
+                    st.error(f"❌ {resultado}")
     st.markdown("---")
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -961,7 +806,7 @@ if page == "registro":
     with col2:
         st.markdown("[📋 Ver reglamento](#)", unsafe_allow_html=True)
     with col3:
-        st.markdown("[🏆 Ver resultados](?page=resultados)", unsafe_allow_html=True)
+        st.markdown(f"[🏆 Ver resultados]({enlace_pagina('resultados')})", unsafe_allow_html=True)
 elif page == "resultados":
     st.set_page_config(page_title="🏆 Resultados del Sorteo", page_icon="🏅", layout="centered")
     resultados_css = """
@@ -984,12 +829,13 @@ elif page == "resultados":
     if st.session_state.premios:
         st.markdown("### 🎁 Premios de la Rifa")
         for idx, premio in enumerate(st.session_state.premios):
-            st.markdown(f"**{idx + 1}.** {premio}")
+            st.markdown(f"**{idx + 1}.** {nombre_premio(premio)}")
         st.markdown("---")
-    if not st.session_state.historial_sorteos:
+    historial = obtener_historial()
+    ultimo_sorteo = historial.ultimo()
+    if not ultimo_sorteo:
         st.info("📭 Los resultados aún no están disponibles. ¡Vuelve después del sorteo!")
     else:
-        ultimo_sorteo = st.session_state.historial_sorteos[-1]
         st.markdown('<div class="premio-actual">', unsafe_allow_html=True)
         st.markdown(f"### 📅 Último Sorteo - {ultimo_sorteo['fecha']}")
         if ultimo_sorteo.get('numero_oficial'):
@@ -1003,7 +849,7 @@ elif page == "resultados":
                 estado_class = "pagado" if estado == "pagado" else "pendiente"
                 st.markdown(f"""
                 <div class="ganador-info">
-                    <h4>🏆 {ultimo_sorteo.get('premio', 'Lotería Nocturna')}</h4>
+                    <h4>🏆 {g.get('premio', ultimo_sorteo.get('premio', 'Lotería Nocturna'))}</h4>
                     <p><strong>🥇 Ganador:</strong> {g['nombre']}</p>
                     <p><strong>🎫 Boleto:</strong> <code>{g['boleto']}</code></p>
                     <p><strong>📍 Ciudad:</strong> {g.get('ciudad', 'No especificada')}</p>
@@ -1015,10 +861,13 @@ elif page == "resultados":
             st.markdown("### 🤷‍♂️ No hubo ganadores")
             st.markdown("En este sorteo no hubo participantes con el número ganador.")
             st.markdown('</div>', unsafe_allow_html=True)
-        if len(st.session_state.historial_sorteos) > 1:
+        total_anteriores = historial.contar() - 1
+        if total_anteriores > 0:
             st.markdown("---")
             st.markdown("### 📜 Historial Anterior")
-            for sorteo in reversed(st.session_state.historial_sorteos[:-1]):
+            paginas = (total_anteriores + SORTEOS_POR_PAGINA - 1) // SORTEOS_POR_PAGINA
+            pagina = st.number_input("Página", min_value=1, max_value=paginas, value=1) - 1 if paginas > 1 else 0
+            for sorteo in historial.pagina(pagina, SORTEOS_POR_PAGINA, excluir_ultimo=True):
                 with st.expander(f"Sorteo del {sorteo['fecha']} - Número: {sorteo.get('numero_oficial', 'N/A')}"):
                     ganadores_hist = sorteo.get("ganadores", [])
                     if ganadores_hist:
@@ -1066,7 +915,6 @@ elif page == "error":
 # ----------------------------
 else:
     st.set_page_config(page_title="🎟️ Panel Admin - Rifa", page_icon="👑", layout="wide")
-    st_autorefresh(interval=1000, key="admin_contador_refresh")
     st.markdown(contador_css, unsafe_allow_html=True)
     st.markdown("""
     <style>
@@ -1096,44 +944,46 @@ else:
     base_url = st.get_option("server.baseUrlPath") or "http://localhost:8501"
     st.markdown(f"""
     **🔗 Enlaces importantes:**
-    - **Registro público:** `{base_url}?page=registro`
-    - **Resultados públicos:** `{base_url}?page=resultados`
+    - **Registro público:** `{base_url}{enlace_pagina('registro')}`
+    - **Resultados públicos:** `{base_url}{enlace_pagina('resultados')}`
     - **Monto de la rifa:** `${MONTO_RIFA}`
     """)
-    next_draw = get_next_draw_time()
-    now_arg = datetime.utcnow() - timedelta(hours=3)
-    diff = next_draw - now_arg
-    if diff.total_seconds() > 0:
-        days = diff.days
-        hours, remainder = divmod(diff.seconds, 3600)
-        minutes, seconds = divmod(remainder, 60)
-        st.markdown('<div class="contador-box">', unsafe_allow_html=True)
-        st.markdown(f"### ⏳ Próximo sorteo en:")
-        st.markdown(
-            f'<p><span class="contador-num">{days}</span>d &nbsp; <span class="contador-num">{hours:02d}</span>h &nbsp; <span class="contador-num">{minutes:02d}</span>m &nbsp; <span class="contador-num">{seconds:02d}</span>s</p>',
-            unsafe_allow_html=True
-        )
-        st.markdown('</div>', unsafe_allow_html=True)
-    else:
-        st.markdown('<div class="contador-box" style="background: linear-gradient(120deg, #ff9a9e 0%, #fad0c4 100%);">', unsafe_allow_html=True)
-        st.markdown("### 🎉 ¡El sorteo ya se realizó hoy! Verifica los resultados oficiales.")
-        st.markdown('</div>', unsafe_allow_html=True)
+    mostrar_contador(
+        "Próximo sorteo en:",
+        "¡El sorteo ya se realizó hoy! Verifica los resultados oficiales.",
+        REFRESCO_ADMIN_SEG
+    )
     with st.sidebar:
+        registro_rifas = obtener_registro()
+        if RIFA_CONFIG["RIFA_ID"]:
+            st.header("🎟️ Rifas")
+            for rifa_id in registro_rifas.ids():
+                nombre = registro_rifas.configuracion(rifa_id)["RIFA_NOMBRE"]
+                st.markdown(f"**▶ {nombre}**" if rifa_id == RIFA_ID else f"[{nombre}](?rifa={rifa_id})")
+            st.caption("En memoria: " + ", ".join(f"{r} ({s} s)" for r, s in registro_rifas.activas()))
         st.header("📁 Gestión de Datos")
-        st.download_button(
-            "💾 Descargar datos (JSON)", 
-            guardar_datos(), 
-            "rifa_datos.json", 
-            "application/json",
-            use_container_width=True
-        )
-        st.download_button(
-            "📊 Exportar participantes (CSV)",
-            exportar_participantes_csv(),
-            "participantes_rifa.csv",
-            "text/csv",
-            use_container_width=True
-        )
+        if not st.session_state.get("exportaciones_preparadas"):
+            if st.button("📦 Preparar exportaciones", use_container_width=True):
+                st.session_state.exportaciones_preparadas = True
+                st.rerun()
+        else:
+            # Se regeneran solo cuando cambia la versión de los datos
+            with open(preparar_exportacion_json(), "rb") as f:
+                st.download_button(
+                    "💾 Descargar datos (JSON)", 
+                    f, 
+                    "rifa_datos.json", 
+                    "application/json",
+                    use_container_width=True
+                )
+            with open(preparar_exportacion_csv(), "rb") as f:
+                st.download_button(
+                    "📊 Exportar participantes (CSV)",
+                    f,
+                    "participantes_rifa.csv",
+                    "text/csv",
+                    use_container_width=True
+                )
         uploaded_json = st.file_uploader("📤 Cargar datos (JSON)", type=["json"])
         if uploaded_json:
             if st.button("🔄 Cargar Datos", use_container_width=True):
@@ -1146,14 +996,28 @@ else:
                 st.success("✅ Backup creado")
             else:
                 st.error("❌ Error creando backup")
-        backup_files = [f for f in os.listdir(CARPETA_BACKUPS) if f.startswith("backup_")]
-        if backup_files:
-            selected_backup = st.selectbox("Seleccionar backup", sorted(backup_files, reverse=True))
+        respaldos = {
+            r["archivo"]: f"{r['fecha'][:19].replace('T', ' ')} · {r['tipo']} · {r['bytes'] / 1024:,.0f} KB"
+            for r in reversed(obtener_respaldos().listar())
+        }
+        respaldos.update({f: f"{f} (formato anterior)" for f in operaciones.respaldos_anteriores(RIFA)})
+        if respaldos:
+            selected_backup = st.selectbox("Seleccionar backup", list(respaldos), format_func=respaldos.get)
             if st.button("🔄 Restaurar Backup", use_container_width=True):
-                if restaurar_backup(os.path.join(CARPETA_BACKUPS, selected_backup)):
+                if restaurar_backup(selected_backup):
                     st.rerun()
+        with st.expander("🧠 Caché de participantes"):
+            st.json(obtener_cache().estadisticas())
+            if st.button("🔎 Verificar estadísticas", use_container_width=True):
+                ok, diferencias = obtener_almacen().verificar_estadisticas(reparar=True)
+                if ok:
+                    st.success("✅ Las estadísticas coinciden con un recálculo completo")
+                else:
+                    st.warning(f"⚠️ Se corrigieron {len(diferencias)} diferencias en las estadísticas")
     with st.expander("📊 Estadísticas Avanzadas", expanded=True):
         mostrar_estadisticas_avanzadas()
+    with st.expander("⏱️ Rendimiento"):
+        mostrar_rendimiento()
     with st.expander("✉️ Mensajes de Notificación"):
         col1, col2 = st.columns(2)
         with col1:
@@ -1175,6 +1039,7 @@ else:
         if st.button("💾 Guardar Mensajes", use_container_width=True):
             st.session_state.mensaje_email = mensaje_email
             st.session_state.mensaje_whatsapp = mensaje_whatsapp
+            operaciones.guardar_plantillas(RIFA, plantillas_mensajes())  # También los usa el programador
             st.success("✅ Mensajes actualizados")
     gestionar_premios()
     st.header("👥 Gestión de Participantes")
@@ -1199,11 +1064,9 @@ else:
                 elif not es_boleto_valido(boleto_norm):
                     st.warning("⚠️ El boleto debe ser un número de 5 dígitos (ej: 01234).")
                 else:
-                    participantes_existentes = cargar_todos_participantes()
-                    if any(p['boleto'] == boleto_norm for p in participantes_existentes):
-                        st.warning("⚠️ Ese boleto ya está registrado.")
+                    if obtener_cache().boleto_ocupado(boleto_norm):
+                        st.warning(f"⚠️ {mensaje_boleto_tomado(boleto_norm)}")
                     else:
-                        enlace_pago = crear_enlace_pago_mercadopago(boleto_norm, nombre.strip(), email.strip())
                         participante = {
                             "nombre": nombre.strip(),
                             "boleto": boleto_norm,
@@ -1214,31 +1077,41 @@ else:
                             "localidad": localidad.strip(),
                             "fecha_registro": datetime.now().isoformat(),
                             "estado_pago": "pendiente",
-                            "id_pago": boleto_norm,
-                            "link_pago": enlace_pago
+                            "id_pago": boleto_norm
                         }
-                        if guardar_participante_archivo(participante):
+                        ok, resultado = registrar_participante(participante)
+                        if ok:
                             st.success("✅ Participante registrado correctamente.")
                             st.rerun()
                         else:
-                            st.error("❌ Error al guardar el participante.")
-    participantes = cargar_todos_participantes()
-    if participantes:
-        st.subheader(f"📋 Lista de Participantes ({len(participantes)})")
+                            st.error(f"❌ {resultado}")
+    total_registrados = sum(obtener_almacen().estadisticas()["estado"].values())
+    if total_registrados:
+        st.subheader(f"📋 Lista de Participantes ({total_registrados})")
         col_search, col_filter = st.columns([2, 1])
         with col_search:
-            search = st.text_input("🔍 Buscar por nombre o boleto")
+            search = st.text_input("🔍 Buscar por nombre, boleto, email o ciudad")
         with col_filter:
             filter_estado = st.selectbox("Filtrar por estado", ["Todos", "Pagado", "Pendiente"])
-        filtered_participantes = participantes
-        if search:
-            filtered_participantes = [
-                p for p in filtered_participantes
-                if search.lower() in p['nombre'].lower() or search in p['boleto']
-            ]
-        if filter_estado != "Todos":
-            estado_filter = "pagado" if filter_estado == "Pagado" else "pendiente"
-            filtered_participantes = [p for p in filtered_participantes if p.get('estado_pago') == estado_filter]
+        estado_filter = {"Pagado": "pagado", "Pendiente": "pendiente"}.get(filter_estado)
+        # Solo se consulta y dibuja la página visible; la búsqueda usa el índice de texto del almacén
+        if st.session_state.get("filtro_participantes") != (search, estado_filter):
+            st.session_state.filtro_participantes = (search, estado_filter)
+            st.session_state.pagina_participantes = 1
+        pagina = st.session_state.get("pagina_participantes", 1)
+        total_filtrados, filtered_participantes = obtener_almacen().buscar(
+            search, estado_filter, (pagina - 1) * PARTICIPANTES_POR_PAGINA, PARTICIPANTES_POR_PAGINA
+        )
+        paginas = max((total_filtrados + PARTICIPANTES_POR_PAGINA - 1) // PARTICIPANTES_POR_PAGINA, 1)
+        if pagina > paginas:
+            st.session_state.pagina_participantes = paginas
+            st.rerun()
+        col_total, col_pagina = st.columns([2, 1])
+        with col_total:
+            st.caption(f"{total_filtrados} coincidencias · página {pagina} de {paginas}")
+        with col_pagina:
+            if paginas > 1:
+                st.number_input("Página", min_value=1, max_value=paginas, key="pagina_participantes")
         for p in filtered_participantes:
             with st.container():
                 col_info, col_actions = st.columns([3, 1])
@@ -1256,15 +1129,8 @@ else:
                 with col_actions:
                     if estado == "pendiente":
                         if st.button("✅ Pagar", key=f"pago_{p['boleto']}", use_container_width=True):
-                            nombre_archivo = f"{p['nombre'].replace(' ', '_')}_{p['boleto']}.json"
-                            ruta = os.path.join(CARPETA_PARTICIPANTES, nombre_archivo)
                             try:
-                                with open(ruta, "r", encoding="utf-8") as f:
-                                    data = json.load(f)
-                                data["estado_pago"] = "pagado"
-                                data["fecha_pago"] = datetime.now().isoformat()
-                                with open(ruta, "w", encoding="utf-8") as f:
-                                    json.dump(data, f, indent=4, default=str, ensure_ascii=False)
+                                marcar_pagado(p['boleto'])
                                 st.success(f"✅ {p['nombre']} marcado como pagado.")
                                 st.rerun()
                             except Exception as e:
@@ -1272,6 +1138,31 @@ else:
                     else:
                         st.button("✅ Pagado", key=f"paid_{p['boleto']}", disabled=True, use_container_width=True)
                 st.markdown("---")
+    with st.expander("🔄 Conciliar Pagos con Mercado Pago"):
+        st.caption("Marca como pagados los boletos con pago aprobado en Mercado Pago que siguen pendientes (por si se perdió algún webhook).")
+        col_dias, col_simular = st.columns(2)
+        with col_dias:
+            dias_conciliacion = st.number_input("Días hacia atrás", min_value=1, max_value=60, value=3)
+        with col_simular:
+            simular_conciliacion = st.checkbox("Solo simular", value=True)
+        if st.button("🔄 Conciliar", use_container_width=True, disabled=not MP_ACCESS_TOKEN):
+            import pandas as pd
+            try:
+                with st.spinner("Consultando pagos en Mercado Pago..."):
+                    reporte = operaciones.conciliar_pagos(RIFA, int(dias_conciliacion), aplicar=not simular_conciliacion)
+                st.success(
+                    f"✅ {reporte['pagos_consultados']} pagos consultados, {len(reporte['marcados'])} boletos "
+                    f"{'a marcar' if simular_conciliacion else 'marcados'} como pagados, {reporte['ya_pagados']} ya estaban pagados"
+                )
+                if reporte["marcados"]:
+                    st.dataframe(pd.DataFrame(reporte["marcados"]), use_container_width=True, hide_index=True)
+                if reporte["sin_participante"]:
+                    st.warning(f"⚠️ {len(reporte['sin_participante'])} pagos aprobados sin participante registrado")
+                    st.dataframe(pd.DataFrame(reporte["sin_participante"]), use_container_width=True, hide_index=True)
+            except Exception as e:
+                st.error(f"❌ Error en la conciliación: {e}")
+        if not MP_ACCESS_TOKEN:
+            st.info("Configura MP_ACCESS_TOKEN para conciliar pagos.")
     with st.expander("📤 Carga Masiva por CSV"):
         st.markdown("""
         **Formato del CSV requerido:**
@@ -1279,65 +1170,36 @@ else:
         - El boleto debe ser de 5 dígitos
         - La primera fila debe ser el encabezado
         """)
-        uploaded_csv = st.file_uploader("Selecciona archivo CSV", type=["csv"], key="csv_up")
-        if uploaded_csv:
+        # Cambiar la clave vacía el selector de archivos después de importar
+        uploaded_csv = st.file_uploader(
+            "Selecciona archivo CSV", type=["csv"], key=f"csv_up_{st.session_state.get('csv_up_version', 0)}"
+        )
+        if uploaded_csv and st.button("📥 Importar CSV", use_container_width=True):
             try:
-                stringio = StringIO(uploaded_csv.getvalue().decode("utf-8"))
-                reader = csv.DictReader(stringio)
-                nuevos, duplicados, errores = 0, 0, 0
-                participantes_existentes = cargar_todos_participantes()
-                boletos_existentes = {p['boleto'] for p in participantes_existentes}
-                progress_bar = st.progress(0)
-                resultados = []
-                rows = list(reader)
-                for i, row in enumerate(rows):
-                    boleto = row.get('boleto', '').strip()
-                    if not boleto:
-                        continue
-                    boleto_norm = normalizar_boleto(boleto)
-                    if not es_boleto_valido(boleto_norm):
-                        resultados.append(f"❌ Boleto inválido: {boleto}")
-                        errores += 1
-                        continue
-                    if boleto_norm in boletos_existentes:
-                        resultados.append(f"⚠️ Boleto duplicado: {boleto_norm}")
-                        duplicados += 1
-                        continue
-                    enlace_pago = crear_enlace_pago_mercadopago(
-                        boleto_norm, 
-                        row.get('nombre', '').strip(), 
-                        row.get('email', '').strip()
-                    )
-                    participante = {
-                        "nombre": row.get('nombre', '').strip(),
-                        "boleto": boleto_norm,
-                        "email": row.get('email', '').strip(),
-                        "telefono": "+" + re.sub(r"[^\d]", "", row.get('telefono', '').strip().lstrip("+")) if row.get('telefono') else "",
-                        "direccion": row.get('direccion', '').strip(),
-                        "ciudad": row.get('ciudad', '').strip(),
-                        "localidad": row.get('localidad', '').strip(),
-                        "fecha_registro": datetime.now().isoformat(),
-                        "estado_pago": "pendiente",
-                        "id_pago": boleto_norm,
-                        "link_pago": enlace_pago
-                    }
-                    if guardar_participante_archivo(participante):
-                        nuevos += 1
-                        boletos_existentes.add(boleto_norm)
-                        resultados.append(f"✅ Agregado: {participante['nombre']} - {boleto_norm}")
-                    else:
-                        errores += 1
-                        resultados.append(f"❌ Error guardando: {participante['nombre']}")
-                    progress_bar.progress((i + 1) / len(rows))
-                st.success(f"✅ Proceso completado: {nuevos} nuevos, {duplicados} duplicados, {errores} errores")
-                with st.expander("Ver detalles del proceso"):
-                    for resultado in resultados:
-                        st.write(resultado)
+                progress_bar = st.progress(0.0)
+                resumen = operaciones.importar_participantes_csv(
+                    RIFA, uploaded_csv,
+                    al_avanzar=lambda filas, fraccion: progress_bar.progress(fraccion, text=f"{filas} filas procesadas"),
+                    al_crear_enlaces=lambda hechos, total: progress_bar.progress(hechos / total, text="Creando enlaces de pago")
+                )
+                st.session_state.resultado_importacion = resumen
+                st.session_state.csv_up_version = st.session_state.get('csv_up_version', 0) + 1
                 st.rerun()
             except Exception as e:
                 st.error(f"❌ Error procesando CSV: {e}")
+        resumen = st.session_state.get("resultado_importacion")
+        if resumen:
+            if resumen.get("repetida"):
+                st.info("ℹ️ Este archivo ya había sido importado; no se volvió a procesar.")
+            st.success(f"✅ Proceso completado: {resumen['nuevos']} nuevos, {resumen['duplicados']} duplicados, {resumen['errores']} errores")
+            if resumen["detalles"]:
+                with st.container(height=200):
+                    for resultado in resumen["detalles"][:1000]:
+                        st.write(resultado)
     with st.expander("⏰ Recordatorios de Pago"):
         enviar_recordatorio_pago()
+    with st.expander("📮 Cola de Notificaciones"):
+        mostrar_cola_notificaciones()
     st.header("🎲 Sistema de Sorteo")
     st.markdown("""
     La **Lotería de Córdoba Nocturna** se realiza **todos los días a las 21:30 hs** (hora Argentina).
@@ -1349,78 +1211,21 @@ else:
             with st.spinner("Buscando resultados oficiales..."):
                 numero_oficial = obtener_numero_nocturna()
             if numero_oficial:
-                st.session_state.numero_ganador_oficial = numero_oficial
-                st.session_state.ultimo_sorteo_verificado = datetime.now().date()
-                st.success(f"✅ Número ganador oficial: **{numero_oficial}**")
-                participantes = cargar_todos_participantes()
-                ganadores = [p for p in participantes if p.get('boleto') == numero_oficial and p.get('estado_pago') == "pagado"]
-                if ganadores:
-                    st.subheader(f"🎉 ¡{len(ganadores)} Ganador(es) Encontrado(s)!")
-                    resumen = []
-                    for g in ganadores:
-                        email_ok, email_msg = False, ""
-                        wa_ok, wa_msg = False, ""
-                        if g.get('email'):
-                            email_ok, email_msg = enviar_email_ganador(
-                                g, "Premio de la Lotería Nocturna", 
-                                st.session_state.mensaje_email.format(
-                                    nombre=g['nombre'], 
-                                    premio="Premio de la Lotería Nocturna",
-                                    boleto=g['boleto']
-                                )
-                            )
-                        if g.get('telefono'):
-                            wa_ok, wa_msg = enviar_whatsapp_ganador(
-                                g, "Premio de la Lotería Nocturna",
-                                st.session_state.mensaje_whatsapp.format(
-                                    nombre=g['nombre'], 
-                                    premio="Premio de la Lotería Nocturna",
-                                    boleto=g['boleto']
-                                )
-                            )
-                        resumen.append({
-                            "ganador": g,
-                            "email_ok": email_ok,
-                            "email_msg": email_msg,
-                            "wa_ok": wa_ok,
-                            "wa_msg": wa_msg
-                        })
-                    st.session_state.historial_sorteos.append({
-                        "fecha": date.today().isoformat(),
-                        "numero_oficial": numero_oficial,
-                        "premio": "Premio de la Lotería Nocturna",
-                        "ganadores": ganadores
-                    })
-                    emails_ok = sum(1 for r in resumen if r["email_ok"])
-                    wa_ok = sum(1 for r in resumen if r["wa_ok"])
-                    st.success(f"📧 Emails enviados: {emails_ok}/{len(ganadores)}")
-                    st.success(f"📱 WhatsApp enviados: {wa_ok}/{len(ganadores)}")
-                    for r in resumen:
-                        g = r["ganador"]
-                        with st.container():
-                            st.markdown(f"**{g['nombre']}** (Boleto: `{g['boleto']}`)")
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                if r["email_ok"]:
-                                    st.success("✅ Email enviado")
-                                else:
-                                    st.error(f"❌ Email: {r['email_msg']}")
-                            with col2:
-                                if r["wa_ok"]:
-                                    st.success("✅ WhatsApp enviado")
-                                else:
-                                    st.error(f"❌ WhatsApp: {r['wa_msg']}")
-                    st.balloons()
-                else:
-                    st.info("ℹ️ No hay participantes **pagos** con el número ganador.")
-                    st.session_state.historial_sorteos.append({
-                        "fecha": date.today().isoformat(),
-                        "numero_oficial": numero_oficial,
-                        "premio": "Premio de la Lotería Nocturna",
-                        "ganadores": []
-                    })
+                resolver_sorteo(numero_oficial)
             else:
-                st.error("❌ No se pudo obtener el número ganador. Intenta después de las 21:30 hs.")
+                st.error("❌ No se pudo confirmar el número ganador. Intenta después de las 21:30 hs o ingrésalo a mano.")
+        with st.form("resultado_manual"):
+            st.caption("¿Las fuentes no confirman el resultado? Ingresa el número oficial de la Nocturna:")
+            col_numero, col_fecha = st.columns(2)
+            numero_manual = col_numero.text_input("Número oficial (5 cifras)")
+            fecha_manual = col_fecha.date_input("Fecha del sorteo", value=hora_argentina().date())
+            if st.form_submit_button("✍️ Registrar resultado y sortear"):
+                try:
+                    numero_oficial = obtener_proveedor_resultados().guardar_manual(fecha_manual.isoformat(), numero_manual)
+                except ValueError as e:
+                    st.error(f"❌ {e}")
+                else:
+                    resolver_sorteo(numero_oficial, fecha_manual.isoformat())
     with col_info:
         if st.session_state.numero_ganador_oficial:
             st.markdown(f"### 🎯 Último número ganador: **{st.session_state.numero_ganador_oficial}**")
@@ -1428,9 +1233,9 @@ else:
                 st.caption(f"Verificado el {st.session_state.ultimo_sorteo_verificado}")
         else:
             st.info("👉 Haz clic en 'Verificar resultados oficiales' después de las 21:30 hs.")
-    if st.session_state.historial_sorteos:
+    ultimo_sorteo = obtener_historial().ultimo()
+    if ultimo_sorteo:
         st.header("📜 Historial de Resultados")
-        ultimo_sorteo = st.session_state.historial_sorteos[-1]
         st.subheader(f"Último sorteo: {ultimo_sorteo.get('fecha', 'N/A')}")
         if ultimo_sorteo.get("ganadores"):
             for g in ultimo_sorteo["ganadores"]:
@@ -1438,7 +1243,7 @@ else:
                 estado_color = "pagado" if estado == "pagado" else "pendiente"
                 st.markdown(f"""
                 <div class="resultado-card">
-                    <h4>🎁 {ultimo_sorteo.get('premio', 'Lotería Nocturna')}</h4>
+                    <h4>🎁 {g.get('premio', ultimo_sorteo.get('premio', 'Lotería Nocturna'))}</h4>
                     <p><strong>Ganador:</strong> {g['nombre']} (Boleto: {g['boleto']}) <span class='estado-pago estado-{estado_color}'>[{estado}]</span></p>
                     <p>📧 {g['email'] or '—'} | 📞 {g['telefono'] or '—'}</p>
                     <p>📍 {g['direccion'] or '—'}, {g['ciudad']} {g['localidad']}</p>
@@ -1446,23 +1251,21 @@ else:
                 """, unsafe_allow_html=True)
         else:
             st.info("No hubo ganadores en el último sorteo.")
-        st.download_button(
-            "📥 Descargar Historial Completo (CSV)",
-            exportar_resultados_csv(st.session_state.historial_sorteos),
-            "historial_resultados_rifa.csv",
-            "text/csv",
-            use_container_width=True
-        )
+        with open(exportar_resultados_csv(), "rb") as f:
+            st.download_button(
+                "📥 Descargar Historial Completo (CSV)",
+                f,
+                "historial_resultados_rifa.csv",
+                "text/csv",
+                use_container_width=True
+            )
     st.markdown("---")
     st.header("⚠️ Gestión de Riesgos")
     col1, col2 = st.columns(2)
     with col1:
         if st.button("🔄 Reiniciar Participantes", use_container_width=True):
             if st.checkbox("CONFIRMAR: Eliminar todos los participantes"):
-                import shutil
-                shutil.rmtree(CARPETA_PARTICIPANTES)
-                os.makedirs(CARPETA_PARTICIPANTES, exist_ok=True)
-                st.session_state.historial_sorteos = []
+                operaciones.reiniciar(RIFA)
                 st.success("✅ Participantes y resultados reiniciados.")
                 st.rerun()
     with col2:
@@ -1473,13 +1276,7 @@ else:
         if st.session_state.confirmar_todo:
             if st.checkbox("CONFIRMAR REINICIO TOTAL: Esto borrará TODOS los datos"):
                 if st.button("🔥 EJECUTAR REINICIO TOTAL", type="primary", use_container_width=True):
-                    import shutil
-                    shutil.rmtree(CARPETA_PARTICIPANTES)
-                    os.makedirs(CARPETA_PARTICIPANTES, exist_ok=True)
-                    shutil.rmtree(CARPETA_BACKUPS)
-                    os.makedirs(CARPETA_BACKUPS, exist_ok=True)
-                    if os.path.exists("premios.json"):
-                        os.remove("premios.json")
+                    operaciones.reiniciar(RIFA, todo=True)
                     for key in list(st.session_state.keys()):
                         del st.session_state[key]
                     st.success("✅ Sistema reiniciado completamente.")
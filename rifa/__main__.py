@@ -0,0 +1,132 @@
+import argparse
+import json
+import logging
+import shutil
+import sys
+from rifa import operaciones
+from rifa.config import RIFA_POR_DEFECTO, cargar_configuracion, configuracion_desde_argumentos
+from rifa.rifas import ContextoRifa
+logger = logging.getLogger(__name__)
+# ----------------------------
+# LÍNEA DE COMANDOS PARA OPERACIONES MASIVAS (SIN STREAMLIT)
+# ----------------------------
+# python -m rifa [--rifa ID] importar participantes.csv | rifa_datos.json
+# python -m rifa [--rifa ID] exportar {participantes,resultados,json} [--salida RUTA]
+# python -m rifa [--rifa ID] respaldar [--instantanea]
+# python -m rifa [--rifa ID] restaurar ARCHIVO
+# python -m rifa [--rifa ID] conciliar [--dias N] [--simular]
+# python -m rifa [--rifa ID] sortear [--fecha YYYY-MM-DD] [--numero N]
+# python -m rifa [--rifa ID] notificar [--recordatorios] [--whatsapp] [--sin-email]
+def imprimir(datos):
+    print(json.dumps(datos, indent=2, ensure_ascii=False, default=str))
+def abrir_rifa(rifa_id):
+    config = configuracion_desde_argumentos(cargar_configuracion(), rifa_id)
+    # Un comando termina al hacer su trabajo: sin respaldos programados ni enlaces de pago en segundo plano
+    config = {**config, "BACKUP_INTERVALO_MIN": 0, "MP_ENLACE_DIFERIDO": False}
+    return ContextoRifa(config["RIFA_ID"] or RIFA_POR_DEFECTO, config)
+def importar(rifa, args):
+    if args.archivo.lower().endswith(".json"):
+        with open(args.archivo, "r", encoding="utf-8") as f:
+            premios, _ = operaciones.importar_datos(rifa, json.load(f))
+        return {"participantes": rifa.almacen().contar(), "premios": len(premios), "sorteos": rifa.historial().contar()}
+    with open(args.archivo, "rb") as f:
+        resumen = operaciones.importar_participantes_csv(
+            rifa, f, al_avanzar=lambda filas, _: logger.info(f"{filas} filas procesadas")
+        )
+    resumen["detalles"] = resumen["detalles"][:args.detalles]
+    return resumen
+def exportar(rifa, args):
+    generar = {
+        "participantes": operaciones.exportar_participantes_csv,
+        "resultados": operaciones.exportar_resultados_csv,
+        "json": operaciones.exportar_json,
+    }[args.tipo]
+    ruta = generar(rifa)
+    if args.salida:
+        ruta = shutil.copyfile(ruta, args.salida)
+    return {"archivo": ruta}
+def respaldar(rifa, args):
+    return operaciones.crear_respaldo(rifa, forzar_instantanea=args.instantanea) or {"archivo": None, "motivo": "sin cambios"}
+def restaurar(rifa, args):
+    datos = operaciones.restaurar_respaldo(rifa, args.archivo)
+    return {
+        "participantes": rifa.almacen().contar(),
+        "premios": len(datos.get("premios", [])),
+        "sorteos": len(datos.get("historial_sorteos", [])),
+    }
+def conciliar(rifa, args):
+    return operaciones.conciliar_pagos(rifa, args.dias, aplicar=not args.simular)
+def sortear(rifa, args):
+    from rifa.resultados import ProveedorResultados, fuentes_desde_config
+    from rifa.sorteo import hora_argentina
+    proveedor = ProveedorResultados(rifa.config["RUTA_RESULTADOS"], fuentes_desde_config(rifa.config["RESULTADOS_FUENTES"]))
+    fecha = args.fecha or hora_argentina().date().isoformat()
+    if args.numero:
+        # El número indicado queda como resultado oficial de la fecha (también para el programador)
+        try:
+            numero = proveedor.guardar_manual(fecha, args.numero)
+        except ValueError as e:
+            raise SystemExit(str(e))
+    else:
+        numero = proveedor.obtener(fecha)
+        if not numero:
+            raise SystemExit("No se pudo confirmar el resultado oficial de esa fecha; indícalo con --numero")
+    sorteo, nuevo, avisos = operaciones.realizar_sorteo(rifa, numero, fecha)
+    return {**sorteo, "nuevo": nuevo, "avisos_encolados": avisos}
+def notificar(rifa, args):
+    resultado = {}
+    if args.recordatorios:
+        nuevos, total = operaciones.encolar_recordatorios(
+            rifa, args.asunto, por_email=not args.sin_email, por_whatsapp=args.whatsapp
+        )
+        resultado["recordatorios_encolados"] = nuevos
+        resultado["recordatorios_repetidos"] = total - nuevos
+    if not args.solo_encolar:
+        resultado["enviados"] = operaciones.enviar_notificaciones(rifa, args.lote)
+    resultado["cola"] = rifa.cola().resumen()
+    return resultado
+def crear_parser():
+    parser = argparse.ArgumentParser(prog="python -m rifa", description="Operaciones de la rifa sin la interfaz web")
+    parser.add_argument("--rifa", help="Id de la rifa (ver RIFAS_ARCHIVO); por defecto la primera")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    p = comandos.add_parser("importar", help="Importa participantes (CSV) o una exportación completa (JSON)")
+    p.add_argument("archivo")
+    p.add_argument("--detalles", type=int, default=50, help="Máximo de filas rechazadas a listar")
+    p.set_defaults(funcion=importar)
+    p = comandos.add_parser("exportar", help="Genera la exportación de participantes, resultados o datos completos")
+    p.add_argument("tipo", choices=["participantes", "resultados", "json"])
+    p.add_argument("--salida", help="Copiar el archivo generado a esta ruta")
+    p.set_defaults(funcion=exportar)
+    p = comandos.add_parser("respaldar", help="Crea un respaldo (delta o instantánea)")
+    p.add_argument("--instantanea", action="store_true", help="Forzar una instantánea completa")
+    p.set_defaults(funcion=respaldar)
+    p = comandos.add_parser("restaurar", help="Restaura un respaldo de la carpeta de backups")
+    p.add_argument("archivo")
+    p.set_defaults(funcion=restaurar)
+    p = comandos.add_parser("conciliar", help="Concilia los pagos aprobados en Mercado Pago")
+    p.add_argument("--dias", type=int, default=3, help="Días hacia atrás a consultar")
+    p.add_argument("--simular", action="store_true", help="Solo informar, sin marcar pagos")
+    p.set_defaults(funcion=conciliar)
+    p = comandos.add_parser("sortear", help="Resuelve un sorteo y encola los avisos a ganadores")
+    p.add_argument("--fecha", help="Fecha del sorteo (YYYY-MM-DD); por defecto hoy")
+    p.add_argument("--numero", help="Número oficial (queda guardado como resultado de la fecha); si se omite se consulta en las fuentes")
+    p.set_defaults(funcion=sortear)
+    p = comandos.add_parser("notificar", help="Envía la cola de notificaciones (y opcionalmente encola recordatorios)")
+    p.add_argument("--recordatorios", action="store_true", help="Encolar recordatorios para los pendientes de pago")
+    p.add_argument("--asunto", default="Recordatorio de Pago - Rifa")
+    p.add_argument("--whatsapp", action="store_true", help="Recordatorios también por WhatsApp")
+    p.add_argument("--sin-email", action="store_true", help="Recordatorios sin email")
+    p.add_argument("--solo-encolar", action="store_true", help="No enviar; lo hará el worker")
+    p.add_argument("--lote", type=int, default=50, help="Trabajos por lote")
+    p.set_defaults(funcion=notificar)
+    return parser
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    rifa = abrir_rifa(args.rifa)
+    try:
+        imprimir(args.funcion(rifa, args))
+    finally:
+        rifa.cerrar()
+if __name__ == "__main__":
+    main()
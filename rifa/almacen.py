@@ -0,0 +1,527 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+logger = logging.getLogger(__name__)
+# ----------------------------
+# ALMACÉN DE PARTICIPANTES (SQLITE EN MODO WAL)
+# ----------------------------
+COLUMNAS_INDEXADAS = ("nombre", "email", "telefono", "ciudad", "localidad", "fecha_registro", "estado_pago")
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS participantes (
+    boleto TEXT PRIMARY KEY,
+    nombre TEXT NOT NULL DEFAULT '',
+    email TEXT NOT NULL DEFAULT '',
+    telefono TEXT NOT NULL DEFAULT '',
+    ciudad TEXT NOT NULL DEFAULT '',
+    localidad TEXT NOT NULL DEFAULT '',
+    fecha_registro TEXT NOT NULL DEFAULT '',
+    estado_pago TEXT NOT NULL DEFAULT 'pendiente',
+    datos TEXT NOT NULL,
+    rev INTEGER NOT NULL DEFAULT 0
+);
+-- Índices con el orden del listado: una página filtrada por estado se lee directo del índice
+CREATE INDEX IF NOT EXISTS idx_participantes_estado_orden ON participantes(estado_pago, fecha_registro, boleto);
+CREATE INDEX IF NOT EXISTS idx_participantes_orden ON participantes(fecha_registro, boleto);
+CREATE INDEX IF NOT EXISTS idx_participantes_ciudad ON participantes(ciudad);
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS borrados (
+    boleto TEXT PRIMARY KEY,
+    rev INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS importaciones (
+    huella TEXT PRIMARY KEY,
+    fecha TEXT NOT NULL,
+    resumen TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reservas (
+    boleto TEXT PRIMARY KEY,
+    expira REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS estadisticas (
+    dimension TEXT NOT NULL,
+    clave TEXT NOT NULL,
+    cantidad INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, clave)
+);
+INSERT OR IGNORE INTO meta (clave, valor) VALUES ('rev', 0);
+INSERT OR IGNORE INTO meta (clave, valor) VALUES ('epoca', 0);
+"""
+# Cada escritura incrementa el contador global 'rev' y lo estampa en la fila, para que
+# las cachés recarguen solo lo modificado (los borrados quedan registrados en 'borrados').
+_SIGUIENTE_REV = """
+    UPDATE meta SET valor = CAST(valor AS INTEGER) + 1 WHERE clave = 'rev';
+"""
+_REV_ACTUAL = "(SELECT CAST(valor AS INTEGER) FROM meta WHERE clave = 'rev')"
+DISPARADORES = f"""
+CREATE INDEX IF NOT EXISTS idx_participantes_rev ON participantes(rev);
+CREATE TRIGGER IF NOT EXISTS trg_participantes_insert AFTER INSERT ON participantes BEGIN
+    {_SIGUIENTE_REV}
+    UPDATE participantes SET rev = {_REV_ACTUAL} WHERE boleto = NEW.boleto;
+    DELETE FROM borrados WHERE boleto = NEW.boleto;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_participantes_update
+AFTER UPDATE OF nombre, email, telefono, ciudad, localidad, fecha_registro, estado_pago, datos ON participantes BEGIN
+    {_SIGUIENTE_REV}
+    UPDATE participantes SET rev = {_REV_ACTUAL} WHERE boleto = NEW.boleto;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_participantes_delete AFTER DELETE ON participantes BEGIN
+    {_SIGUIENTE_REV}
+    INSERT OR REPLACE INTO borrados (boleto, rev) VALUES (OLD.boleto, {_REV_ACTUAL});
+END;
+"""
+# Agregados de estadísticas (por estado de pago, día de registro y ciudad) mantenidos por
+# disparadores en la misma transacción que cada escritura.
+DIMENSIONES_ESTADISTICAS = {
+    "estado": "{fila}estado_pago",
+    "dia": "substr({fila}fecha_registro, 1, 10)",
+    "ciudad": "{fila}ciudad",
+}
+def _sumar_estadisticas(fila, delta):
+    return "".join(
+        f"""
+    INSERT INTO estadisticas (dimension, clave, cantidad) VALUES ('{dimension}', {expresion.format(fila=fila + ".")}, {delta})
+        ON CONFLICT(dimension, clave) DO UPDATE SET cantidad = cantidad + ({delta});"""
+        for dimension, expresion in DIMENSIONES_ESTADISTICAS.items()
+    )
+DISPARADORES_ESTADISTICAS = f"""
+CREATE TRIGGER IF NOT EXISTS trg_estadisticas_insert AFTER INSERT ON participantes BEGIN
+    {_sumar_estadisticas("NEW", 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS trg_estadisticas_update
+AFTER UPDATE OF estado_pago, fecha_registro, ciudad ON participantes BEGIN
+    {_sumar_estadisticas("OLD", -1)}
+    {_sumar_estadisticas("NEW", 1)}
+    DELETE FROM estadisticas WHERE cantidad = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_estadisticas_delete AFTER DELETE ON participantes BEGIN
+    {_sumar_estadisticas("OLD", -1)}
+    DELETE FROM estadisticas WHERE cantidad = 0;
+END;
+"""
+# Índice de texto (FTS5) de nombre, boleto, email y ciudad. No usa disparadores (FTS5 dentro de un
+# disparador vacía su búfer en cada fila y duplica el costo de las importaciones): se pone al día
+# por lotes antes de cada búsqueda con los registros cuyo 'rev' es posterior al último indexado.
+COLUMNAS_BUSQUEDA = ("boleto", "nombre", "email", "ciudad", "localidad")
+ESQUEMA_BUSQUEDA = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS busqueda USING fts5(
+    {', '.join(COLUMNAS_BUSQUEDA)}, tokenize='unicode61 remove_diacritics 2'
+);
+"""
+def expresion_busqueda(texto):
+    """Consulta FTS5 para el texto buscado: cada palabra como prefijo y todas requeridas"""
+    terminos = []
+    for palabra in re.findall(r"\w+", texto.lower()):
+        termino = f'"{palabra}"*'
+        if palabra.isdigit() and len(palabra) < 5:
+            # "123" también encuentra el boleto 00123
+            termino = f'({termino} OR "{palabra.zfill(5)}")'
+        terminos.append(termino)
+    return " AND ".join(terminos)
+_COLUMNAS = ("boleto",) + COLUMNAS_INDEXADAS + ("datos",)
+_INSERT = f"INTO participantes ({', '.join(_COLUMNAS)}) VALUES ({', '.join('?' * len(_COLUMNAS))})"
+_UPSERT = f"INSERT {_INSERT} ON CONFLICT(boleto) DO UPDATE SET " + ", ".join(
+    f"{col} = excluded.{col}" for col in _COLUMNAS[1:]
+)
+def _fila(participante):
+    """Convierte un participante en la tupla de columnas de la tabla"""
+    valores = [str(participante.get(col) or "") for col in COLUMNAS_INDEXADAS]
+    if not valores[COLUMNAS_INDEXADAS.index("estado_pago")]:
+        valores[COLUMNAS_INDEXADAS.index("estado_pago")] = "pendiente"
+    datos = json.dumps(participante, default=str, ensure_ascii=False)
+    return (str(participante["boleto"]), *valores, datos)
+class AlmacenParticipantes:
+    """Almacén de participantes con búsqueda O(1) por boleto y consultas indexadas"""
+    def __init__(self, ruta_bd, carpeta_legado=None):
+        self.ruta_bd = ruta_bd
+        self._local = threading.local()
+        directorio = os.path.dirname(os.path.abspath(ruta_bd))
+        os.makedirs(directorio, exist_ok=True)
+        conn = self._conexion()
+        conn.executescript(ESQUEMA)
+        conn.executescript(DISPARADORES)
+        conn.executescript(DISPARADORES_ESTADISTICAS)
+        if not self._meta("estadisticas"):
+            with self._transaccion() as conn:
+                self._recalcular_estadisticas(conn)
+                conn.execute("INSERT OR REPLACE INTO meta (clave, valor) VALUES ('estadisticas', '1')")
+        self.busqueda_indexada = self._preparar_busqueda()
+        if carpeta_legado:
+            self.migrar_desde_carpeta(carpeta_legado)
+    def _preparar_busqueda(self):
+        """Crea el índice de texto; False si este SQLite no trae FTS5 (se busca con LIKE)"""
+        try:
+            self._conexion().executescript(ESQUEMA_BUSQUEDA)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Búsqueda de participantes sin índice de texto: {e}")
+            return False
+        return True
+    def _conexion(self):
+        """Devuelve la conexión SQLite del hilo actual (una por hilo)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.ruta_bd, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    def _transaccion(self):
+        """Abre una transacción de escritura (BEGIN IMMEDIATE)"""
+        return _Transaccion(self._conexion())
+    def lote(self):
+        """Agrupa varias escrituras del hilo en una sola transacción (un único commit)"""
+        return self._transaccion()
+    # --- Lectura ---
+    def obtener(self, boleto):
+        """Devuelve el participante con ese boleto o None"""
+        fila = self._conexion().execute(
+            "SELECT datos FROM participantes WHERE boleto = ?", (boleto,)
+        ).fetchone()
+        return json.loads(fila["datos"]) if fila else None
+    def existe(self, boleto):
+        """Indica si el boleto ya está registrado"""
+        fila = self._conexion().execute(
+            "SELECT 1 FROM participantes WHERE boleto = ?", (boleto,)
+        ).fetchone()
+        return fila is not None
+    def listar(self, estado_pago=None, ciudad=None, boleto_desde=None, boleto_hasta=None,
+               fecha_desde=None, fecha_hasta=None):
+        """Lista participantes filtrados, ordenados por fecha de registro"""
+        condiciones, parametros = [], []
+        for columna, operador, valor in (
+            ("estado_pago", "=", estado_pago),
+            ("ciudad", "=", ciudad),
+            ("boleto", ">=", boleto_desde),
+            ("boleto", "<=", boleto_hasta),
+            ("fecha_registro", ">=", fecha_desde),
+            ("fecha_registro", "<=", fecha_hasta),
+        ):
+            if valor is not None:
+                condiciones.append(f"{columna} {operador} ?")
+                parametros.append(valor)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        filas = self._conexion().execute(
+            f"SELECT datos FROM participantes {where} ORDER BY fecha_registro, boleto", parametros
+        )
+        return [json.loads(fila["datos"]) for fila in filas]
+    def _sincronizar_busqueda(self):
+        """Indexa los participantes modificados desde la última búsqueda (todos si cambió la época)"""
+        version = list(self.version())
+        if [self._meta("busqueda_epoca"), self._meta("busqueda_rev")] == [str(v) for v in version]:
+            return
+        with self._transaccion() as conn:
+            epoca, rev = self.version()
+            desde = int(self._meta("busqueda_rev") or 0)
+            completa = self._meta("busqueda_epoca") != str(epoca)
+            columnas = ", ".join(COLUMNAS_BUSQUEDA)
+            if completa:
+                conn.execute("DELETE FROM busqueda")
+                desde = -1
+            elif conn.execute("SELECT 1 FROM borrados WHERE rev > ? LIMIT 1", (desde,)).fetchone():
+                conn.execute("DELETE FROM busqueda WHERE rowid NOT IN (SELECT rowid FROM participantes)")
+            filas = conn.execute(
+                f"SELECT rowid, {columnas} FROM participantes WHERE rev > ?", (desde,)
+            ).fetchall()
+            if not completa:
+                conn.executemany("DELETE FROM busqueda WHERE rowid = ?", [(fila[0],) for fila in filas])
+            conn.executemany(
+                f"INSERT INTO busqueda (rowid, {columnas}) VALUES ({', '.join('?' * (len(COLUMNAS_BUSQUEDA) + 1))})",
+                [tuple(fila) for fila in filas],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO meta (clave, valor) VALUES (?, ?)",
+                [("busqueda_epoca", str(epoca)), ("busqueda_rev", str(rev))],
+            )
+    def buscar(self, texto="", estado_pago=None, offset=0, limite=50):
+        """Página de participantes por nombre, boleto, email o ciudad; devuelve (total, participantes)"""
+        conn = self._conexion()
+        condiciones, parametros = [], []
+        expresion = expresion_busqueda(texto)
+        if expresion and self.busqueda_indexada:
+            self._sincronizar_busqueda()
+            condiciones.append("rowid IN (SELECT rowid FROM busqueda WHERE busqueda MATCH ?)")
+            parametros.append(expresion)
+        elif expresion:
+            patron = f"%{texto.strip()}%"
+            condiciones.append("(nombre LIKE ? OR boleto LIKE ? OR email LIKE ? OR ciudad LIKE ?)")
+            parametros.extend([patron] * 4)
+        if estado_pago is not None:
+            condiciones.append("estado_pago = ?")
+            parametros.append(estado_pago)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        if expresion:
+            total = conn.execute(f"SELECT COUNT(*) FROM participantes {where}", parametros).fetchone()[0]
+        else:
+            # Sin texto el total sale de los agregados por estado, sin recorrer la tabla
+            total = conn.execute(
+                "SELECT COALESCE(SUM(cantidad), 0) FROM estadisticas WHERE dimension = 'estado'"
+                + (" AND clave = ?" if estado_pago is not None else ""),
+                parametros,
+            ).fetchone()[0]
+        filas = conn.execute(
+            f"SELECT datos FROM participantes {where} ORDER BY fecha_registro, boleto LIMIT ? OFFSET ?",
+            (*parametros, limite, offset),
+        )
+        return total, [json.loads(fila["datos"]) for fila in filas]
+    def boletos(self):
+        """Conjunto de todos los boletos registrados"""
+        return {fila[0] for fila in self._conexion().execute("SELECT boleto FROM participantes")}
+    def estados_pago(self, boletos):
+        """Devuelve {boleto: estado_pago} de los boletos registrados entre los indicados"""
+        boletos = list(boletos)
+        estados = {}
+        conn = self._conexion()
+        for i in range(0, len(boletos), 500):
+            bloque = boletos[i:i + 500]
+            estados.update(conn.execute(
+                f"SELECT boleto, estado_pago FROM participantes WHERE boleto IN ({', '.join('?' * len(bloque))})",
+                bloque,
+            ).fetchall())
+        return estados
+    def contar(self, estado_pago=None):
+        """Cuenta participantes, opcionalmente por estado de pago"""
+        if estado_pago is None:
+            fila = self._conexion().execute("SELECT COUNT(*) FROM participantes").fetchone()
+        else:
+            fila = self._conexion().execute(
+                "SELECT COUNT(*) FROM participantes WHERE estado_pago = ?", (estado_pago,)
+            ).fetchone()
+        return fila[0]
+    def version(self):
+        """Devuelve (epoca, rev): cambia con cada escritura; la época solo con borrados masivos"""
+        filas = dict(self._conexion().execute(
+            "SELECT clave, CAST(valor AS INTEGER) FROM meta WHERE clave IN ('epoca', 'rev')"
+        ).fetchall())
+        return filas.get("epoca", 0), filas.get("rev", 0)
+    def cambios_desde(self, rev):
+        """Devuelve los participantes modificados y los boletos borrados después de 'rev'"""
+        conn = self._conexion()
+        modificados = [
+            json.loads(fila["datos"])
+            for fila in conn.execute("SELECT datos FROM participantes WHERE rev > ?", (rev,))
+        ]
+        borrados = [fila["boleto"] for fila in conn.execute("SELECT boleto FROM borrados WHERE rev > ?", (rev,))]
+        return modificados, borrados
+    def leer_cambios(self, rev_desde=0, tamano_bloque=1000):
+        """Genera ('version', (epoca, rev)), bloques ('participantes', [...]) y ('borrados', [...]) posteriores a 'rev_desde'"""
+        # Conexión propia con una transacción de lectura: todo sale de la misma instantánea
+        conn = sqlite3.connect(self.ruta_bd, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN")
+            yield "version", tuple(
+                conn.execute(
+                    "SELECT CAST(valor AS INTEGER) FROM meta WHERE clave = ?", (clave,)
+                ).fetchone()[0]
+                for clave in ("epoca", "rev")
+            )
+            cursor = conn.execute("SELECT datos FROM participantes WHERE rev > ? ORDER BY rev", (rev_desde,))
+            while True:
+                filas = cursor.fetchmany(tamano_bloque)
+                if not filas:
+                    break
+                yield "participantes", [json.loads(fila[0]) for fila in filas]
+            if rev_desde:
+                borrados = [fila[0] for fila in conn.execute("SELECT boleto FROM borrados WHERE rev > ?", (rev_desde,))]
+                if borrados:
+                    yield "borrados", borrados
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+    # --- Estadísticas ---
+    def estadisticas(self):
+        """Agregados precalculados: {'estado': {...}, 'dia': {...}, 'ciudad': {...}}"""
+        resultado = {dimension: {} for dimension in DIMENSIONES_ESTADISTICAS}
+        for fila in self._conexion().execute("SELECT dimension, clave, cantidad FROM estadisticas WHERE cantidad > 0"):
+            resultado.setdefault(fila["dimension"], {})[fila["clave"]] = fila["cantidad"]
+        return resultado
+    def _contar_por_dimension(self, conn):
+        """Recalcula los agregados desde la tabla de participantes"""
+        return {
+            dimension: dict(conn.execute(
+                f"SELECT {expresion.format(fila='')}, COUNT(*) FROM participantes GROUP BY 1"
+            ).fetchall())
+            for dimension, expresion in DIMENSIONES_ESTADISTICAS.items()
+        }
+    def _recalcular_estadisticas(self, conn):
+        conn.execute("DELETE FROM estadisticas")
+        for dimension, conteos in self._contar_por_dimension(conn).items():
+            conn.executemany(
+                "INSERT INTO estadisticas (dimension, clave, cantidad) VALUES (?, ?, ?)",
+                [(dimension, clave, cantidad) for clave, cantidad in conteos.items()],
+            )
+    def verificar_estadisticas(self, reparar=False):
+        """Compara los agregados con un recálculo completo; devuelve (ok, diferencias)"""
+        with self._transaccion() as conn:
+            esperadas = self._contar_por_dimension(conn)
+            actuales = self.estadisticas()
+            diferencias = [
+                (dimension, clave, actuales.get(dimension, {}).get(clave, 0), cantidad)
+                for dimension in DIMENSIONES_ESTADISTICAS
+                for clave in set(esperadas[dimension]) | set(actuales.get(dimension, {}))
+                if (cantidad := esperadas[dimension].get(clave, 0)) != actuales.get(dimension, {}).get(clave, 0)
+            ]
+            if diferencias and reparar:
+                self._recalcular_estadisticas(conn)
+                logger.warning(f"Estadísticas corregidas: {len(diferencias)} diferencias")
+        return not diferencias, diferencias
+    # --- Escritura ---
+    def guardar(self, participante):
+        """Inserta o actualiza un participante"""
+        self.guardar_muchos([participante])
+    def guardar_muchos(self, participantes):
+        """Inserta o actualiza varios participantes en una sola transacción"""
+        filas = [_fila(p) for p in participantes]
+        with self._transaccion() as conn:
+            conn.executemany(_UPSERT, filas)
+        return len(filas)
+    def insertar(self, participante):
+        """Inserta un participante nuevo; devuelve False si el boleto ya existe"""
+        try:
+            with self._transaccion() as conn:
+                conn.execute(f"INSERT {_INSERT}", _fila(participante))
+            return True
+        except sqlite3.IntegrityError:
+            return False
+    def insertar_muchos(self, participantes):
+        """Inserta en una transacción los participantes cuyo boleto esté libre; devuelve los insertados"""
+        insertados = []
+        with self._transaccion() as conn:
+            for participante in participantes:
+                if conn.execute(f"INSERT OR IGNORE {_INSERT}", _fila(participante)).rowcount:
+                    insertados.append(participante)
+        return insertados
+    # --- Importaciones (idempotentes por huella del archivo) ---
+    def importacion_registrada(self, huella):
+        """Resumen de una importación anterior del mismo archivo, o None"""
+        fila = self._conexion().execute("SELECT resumen FROM importaciones WHERE huella = ?", (huella,)).fetchone()
+        return json.loads(fila["resumen"]) if fila else None
+    def registrar_importacion(self, huella, resumen):
+        with self._transaccion() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO importaciones (huella, fecha, resumen) VALUES (?, ?, ?)",
+                (huella, datetime.now().isoformat(), json.dumps(resumen, ensure_ascii=False)),
+            )
+    # --- Reservas (reservar y luego confirmar, de forma atómica) ---
+    def reservar(self, boleto, segundos=300):
+        """Reserva un boleto libre durante unos segundos; devuelve False si está tomado"""
+        ahora = time.time()
+        with self._transaccion() as conn:
+            conn.execute("DELETE FROM reservas WHERE expira < ?", (ahora,))
+            tomado = conn.execute(
+                "SELECT 1 FROM participantes WHERE boleto = ? UNION ALL SELECT 1 FROM reservas WHERE boleto = ?",
+                (boleto, boleto),
+            ).fetchone()
+            if tomado:
+                return False
+            conn.execute("INSERT INTO reservas (boleto, expira) VALUES (?, ?)", (boleto, ahora + segundos))
+        return True
+    def confirmar_reserva(self, participante):
+        """Registra al participante del boleto reservado y libera la reserva"""
+        try:
+            with self._transaccion() as conn:
+                conn.execute(f"INSERT {_INSERT}", _fila(participante))
+                conn.execute("DELETE FROM reservas WHERE boleto = ?", (participante["boleto"],))
+            return True
+        except sqlite3.IntegrityError:
+            self.liberar_reserva(participante["boleto"])
+            return False
+    def liberar_reserva(self, boleto):
+        """Libera una reserva sin registrar al participante"""
+        with self._transaccion() as conn:
+            conn.execute("DELETE FROM reservas WHERE boleto = ?", (boleto,))
+    def actualizar(self, boleto, cambios):
+        """Aplica cambios a un participante existente; devuelve el registro actualizado o None"""
+        with self._transaccion() as conn:
+            fila = conn.execute("SELECT datos FROM participantes WHERE boleto = ?", (boleto,)).fetchone()
+            if not fila:
+                return None
+            participante = json.loads(fila["datos"])
+            participante.update(cambios)
+            conn.execute(_UPSERT, _fila(participante))
+        return participante
+    def actualizar_muchos(self, cambios_por_boleto):
+        """Aplica {boleto: cambios} en una sola transacción; devuelve los registros actualizados"""
+        actualizados = []
+        with self._transaccion() as conn:
+            for boleto, cambios in cambios_por_boleto.items():
+                fila = conn.execute("SELECT datos FROM participantes WHERE boleto = ?", (boleto,)).fetchone()
+                if not fila:
+                    continue
+                participante = json.loads(fila["datos"])
+                participante.update(cambios)
+                conn.execute(_UPSERT, _fila(participante))
+                actualizados.append(participante)
+        return actualizados
+    def eliminar_muchos(self, boletos):
+        """Elimina los participantes de esos boletos en una transacción"""
+        with self._transaccion() as conn:
+            conn.executemany("DELETE FROM participantes WHERE boleto = ?", [(b,) for b in boletos])
+    def eliminar_todos(self):
+        """Elimina todos los participantes"""
+        with self._transaccion() as conn:
+            self._vaciar(conn)
+    def _vaciar(self, conn):
+        """Borra todo (incluidas las huellas de importación) y cambia de época para forzar recargas completas"""
+        conn.execute("DELETE FROM participantes")
+        conn.execute("DELETE FROM borrados")
+        conn.execute("DELETE FROM importaciones")
+        conn.execute("UPDATE meta SET valor = CAST(valor AS INTEGER) + 1 WHERE clave = 'epoca'")
+    def reemplazar_todos(self, participantes):
+        """Reemplaza todos los participantes en una sola transacción"""
+        filas = [_fila(p) for p in participantes]
+        with self._transaccion() as conn:
+            self._vaciar(conn)
+            conn.executemany(_UPSERT, filas)
+        return len(filas)
+    # --- Migración ---
+    def migrar_desde_carpeta(self, carpeta):
+        """Importa una única vez los archivos Nombre_Boleto.json del formato anterior"""
+        if self._meta("migrado_json") or not os.path.isdir(carpeta):
+            return 0
+        participantes = []
+        for archivo in sorted(os.listdir(carpeta)):
+            if archivo.endswith(".json"):
+                try:
+                    with open(os.path.join(carpeta, archivo), "r", encoding="utf-8") as f:
+                        p = json.load(f)
+                    if p.get("boleto"):
+                        participantes.append(p)
+                except Exception as e:
+                    logger.warning(f"Error al migrar {archivo}: {e}")
+        filas = [_fila(p) for p in participantes]
+        with self._transaccion() as conn:
+            conn.executemany(f"INSERT OR IGNORE {_INSERT}", filas)
+            conn.execute("INSERT OR REPLACE INTO meta (clave, valor) VALUES ('migrado_json', '1')")
+        if participantes:
+            logger.info(f"Migrados {len(participantes)} participantes desde {carpeta}")
+        return len(participantes)
+    def _meta(self, clave):
+        fila = self._conexion().execute("SELECT valor FROM meta WHERE clave = ?", (clave,)).fetchone()
+        return fila["valor"] if fila else None
+class _Transaccion:
+    """Context manager de transacción explícita sobre una conexión en autocommit"""
+    def __init__(self, conn):
+        self.conn = conn
+        self.anidada = False
+    def __enter__(self):
+        # Dentro de un lote la escritura se suma a la transacción ya abierta
+        self.anidada = self.conn.in_transaction
+        if not self.anidada:
+            self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+    def __exit__(self, tipo, valor, traza):
+        if self.anidada:
+            return False
+        if tipo is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
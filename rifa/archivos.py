@@ -0,0 +1,60 @@
+import json
+import logging
+import os
+import tempfile
+logger = logging.getLogger(__name__)
+# ----------------------------
+# ESCRITURA ATÓMICA DE ARCHIVOS (TEMPORAL + FSYNC + RENOMBRAR)
+# ----------------------------
+def leer_json(ruta, por_defecto):
+    """Contenido de un archivo JSON o 'por_defecto' si no existe o no se puede leer"""
+    if os.path.exists(ruta):
+        try:
+            with open(ruta, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error leyendo {ruta}: {e}")
+    return por_defecto
+def _sincronizar_directorio(directorio):
+    """Persiste el renombrado en disco (no disponible en Windows)"""
+    try:
+        fd = os.open(directorio, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+def escribir_atomico(ruta, contenido, binario=False):
+    """Escribe 'contenido' (texto, bytes o un iterable de bloques) sin que un lector vea el archivo a medias"""
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    os.makedirs(directorio, exist_ok=True)
+    fd, temporal = tempfile.mkstemp(prefix=f".{os.path.basename(ruta)}.", suffix=".tmp", dir=directorio)
+    try:
+        if binario:
+            f = os.fdopen(fd, "wb")
+        else:
+            f = os.fdopen(fd, "w", encoding="utf-8", newline="")
+        with f:
+            if isinstance(contenido, (str, bytes)):
+                f.write(contenido)
+            else:
+                for bloque in contenido:
+                    f.write(bloque)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, ruta)
+    except BaseException:
+        try:
+            os.remove(temporal)
+        except OSError:
+            pass
+        raise
+    _sincronizar_directorio(directorio)
+    return ruta
+def escribir_json_atomico(ruta, datos, **opciones):
+    """Serializa 'datos' como JSON y lo escribe de forma atómica"""
+    opciones.setdefault("ensure_ascii", False)
+    return escribir_atomico(ruta, json.dumps(datos, **opciones))
@@ -0,0 +1,45 @@
+# ----------------------------
+# DISPONIBILIDAD DE BOLETOS (MAPA DE 100.000 POSICIONES)
+# ----------------------------
+TOTAL_BOLETOS = 100000
+def indice_boleto(boleto):
+    """Convierte un boleto de 5 dígitos en su posición del mapa, o None si no es válido"""
+    if isinstance(boleto, str) and len(boleto) == 5 and boleto.isdigit():
+        return int(boleto)
+    return None
+class MapaBoletos:
+    """Mapa de boletos ocupados con consulta O(1)"""
+    def __init__(self, boletos=()):
+        self._ocupados = bytearray(TOTAL_BOLETOS)
+        self.total = 0
+        for boleto in boletos:
+            self.marcar(boleto)
+    def ocupado(self, boleto):
+        """Indica si el boleto está tomado"""
+        idx = indice_boleto(boleto)
+        return idx is not None and self._ocupados[idx] == 1
+    def marcar(self, boleto):
+        idx = indice_boleto(boleto)
+        if idx is not None and not self._ocupados[idx]:
+            self._ocupados[idx] = 1
+            self.total += 1
+    def liberar(self, boleto):
+        idx = indice_boleto(boleto)
+        if idx is not None and self._ocupados[idx]:
+            self._ocupados[idx] = 0
+            self.total -= 1
+    def sugerir_libres(self, boleto, cantidad=5):
+        """Devuelve los boletos libres más cercanos al pedido"""
+        centro = indice_boleto(boleto) or 0
+        sugerencias = []
+        if self.total >= TOTAL_BOLETOS:
+            return sugerencias
+        for distancia in range(TOTAL_BOLETOS):
+            for idx in (centro - distancia, centro + distancia) if distancia else (centro,):
+                if 0 <= idx < TOTAL_BOLETOS and not self._ocupados[idx]:
+                    sugerencias.append(f"{idx:05d}")
+                    if len(sugerencias) >= cantidad:
+                        return sugerencias
+            if centro - distancia < 0 and centro + distancia >= TOTAL_BOLETOS:
+                break
+        return sugerencias
@@ -0,0 +1,99 @@
+import logging
+import threading
+from rifa.boletos import MapaBoletos
+from rifa.metricas import medido
+from rifa.sorteo import IndiceSorteo
+logger = logging.getLogger(__name__)
+# ----------------------------
+# CACHÉ DE PARTICIPANTES COMPARTIDA POR EL PROCESO
+# ----------------------------
+def _clave_orden(participante):
+    return participante.get("fecha_registro", ""), participante.get("boleto", "")
+class CacheParticipantes:
+    """Copia en memoria del almacén que solo recarga los registros modificados"""
+    def __init__(self, almacen):
+        self.almacen = almacen
+        self._lock = threading.Lock()
+        self._por_boleto = {}
+        self._ordenados = []
+        self._mapa = MapaBoletos()
+        self._version = None
+        self._indice_sorteo = None
+        self._version_indice = None
+        self.aciertos = 0
+        self.fallos = 0
+        self.recargas_completas = 0
+        self.registros_recargados = 0
+    def _refrescar(self):
+        """Sincroniza con el almacén; devuelve True si hubo que recargar algo"""
+        epoca, rev = self.almacen.version()
+        if self._version == (epoca, rev):
+            self.aciertos += 1
+            return False
+        self.fallos += 1
+        if self._version is None or self._version[0] != epoca:
+            self._por_boleto = {p["boleto"]: p for p in self.almacen.listar()}
+            self._mapa = MapaBoletos(self._por_boleto)
+            self.recargas_completas += 1
+            self.registros_recargados += len(self._por_boleto)
+        else:
+            modificados, borrados = self.almacen.cambios_desde(self._version[1])
+            for p in modificados:
+                self._por_boleto[p["boleto"]] = p
+                self._mapa.marcar(p["boleto"])
+            for boleto in borrados:
+                self._por_boleto.pop(boleto, None)
+                self._mapa.liberar(boleto)
+            self.registros_recargados += len(modificados)
+        self._ordenados = sorted(self._por_boleto.values(), key=_clave_orden)
+        self._version = (epoca, rev)
+        return True
+    @medido("cargar_participantes")
+    def todos(self):
+        """Lista de participantes ordenada por fecha de registro"""
+        with self._lock:
+            self._refrescar()
+            return list(self._ordenados)
+    def obtener(self, boleto):
+        """Participante por boleto desde la caché"""
+        with self._lock:
+            self._refrescar()
+            return self._por_boleto.get(boleto)
+    def contar(self):
+        """Cantidad de participantes en la caché"""
+        with self._lock:
+            self._refrescar()
+            return len(self._por_boleto)
+    def boleto_ocupado(self, boleto):
+        """Consulta O(1) de disponibilidad (la confirmación final la hace el almacén)"""
+        with self._lock:
+            self._refrescar()
+            return self._mapa.ocupado(boleto)
+    def sugerir_libres(self, boleto, cantidad=5):
+        """Boletos libres más cercanos al pedido"""
+        with self._lock:
+            self._refrescar()
+            return self._mapa.sugerir_libres(boleto, cantidad)
+    def indice_sorteo(self):
+        """Índice de boletos pagos para el motor de sorteo; se reconstruye solo si cambiaron los datos"""
+        with self._lock:
+            self._refrescar()
+            if self._version_indice != self._version:
+                self._indice_sorteo = IndiceSorteo(self._por_boleto.values())
+                self._version_indice = self._version
+            return self._indice_sorteo
+    def invalidar(self):
+        """Fuerza una recarga completa en el próximo acceso"""
+        with self._lock:
+            self._version = None
+    def estadisticas(self):
+        """Contadores de aciertos/fallos para verificar el funcionamiento de la caché"""
+        total = self.aciertos + self.fallos
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(self.aciertos / total * 100, 1) if total else 0.0,
+            "recargas_completas": self.recargas_completas,
+            "registros_recargados": self.registros_recargados,
+            "registros_en_cache": len(self._por_boleto),
+        }
@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+logger = logging.getLogger(__name__)
+# ----------------------------
+# COLA PERSISTENTE DE TRABAJOS (SQLITE)
+# ----------------------------
+# Estados: pendiente -> en_curso -> hecho | fallido (lista de descarte tras agotar reintentos)
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    clave TEXT NOT NULL UNIQUE,
+    canal TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'pendiente',
+    intentos INTEGER NOT NULL DEFAULT 0,
+    max_intentos INTEGER NOT NULL DEFAULT 5,
+    proximo_intento REAL NOT NULL DEFAULT 0,
+    bloqueado_hasta REAL NOT NULL DEFAULT 0,
+    error TEXT NOT NULL DEFAULT '',
+    creado REAL NOT NULL,
+    actualizado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_trabajos_estado ON trabajos(estado, proximo_intento);
+"""
+class ColaTrabajos:
+    """Cola de trabajos con claves de idempotencia, reintentos con backoff y lista de descarte"""
+    def __init__(self, ruta_bd, max_intentos=5, espera_base=30, espera_maxima=3600, espacio=""):
+        self.ruta_bd = ruta_bd
+        self.espacio = espacio
+        self.max_intentos = max_intentos
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(ruta_bd)), exist_ok=True)
+        self._conexion().executescript(ESQUEMA)
+    def _conexion(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.ruta_bd, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+    def _filtro_espacio(self):
+        """Condición SQL (rango sobre el índice único de 'clave') que limita la consulta al espacio de la cola"""
+        if not self.espacio:
+            return "1", ()
+        return "clave >= ? AND clave < ?", (f"{self.espacio}:", f"{self.espacio};")
+    def _ejecutar_en_transaccion(self, funcion):
+        conn = self._conexion()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            resultado = funcion(conn)
+            conn.execute("COMMIT")
+            return resultado
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    def encolar(self, clave, canal, payload):
+        """Encola un trabajo; devuelve False si la clave ya existía (no se duplica)"""
+        return self.encolar_muchos([(clave, canal, payload)]) == 1
+    def encolar_muchos(self, trabajos):
+        """Encola [(clave, canal, payload)] en una transacción; devuelve cuántos eran nuevos"""
+        ahora = time.time()
+        # El payload lleva la rifa: el worker envía cada trabajo con el SMTP/Twilio propios de esa rifa
+        filas = [
+            (f"{self.espacio}:{clave}" if self.espacio else clave, canal,
+             json.dumps({**payload, "rifa_id": self.espacio} if self.espacio else payload, default=str, ensure_ascii=False),
+             self.max_intentos, ahora, ahora)
+            for clave, canal, payload in trabajos
+        ]
+        def insertar(conn):
+            antes = conn.total_changes
+            conn.executemany(
+                """INSERT OR IGNORE INTO trabajos (clave, canal, payload, max_intentos, creado, actualizado)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                filas,
+            )
+            return conn.total_changes - antes
+        return self._ejecutar_en_transaccion(insertar)
+    def tomar(self, limite=50, bloqueo=300):
+        """Reserva hasta 'limite' trabajos listos (o abandonados por un worker caído) del espacio de la cola"""
+        ahora = time.time()
+        filtro, parametros = self._filtro_espacio()
+        def reservar(conn):
+            filas = conn.execute(
+                f"""SELECT * FROM trabajos
+                   WHERE ((estado = 'pendiente' AND proximo_intento <= ?)
+                      OR (estado = 'en_curso' AND bloqueado_hasta < ?)) AND {filtro}
+                   ORDER BY proximo_intento, id LIMIT ?""",
+                (ahora, ahora, *parametros, limite),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE trabajos SET estado = 'en_curso', bloqueado_hasta = ?, actualizado = ? WHERE id = ?",
+                [(ahora + bloqueo, ahora, fila["id"]) for fila in filas],
+            )
+            return [self._trabajo(fila) for fila in filas]
+        return self._ejecutar_en_transaccion(reservar)
+    def completar(self, trabajo_id):
+        self._conexion().execute(
+            "UPDATE trabajos SET estado = 'hecho', error = '', actualizado = ? WHERE id = ?",
+            (time.time(), trabajo_id),
+        )
+    def fallar(self, trabajo_id, error):
+        """Registra un fallo: reprograma con backoff exponencial o lo pasa a la lista de descarte"""
+        ahora = time.time()
+        def registrar(conn):
+            fila = conn.execute("SELECT intentos, max_intentos FROM trabajos WHERE id = ?", (trabajo_id,)).fetchone()
+            if not fila:
+                return None
+            intentos = fila["intentos"] + 1
+            estado = "fallido" if intentos >= fila["max_intentos"] else "pendiente"
+            espera = min(self.espera_base * 2 ** (intentos - 1), self.espera_maxima)
+            conn.execute(
+                """UPDATE trabajos SET estado = ?, intentos = ?, proximo_intento = ?, error = ?, actualizado = ?
+                   WHERE id = ?""",
+                (estado, intentos, ahora + espera, str(error)[:500], ahora, trabajo_id),
+            )
+            return estado
+        return self._ejecutar_en_transaccion(registrar)
+    def fallidos(self, limite=100):
+        """Trabajos en la lista de descarte"""
+        filtro, parametros = self._filtro_espacio()
+        filas = self._conexion().execute(
+            f"SELECT * FROM trabajos WHERE estado = 'fallido' AND {filtro} ORDER BY actualizado DESC LIMIT ?",
+            (*parametros, limite)
+        )
+        return [self._trabajo(fila) for fila in filas]
+    def reintentar(self, trabajo_id):
+        """Devuelve un trabajo descartado a la cola"""
+        self._conexion().execute(
+            """UPDATE trabajos SET estado = 'pendiente', intentos = 0, proximo_intento = 0, actualizado = ?
+               WHERE id = ? AND estado = 'fallido'""",
+            (time.time(), trabajo_id),
+        )
+    def descartar(self, trabajo_id):
+        self._conexion().execute("DELETE FROM trabajos WHERE id = ? AND estado = 'fallido'", (trabajo_id,))
+    def resumen(self):
+        """Cantidad de trabajos por estado"""
+        filtro, parametros = self._filtro_espacio()
+        filas = self._conexion().execute(f"SELECT estado, COUNT(*) FROM trabajos WHERE {filtro} GROUP BY estado", parametros)
+        resumen = {"pendiente": 0, "en_curso": 0, "hecho": 0, "fallido": 0}
+        resumen.update({estado: n for estado, n in filas})
+        return resumen
+    def _trabajo(self, fila):
+        trabajo = dict(fila)
+        trabajo["payload"] = json.loads(trabajo["payload"])
+        return trabajo
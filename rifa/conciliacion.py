@@ -0,0 +1,106 @@
+import argparse
+import json
+import logging
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+from rifa.almacen import AlmacenParticipantes
+from rifa.config import cargar_configuracion, configuracion_desde_argumentos
+from rifa.pagos import ClienteMercadoPago, cambios_pago_aprobado
+from rifa.sorteo import hora_argentina, proximo_sorteo
+logger = logging.getLogger(__name__)
+# ----------------------------
+# CONCILIACIÓN DE PAGOS CONTRA LA BÚSQUEDA DE MERCADO PAGO
+# ----------------------------
+ZONA_ARGENTINA = "-03:00"
+def rango_fechas(dias):
+    """Rango [hace 'dias' días, ahora] en el formato de fechas de Mercado Pago"""
+    hasta = hora_argentina()
+    desde = (hasta - timedelta(days=dias)).replace(hour=0, minute=0, second=0, microsecond=0)
+    formato = "%Y-%m-%dT%H:%M:%S.000" + ZONA_ARGENTINA
+    return desde.strftime(formato), hasta.strftime(formato)
+def conciliar(almacen, cliente_mp, desde, hasta, aplicar=True):
+    """Marca como pagados los boletos con pago aprobado en MP que figuran pendientes; devuelve el reporte"""
+    pagos = cliente_mp.buscar_todos_pagos(desde, hasta)
+    # Último pago aprobado por boleto (external_reference); los de otras rifas se ignoran
+    aprobados = {}
+    for pago in pagos:
+        cambios = cambios_pago_aprobado(pago)
+        boleto = cliente_mp.boleto_de_pago(pago) if cambios else None
+        if boleto:
+            aprobados[boleto] = (pago, cambios)
+    reporte = {
+        "desde": desde,
+        "hasta": hasta,
+        "pagos_consultados": len(pagos),
+        "pagos_aprobados": len(aprobados),
+        "ya_pagados": 0,
+        "sin_participante": [],
+        "marcados": [],
+        "aplicado": aplicar
+    }
+    cambios_por_boleto = {}
+    # Lectura de estados y actualización en la misma transacción: un webhook no puede cambiar un pago en el medio
+    with almacen.lote() if aplicar else nullcontext():
+        estados = almacen.estados_pago(aprobados)
+        for boleto, (pago, cambios) in aprobados.items():
+            estado = estados.get(boleto)
+            if estado is None:
+                reporte["sin_participante"].append({"boleto": boleto, "id_pago_mp": cambios["id_pago_mp"]})
+            elif estado == "pagado":
+                reporte["ya_pagados"] += 1
+            else:
+                cambios["fecha_pago"] = pago.get("date_approved") or cambios["fecha_pago"]
+                cambios_por_boleto[boleto] = cambios
+                reporte["marcados"].append({
+                    "boleto": boleto, "antes": estado, "despues": "pagado", "id_pago_mp": cambios["id_pago_mp"]
+                })
+        if aplicar and cambios_por_boleto:
+            almacen.actualizar_muchos(cambios_por_boleto)
+    logger.info(
+        f"Conciliación {desde} a {hasta}: {len(pagos)} pagos, {len(cambios_por_boleto)} boletos marcados, "
+        f"{len(reporte['sin_participante'])} sin participante"
+    )
+    return reporte
+def crear_cliente(config):
+    return ClienteMercadoPago(
+        config["MP_ACCESS_TOKEN"], config["RIFA_NOMBRE"], config["MONTO_RIFA"],
+        api_url=config["MP_API_URL"],
+        max_concurrencia=config["MP_CONCURRENCIA"],
+        rifa_id=config["RIFA_ID"]
+    )
+def ejecutar_programado(config, dias=3, minutos_antes=15):
+    """Concilia todos los días unos minutos antes del sorteo"""
+    almacen = AlmacenParticipantes(config["RUTA_BD"])
+    cliente_mp = crear_cliente(config)
+    while True:
+        anticipo = timedelta(minutes=minutos_antes)
+        momento = proximo_sorteo(hora_argentina() + anticipo) - anticipo
+        logger.info(f"Próxima conciliación: {momento:%Y-%m-%d %H:%M} (hora Argentina)")
+        time.sleep(max((momento - hora_argentina()).total_seconds(), 0))
+        try:
+            conciliar(almacen, cliente_mp, *rango_fechas(dias))
+        except Exception as e:
+            logger.error(f"Error en la conciliación programada: {e}")
+        time.sleep(60)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concilia los pagos aprobados en Mercado Pago con los participantes")
+    parser.add_argument("--dias", type=int, default=3, help="Días hacia atrás a consultar")
+    parser.add_argument("--simular", action="store_true", help="Mostrar el reporte sin aplicar cambios")
+    parser.add_argument("--programado", action="store_true", help="Conciliar todos los días antes del sorteo")
+    parser.add_argument("--minutos-antes", type=int, default=15, help="Minutos antes del sorteo (modo programado)")
+    parser.add_argument("--rifa", help="Id de la rifa (ver RIFAS_ARCHIVO); por defecto la primera")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    config = configuracion_desde_argumentos(cargar_configuracion(), args.rifa)
+    try:
+        if args.programado:
+            ejecutar_programado(config, args.dias, args.minutos_antes)
+        else:
+            reporte = conciliar(
+                AlmacenParticipantes(config["RUTA_BD"]), crear_cliente(config),
+                *rango_fechas(args.dias), aplicar=not args.simular
+            )
+            print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    except KeyboardInterrupt:
+        logger.info("Conciliación detenida")
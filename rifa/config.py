@@ -0,0 +1,140 @@
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from rifa.archivos import leer_json
+logger = logging.getLogger(__name__)
+# ----------------------------
+# CONFIGURACIÓN (COMPARTIDA POR LA APP Y LOS PROCESOS DE FONDO)
+# ----------------------------
+def cargar_configuracion():
+    """Carga configuración con validación robusta"""
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    config = {
+        "ADMIN_USER": os.getenv("ADMIN_USER", "admin"),
+        "ADMIN_PASS": os.getenv("ADMIN_PASS", "rifa123"),
+        "SMTP_SERVER": os.getenv("SMTP_SERVER", "smtp.gmail.com"),
+        "SMTP_PORT": int(os.getenv("SMTP_PORT", 587)),
+        "SMTP_EMAIL": os.getenv("SMTP_EMAIL", ""),
+        "SMTP_PASSWORD": os.getenv("SMTP_PASSWORD", ""),
+        "SMTP_TLS": os.getenv("SMTP_TLS", "1").lower() in ("1", "true", "si", "sí"),
+        "TWILIO_ACCOUNT_SID": os.getenv("TWILIO_ACCOUNT_SID", ""),
+        "TWILIO_AUTH_TOKEN": os.getenv("TWILIO_AUTH_TOKEN", ""),
+        "TWILIO_WHATSAPP_FROM": os.getenv("TWILIO_WHATSAPP_FROM", ""),
+        "TWILIO_API_URL": os.getenv("TWILIO_API_URL", "https://api.twilio.com"),
+        "NOTIF_HILOS": int(os.getenv("NOTIF_HILOS", 4)),
+        "NOTIF_TASA_EMAIL": float(os.getenv("NOTIF_TASA_EMAIL", 5)),
+        "NOTIF_TASA_WHATSAPP": float(os.getenv("NOTIF_TASA_WHATSAPP", 1)),
+        "MP_ACCESS_TOKEN": os.getenv("MP_ACCESS_TOKEN", ""),
+        "MP_API_URL": os.getenv("MP_API_URL", "https://api.mercadopago.com"),
+        "MP_ENLACE_DIFERIDO": os.getenv("MP_ENLACE_DIFERIDO", "0").lower() in ("1", "true", "si", "sí"),
+        "MP_CONCURRENCIA": int(os.getenv("MP_CONCURRENCIA", 8)),
+        "WEBHOOK_URL": os.getenv("WEBHOOK_URL", ""),
+        # Clave secreta de las notificaciones (panel de MP); vacía = no se verifica la cabecera x-signature
+        "MP_WEBHOOK_SECRET": os.getenv("MP_WEBHOOK_SECRET", ""),
+        "ENLACE_PAGO_FALLBACK": os.getenv("ENLACE_PAGO_FALLBACK", "https://www.mercadopago.com.ar/"),
+        "RIFA_NOMBRE": os.getenv("RIFA_NOMBRE", "Rifa Beneficio"),
+        "RIFA_DESCRIPCION": os.getenv("RIFA_DESCRIPCION", ""),
+        "RUTA_BD": os.getenv("RUTA_BD", "rifa.db"),
+        # Cada cuántos segundos se resincroniza el contador con el servidor (0 = nunca)
+        "REFRESCO_REGISTRO_SEG": int(os.getenv("REFRESCO_REGISTRO_SEG", 60)),
+        "REFRESCO_ADMIN_SEG": int(os.getenv("REFRESCO_ADMIN_SEG", 60)),
+        "RUTA_COLA": os.getenv("RUTA_COLA", "cola.db"),
+        "COLA_MAX_INTENTOS": int(os.getenv("COLA_MAX_INTENTOS", 5)),
+        # Fuentes del número ganador en JSON: [{"nombre", "url", "etiqueta", "clase", "etiqueta_fecha", "clase_fecha"}]
+        # (vacío = la de siempre); sin clase_fecha la fuente solo sirve para el sorteo del día
+        "RESULTADOS_FUENTES": os.getenv("RESULTADOS_FUENTES", ""),
+        "CARPETA_BACKUPS": os.getenv("CARPETA_BACKUPS", "backups"),
+        # Respaldo automático cada N minutos (0 = solo manual)
+        "BACKUP_INTERVALO_MIN": int(os.getenv("BACKUP_INTERVALO_MIN", 60)),
+        "BACKUP_MAX_DELTAS": int(os.getenv("BACKUP_MAX_DELTAS", 24)),
+        "BACKUP_MAX_INSTANTANEAS": int(os.getenv("BACKUP_MAX_INSTANTANEAS", 5)),
+        "CARPETA_EXPORTACIONES": os.getenv("CARPETA_EXPORTACIONES", "exportaciones"),
+        "RUTA_PREMIOS": os.getenv("RUTA_PREMIOS", "premios.json"),
+        "RUTA_MENSAJES": os.getenv("RUTA_MENSAJES", "mensajes.json"),
+        # Prefijo de las claves de la cola; separa los avisos de cada rifa en la cola compartida
+        "COLA_ESPACIO": "",
+        # Varias rifas en un mismo proceso: [{"id", "nombre", "descripcion", "monto", "carpeta"}] (sin archivo = una sola)
+        "RIFAS_ARCHIVO": os.getenv("RIFAS_ARCHIVO", "rifas.json"),
+        "CARPETA_RIFAS": os.getenv("CARPETA_RIFAS", "rifas"),
+        # Rifas con datos en memoria a la vez; la menos usada se libera al superar el máximo o tras N minutos sin uso
+        "RIFAS_ACTIVAS_MAX": int(os.getenv("RIFAS_ACTIVAS_MAX", 8)),
+        "RIFAS_INACTIVIDAD_MIN": int(os.getenv("RIFAS_INACTIVIDAD_MIN", 30)),
+        # Tiempos por operación (0 = desactivados); con puerto se exponen en http://host:puerto/metrics
+        "METRICAS": os.getenv("METRICAS", "0").lower() in ("1", "true", "si", "sí"),
+        "METRICAS_HOST": os.getenv("METRICAS_HOST", "127.0.0.1"),
+        "METRICAS_PUERTO": int(os.getenv("METRICAS_PUERTO", 9108)),
+        # Las operaciones más lentas que esto se registran como advertencia en el log
+        "METRICAS_LENTO_MS": int(os.getenv("METRICAS_LENTO_MS", 1000)),
+    }
+    # El resultado de la Nocturna es el mismo para todas las rifas: se cachea en una sola base
+    config["RUTA_RESULTADOS"] = os.getenv("RUTA_RESULTADOS", config["RUTA_BD"])
+    # Validar MONTO_RIFA
+    monto_raw = os.getenv("MONTO_RIFA", "30000")
+    monto_limpio = re.sub(r'[^\d.]', '', monto_raw)
+    try:
+        config["MONTO_RIFA"] = float(monto_limpio) if monto_limpio else 30000.0
+    except ValueError:
+        config["MONTO_RIFA"] = 30000.0
+        logger.warning("MONTO_RIFA inválido, usando valor por defecto: 30000.0")
+    return config
+_configuracion = None
+_configuracion_lock = threading.Lock()
+def configuracion():
+    """Configuración del proceso: se carga una sola vez (Streamlit reejecuta el script en cada interacción)"""
+    global _configuracion
+    with _configuracion_lock:
+        if _configuracion is None:
+            _configuracion = cargar_configuracion()
+        return _configuracion
+# ----------------------------
+# CONFIGURACIÓN POR RIFA
+# ----------------------------
+RIFA_POR_DEFECTO = "principal"
+CARACTERES_ID_RIFA = "abcdefghijklmnopqrstuvwxyz0123456789-_"
+def cargar_definiciones(config):
+    """Rifas definidas en RIFAS_ARCHIVO por id; sin archivo hay una sola rifa con la configuración global"""
+    definiciones = leer_json(config["RIFAS_ARCHIVO"], None)
+    if not definiciones:
+        return OrderedDict([(RIFA_POR_DEFECTO, None)])
+    rifas = OrderedDict()
+    for definicion in definiciones:
+        rifa_id = str(definicion.get("id", "")).strip().lower()
+        if not rifa_id or any(c not in CARACTERES_ID_RIFA for c in rifa_id):
+            logger.warning(f"Rifa con id inválido ignorada: {definicion.get('id')!r}")
+            continue
+        rifas[rifa_id] = definicion
+    return rifas or OrderedDict([(RIFA_POR_DEFECTO, None)])
+def configuracion_rifa(config, rifa_id, definicion):
+    """Configuración global con el nombre, el precio y las rutas de datos propios de una rifa"""
+    if definicion is None:
+        return {**config, "RIFA_ID": ""}
+    carpeta = definicion.get("carpeta") or os.path.join(config["CARPETA_RIFAS"], rifa_id)
+    propia = {
+        **config,
+        "RIFA_ID": rifa_id,
+        "RIFA_NOMBRE": definicion.get("nombre", config["RIFA_NOMBRE"]),
+        "RIFA_DESCRIPCION": definicion.get("descripcion", ""),
+        "MONTO_RIFA": float(definicion.get("monto", config["MONTO_RIFA"])),
+        "RUTA_BD": os.path.join(carpeta, "rifa.db"),
+        "CARPETA_BACKUPS": os.path.join(carpeta, "backups"),
+        "CARPETA_EXPORTACIONES": os.path.join(carpeta, "exportaciones"),
+        "RUTA_PREMIOS": os.path.join(carpeta, "premios.json"),
+        "RUTA_MENSAJES": os.path.join(carpeta, "mensajes.json"),
+        "COLA_ESPACIO": rifa_id,
+    }
+    # Cualquier clave de configuración en mayúsculas (MP_ACCESS_TOKEN, WEBHOOK_URL...) puede fijarse por rifa
+    propia.update({clave: valor for clave, valor in definicion.items() if clave.isupper()})
+    return propia
+def configuracion_desde_argumentos(config, rifa_id):
+    """Configuración para los procesos de fondo: la global o la de la rifa indicada con --rifa"""
+    definiciones = cargar_definiciones(config)
+    rifa_id = rifa_id or next(iter(definiciones))
+    if rifa_id not in definiciones:
+        raise SystemExit(f"Rifa desconocida: {rifa_id} (disponibles: {', '.join(definiciones)})")
+    return configuracion_rifa(config, rifa_id, definiciones[rifa_id])
@@ -0,0 +1,107 @@
+import csv
+import hashlib
+import json
+import logging
+import os
+from io import StringIO
+from rifa.archivos import escribir_atomico
+logger = logging.getLogger(__name__)
+# ----------------------------
+# EXPORTACIONES POR BLOQUES (SIN ARMAR TODO EN MEMORIA)
+# ----------------------------
+ENCABEZADO_PARTICIPANTES_CSV = ["Nombre", "Boleto", "Email", "Teléfono", "Dirección", "Ciudad", "Localidad", "Estado Pago", "Fecha Registro", "Fecha Pago"]
+def fila_participante_csv(p):
+    return [
+        p.get('nombre', ''),
+        p.get('boleto', ''),
+        p.get('email', ''),
+        p.get('telefono', ''),
+        p.get('direccion', ''),
+        p.get('ciudad', ''),
+        p.get('localidad', ''),
+        p.get('estado_pago', 'pendiente'),
+        p.get('fecha_registro', ''),
+        p.get('fecha_pago', '')
+    ]
+def iterar_csv(encabezado, filas, filas_por_bloque=1000):
+    """Genera el CSV en bloques de texto de 'filas_por_bloque' filas"""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(encabezado)
+    for i, fila in enumerate(filas, start=1):
+        writer.writerow(fila)
+        if i % filas_por_bloque == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+def iterar_participantes_csv(participantes, filas_por_bloque=1000):
+    """CSV de participantes generado por bloques"""
+    return iterar_csv(ENCABEZADO_PARTICIPANTES_CSV, (fila_participante_csv(p) for p in participantes), filas_por_bloque)
+ENCABEZADO_RESULTADOS_CSV = ["Fecha", "Premio", "Nombre", "Boleto", "Email", "Teléfono", "Dirección", "Ciudad", "Localidad", "Estado Pago", "Fecha Registro"]
+def filas_resultados_csv(sorteos):
+    for sorteo in sorteos:
+        for g in sorteo.get("ganadores", []):
+            yield [
+                sorteo.get("fecha", ""),
+                g.get("premio", sorteo.get("premio", "Lotería Nocturna")),
+                g.get('nombre', ''),
+                g.get('boleto', ''),
+                g.get('email', ''),
+                g.get('telefono', ''),
+                g.get('direccion', ''),
+                g.get('ciudad', ''),
+                g.get('localidad', ''),
+                g.get('estado_pago', 'pendiente'),
+                g.get('fecha_registro', '')
+            ]
+def iterar_resultados_csv(sorteos, filas_por_bloque=1000):
+    """CSV de ganadores de todos los sorteos generado por bloques"""
+    return iterar_csv(ENCABEZADO_RESULTADOS_CSV, filas_resultados_csv(sorteos), filas_por_bloque)
+def iterar_json(campos, clave_lista, elementos, elementos_por_bloque=500):
+    """JSON {campos..., clave_lista: [elementos]} generado por bloques"""
+    cabecera = "".join(
+        f"    {json.dumps(clave)}: {json.dumps(valor, default=str, ensure_ascii=False)},\n"
+        for clave, valor in campos.items()
+    )
+    yield "{\n" + cabecera + f"    {json.dumps(clave_lista)}: ["
+    bloque, separador = [], "\n"
+    for elemento in elementos:
+        bloque.append(separador + "        " + json.dumps(elemento, default=str, ensure_ascii=False))
+        separador = ",\n"
+        if len(bloque) >= elementos_por_bloque:
+            yield "".join(bloque)
+            bloque = []
+    yield "".join(bloque) + "\n    ]\n}\n"
+def escribir_por_bloques(ruta, bloques):
+    """Escribe los bloques en un archivo temporal y lo renombra al terminar"""
+    return escribir_atomico(ruta, bloques)
+def clave_version(*partes):
+    """Clave corta y estable para identificar una versión de los datos"""
+    return hashlib.sha1(json.dumps(partes, default=str, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+def preparar_exportacion(carpeta, nombre, extension, version, generar_bloques, conservar=3):
+    """Devuelve el archivo exportado para esa versión de datos, generándolo solo si no existe"""
+    os.makedirs(carpeta, exist_ok=True)
+    ruta = os.path.join(carpeta, f"{nombre}_{version}.{extension}")
+    if os.path.exists(ruta):
+        return ruta
+    escribir_por_bloques(ruta, generar_bloques())
+    logger.info(f"Exportación generada: {ruta}")
+    podar_exportaciones(carpeta, nombre, extension, conservar)
+    return ruta
+def podar_exportaciones(carpeta, nombre, extension, conservar=3):
+    """Borra las versiones de una exportación salvo las 'conservar' más recientes (otra sesión puede estar descargando la anterior)"""
+    versiones = []
+    for archivo in os.listdir(carpeta):
+        if archivo.startswith(f"{nombre}_") and archivo.endswith(f".{extension}"):
+            ruta = os.path.join(carpeta, archivo)
+            try:
+                versiones.append((os.path.getmtime(ruta), ruta))
+            except OSError:
+                pass
+    for _, ruta in sorted(versiones, reverse=True)[max(conservar, 1):]:
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
@@ -0,0 +1,164 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+logger = logging.getLogger(__name__)
+# ----------------------------
+# HISTORIAL DE SORTEOS (REGISTRO PERSISTENTE DE SOLO AGREGADO)
+# ----------------------------
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS sorteos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fecha TEXT NOT NULL,
+    numero_oficial TEXT NOT NULL DEFAULT '',
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sorteos_fecha ON sorteos(fecha, id);
+CREATE TRIGGER IF NOT EXISTS trg_sorteos_solo_agregar BEFORE UPDATE ON sorteos BEGIN
+    SELECT RAISE(ABORT, 'El historial de sorteos es de solo agregado');
+END;
+"""
+class HistorialSorteos:
+    """Sorteos realizados, compartidos por todas las sesiones, con consultas paginadas por fecha"""
+    def __init__(self, ruta_bd, archivo_legado=None):
+        self.ruta_bd = ruta_bd
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._memo = {}
+        self._memo_version = None
+        os.makedirs(os.path.dirname(os.path.abspath(ruta_bd)), exist_ok=True)
+        self._conexion().executescript(ESQUEMA)
+        if archivo_legado:
+            self.migrar_desde_json(archivo_legado)
+    def _conexion(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.ruta_bd, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+    def _ejecutar_en_transaccion(self, funcion):
+        conn = self._conexion()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            resultado = funcion(conn)
+            conn.execute("COMMIT")
+            return resultado
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    def version(self):
+        """(cantidad, último id): cambia con cada sorteo agregado o con un reemplazo"""
+        fila = self._conexion().execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM sorteos").fetchone()
+        return fila[0], fila[1]
+    def _memorizado(self, clave, calcular):
+        """Resultados compartidos entre sesiones hasta que cambie el historial"""
+        version = self.version()
+        with self._lock:
+            if self._memo_version != version:
+                self._memo = {}
+                self._memo_version = version
+            if clave not in self._memo:
+                self._memo[clave] = calcular()
+            return self._memo[clave]
+    # --- Escritura ---
+    def agregar(self, sorteo):
+        """Agrega un sorteo al final del historial; devuelve su id"""
+        return self.agregar_muchos([sorteo])
+    def agregar_muchos(self, sorteos):
+        def insertar(conn):
+            ultimo = None
+            for sorteo in sorteos:
+                ultimo = conn.execute(
+                    "INSERT INTO sorteos (fecha, numero_oficial, datos) VALUES (?, ?, ?)",
+                    (str(sorteo.get("fecha", "")), str(sorteo.get("numero_oficial") or ""),
+                     json.dumps(sorteo, default=str, ensure_ascii=False)),
+                ).lastrowid
+            return ultimo
+        return self._ejecutar_en_transaccion(insertar)
+    def agregar_si_nuevo(self, sorteo):
+        """Agrega el sorteo solo si no hay otro de la misma fecha; devuelve (sorteo registrado, nuevo)"""
+        def insertar(conn):
+            fila = conn.execute(
+                "SELECT datos FROM sorteos WHERE fecha = ? ORDER BY id LIMIT 1", (str(sorteo.get("fecha", "")),)
+            ).fetchone()
+            if fila:
+                return json.loads(fila["datos"]), False
+            conn.execute(
+                "INSERT INTO sorteos (fecha, numero_oficial, datos) VALUES (?, ?, ?)",
+                (str(sorteo.get("fecha", "")), str(sorteo.get("numero_oficial") or ""),
+                 json.dumps(sorteo, default=str, ensure_ascii=False)),
+            )
+            return sorteo, True
+        return self._ejecutar_en_transaccion(insertar)
+    def reemplazar(self, sorteos):
+        """Reemplaza todo el historial (restauración de respaldos o carga de datos)"""
+        def reemplazar_todo(conn):
+            conn.execute("DELETE FROM sorteos")
+            conn.executemany(
+                "INSERT INTO sorteos (fecha, numero_oficial, datos) VALUES (?, ?, ?)",
+                [(str(s.get("fecha", "")), str(s.get("numero_oficial") or ""),
+                  json.dumps(s, default=str, ensure_ascii=False)) for s in sorteos],
+            )
+        self._ejecutar_en_transaccion(reemplazar_todo)
+    def vaciar(self):
+        self._conexion().execute("DELETE FROM sorteos")
+    # --- Lectura ---
+    def contar(self):
+        return self.version()[0]
+    def ultimo(self):
+        """Último sorteo registrado o None"""
+        def leer():
+            fila = self._conexion().execute("SELECT datos FROM sorteos ORDER BY id DESC LIMIT 1").fetchone()
+            return json.loads(fila["datos"]) if fila else None
+        return self._memorizado(("ultimo",), leer)
+    def pagina(self, numero=0, por_pagina=10, desde=None, hasta=None, excluir_ultimo=False):
+        """Sorteos del más reciente al más antiguo, de a 'por_pagina', opcionalmente entre dos fechas"""
+        def leer():
+            condiciones, parametros = [], []
+            if desde:
+                condiciones.append("fecha >= ?")
+                parametros.append(desde)
+            if hasta:
+                condiciones.append("fecha <= ?")
+                parametros.append(hasta)
+            if excluir_ultimo:
+                condiciones.append("id < (SELECT MAX(id) FROM sorteos)")
+            where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+            filas = self._conexion().execute(
+                f"SELECT datos FROM sorteos {where} ORDER BY fecha DESC, id DESC LIMIT ? OFFSET ?",
+                (*parametros, por_pagina, numero * por_pagina),
+            )
+            return [json.loads(fila["datos"]) for fila in filas]
+        return self._memorizado(("pagina", numero, por_pagina, desde, hasta, excluir_ultimo), leer)
+    def por_fecha(self, fecha):
+        """Sorteos de una fecha (YYYY-MM-DD)"""
+        filas = self._conexion().execute("SELECT datos FROM sorteos WHERE fecha = ? ORDER BY id", (fecha,))
+        return [json.loads(fila["datos"]) for fila in filas]
+    def iterar(self, tamano_bloque=200):
+        """Recorre todo el historial en orden cronológico sin cargarlo entero en memoria"""
+        cursor = self._conexion().execute("SELECT datos FROM sorteos ORDER BY id")
+        while True:
+            filas = cursor.fetchmany(tamano_bloque)
+            if not filas:
+                return
+            for fila in filas:
+                yield json.loads(fila["datos"])
+    # --- Migración ---
+    def migrar_desde_json(self, archivo):
+        """Importa una única vez el historial_sorteos.json anterior"""
+        if not os.path.exists(archivo):
+            return 0
+        try:
+            with open(archivo, "r", encoding="utf-8") as f:
+                sorteos = json.load(f)
+            if sorteos and not self.contar():
+                self.agregar_muchos(sorteos)
+            os.replace(archivo, f"{archivo}.migrado")
+            logger.info(f"Migrados {len(sorteos)} sorteos desde {archivo}")
+            return len(sorteos)
+        except Exception as e:
+            logger.error(f"Error migrando {archivo}: {e}")
+            return 0
@@ -0,0 +1,99 @@
+import hashlib
+import logging
+from datetime import datetime
+import pandas as pd
+logger = logging.getLogger(__name__)
+# ----------------------------
+# IMPORTACIÓN MASIVA POR CSV (POR BLOQUES, VALIDACIÓN VECTORIZADA)
+# ----------------------------
+COLUMNAS_CSV = ["nombre", "boleto", "email", "telefono", "direccion", "ciudad", "localidad"]
+PATRON_EMAIL = r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}"
+def hash_archivo(archivo, tamano_bloque=1 << 20):
+    """SHA-256 del archivo subido, leído por bloques; deja el cursor al inicio"""
+    archivo.seek(0)
+    h = hashlib.sha256()
+    for bloque in iter(lambda: archivo.read(tamano_bloque), b""):
+        h.update(bloque)
+    archivo.seek(0)
+    return h.hexdigest()
+def normalizar_boletos(serie):
+    """Versión vectorizada de normalizar_boleto: 1 a 5 dígitos se completan con ceros"""
+    digitos = serie.str.replace(r"\D", "", regex=True)
+    largo = digitos.str.len()
+    return digitos.str.zfill(5).where((largo >= 1) & (largo <= 5), serie)
+def validar_bloque(df):
+    """Normaliza un bloque y devuelve (df, motivo) con el motivo de rechazo por fila ('' si es válida)"""
+    df = df.rename(columns=lambda c: str(c).strip().lower())
+    for columna in COLUMNAS_CSV:
+        df[columna] = df[columna].fillna("").astype(str).str.strip() if columna in df.columns else ""
+    df["boleto_original"] = df["boleto"]
+    df["boleto"] = normalizar_boletos(df["boleto"])
+    digitos_tel = df["telefono"].str.replace(r"\D", "", regex=True)
+    motivo = pd.Series("", index=df.index)
+    motivo = motivo.mask(
+        (df["telefono"] != "") & ~digitos_tel.str.len().between(7, 15), "Teléfono inválido"
+    )
+    motivo = motivo.mask((df["email"] != "") & ~df["email"].str.fullmatch(PATRON_EMAIL), "Email inválido")
+    motivo = motivo.mask(~df["boleto"].str.fullmatch(r"\d{5}"), "Boleto inválido")
+    motivo = motivo.mask(df["boleto"] == "", "Boleto vacío")
+    df["telefono"] = ("+" + digitos_tel).where(df["telefono"] != "", "")
+    return df, motivo
+def importar_csv(archivo, almacen, enlace_pago, filas_por_bloque=5000, al_avanzar=None):
+    """Importa un CSV por bloques (una transacción por bloque); un archivo ya importado no se reprocesa"""
+    huella = hash_archivo(archivo)
+    previa = almacen.importacion_registrada(huella)
+    if previa:
+        return {**previa, "repetida": True}
+    resumen = {"nuevos": 0, "duplicados": 0, "errores": 0, "detalles": [], "participantes_nuevos": [], "repetida": False}
+    existentes = almacen.boletos()
+    tamano = getattr(archivo, "size", 0) or 0
+    filas = 0
+    lector = pd.read_csv(archivo, dtype=str, keep_default_na=False, encoding="utf-8", chunksize=filas_por_bloque)
+    for bloque in lector:
+        filas += len(bloque)
+        df, motivo = validar_bloque(bloque)
+        invalidos = df[motivo != ""]
+        resumen["errores"] += len(invalidos)
+        # Sin boleto, la fila se identifica por su número de línea en el archivo (el índice sigue entre bloques)
+        referencias = invalidos["boleto_original"].where(
+            invalidos["boleto_original"] != "", "fila " + (invalidos.index + 2).astype(str)
+        )
+        resumen["detalles"].extend(f"❌ {m}: {r}" for m, r in zip(motivo[motivo != ""], referencias))
+        df = df[motivo == ""]
+        # Duplicados dentro del archivo y contra el almacén en una sola operación de conjuntos
+        repetidos = df["boleto"].duplicated() | df["boleto"].isin(existentes)
+        resumen["duplicados"] += int(repetidos.sum())
+        resumen["detalles"].extend(f"⚠️ Boleto duplicado: {b}" for b in df.loc[repetidos, "boleto"])
+        df = df[~repetidos]
+        ahora = datetime.now().isoformat()
+        participantes = [
+            {
+                "nombre": fila["nombre"],
+                "boleto": fila["boleto"],
+                "email": fila["email"],
+                "telefono": fila["telefono"],
+                "direccion": fila["direccion"],
+                "ciudad": fila["ciudad"],
+                "localidad": fila["localidad"],
+                "fecha_registro": ahora,
+                "estado_pago": "pendiente",
+                "id_pago": fila["boleto"],
+                "link_pago": enlace_pago
+            }
+            for fila in df[COLUMNAS_CSV].to_dict("records")
+        ]
+        insertados = almacen.insertar_muchos(participantes)
+        resumen["duplicados"] += len(participantes) - len(insertados)
+        resumen["nuevos"] += len(insertados)
+        resumen["participantes_nuevos"].extend(insertados)
+        existentes.update(df["boleto"])
+        if al_avanzar:
+            posicion = archivo.tell() if hasattr(archivo, "tell") else 0
+            al_avanzar(filas, min(posicion / tamano, 1.0) if tamano else 0.0)
+    resumen["filas"] = filas
+    almacen.registrar_importacion(huella, {
+        **{k: v for k, v in resumen.items() if k not in ("participantes_nuevos", "repetida")},
+        "detalles": resumen["detalles"][:200]
+    })
+    logger.info(f"CSV importado: {resumen['nuevos']} nuevos, {resumen['duplicados']} duplicados, {resumen['errores']} errores")
+    return resumen
@@ -0,0 +1,168 @@
+import bisect
+import functools
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+logger = logging.getLogger(__name__)
+# ----------------------------
+# MÉTRICAS DE TIEMPOS POR OPERACIÓN (TEXTO DE PROMETHEUS)
+# ----------------------------
+# Desactivadas (METRICAS=0), medir() devuelve un contexto vacío compartido y medido() solo consulta
+# un atributo antes de llamar a la función: el costo es despreciable frente a cualquier operación medida.
+LIMITES_SEG = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_SIN_MEDICION = nullcontext()
+class _Operacion:
+    """Histograma acumulado y ventana de las últimas duraciones de una operación"""
+    def __init__(self, ventana):
+        self.cubetas = [0] * (len(LIMITES_SEG) + 1)
+        self.suma = 0.0
+        self.cantidad = 0
+        self.errores = 0
+        self.recientes = deque(maxlen=ventana)
+class _Medicion:
+    def __init__(self, registro, operacion):
+        self.registro = registro
+        self.operacion = operacion
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+    def __exit__(self, tipo, valor, traza):
+        self.registro.registrar(self.operacion, time.perf_counter() - self.inicio, error=tipo is not None)
+        return False
+class RegistroMetricas:
+    """Contadores e histogramas por operación, compartidos por los hilos del proceso"""
+    def __init__(self, activas=False, lento_seg=1.0, ventana=500):
+        self.activas = activas
+        self.lento_seg = lento_seg
+        self.ventana = ventana
+        self._operaciones = {}
+        self._lock = threading.Lock()
+    def medir(self, operacion):
+        """Contexto que mide la duración del bloque (y cuenta el error si lanza una excepción)"""
+        if not self.activas:
+            return _SIN_MEDICION
+        return _Medicion(self, operacion)
+    def registrar(self, operacion, segundos, error=False):
+        with self._lock:
+            datos = self._operaciones.get(operacion)
+            if datos is None:
+                datos = self._operaciones[operacion] = _Operacion(self.ventana)
+            datos.cubetas[bisect.bisect_left(LIMITES_SEG, segundos)] += 1
+            datos.suma += segundos
+            datos.cantidad += 1
+            datos.errores += error
+            datos.recientes.append(segundos)
+        if segundos >= self.lento_seg:
+            logger.warning(f"Operación lenta: {operacion} tardó {segundos * 1000:.0f} ms")
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"{operacion}: {segundos * 1000:.1f} ms{' (error)' if error else ''}")
+    def resumen(self):
+        """p50/p99 de las últimas duraciones por operación (para el panel de administración)"""
+        with self._lock:
+            copias = {nombre: (d.cantidad, d.errores, sorted(d.recientes)) for nombre, d in self._operaciones.items()}
+        filas = []
+        for nombre, (cantidad, errores, recientes) in sorted(copias.items()):
+            if not recientes:
+                continue
+            def percentil(p):
+                return round(recientes[min(len(recientes) - 1, round(p / 100 * (len(recientes) - 1)))] * 1000, 2)
+            filas.append({
+                "operacion": nombre,
+                "cantidad": cantidad,
+                "errores": errores,
+                "p50_ms": percentil(50),
+                "p99_ms": percentil(99),
+                "max_ms": round(recientes[-1] * 1000, 2),
+            })
+        return filas
+    def texto_prometheus(self):
+        """Exposición en el formato de texto de Prometheus"""
+        with self._lock:
+            copias = {
+                nombre: (list(d.cubetas), d.suma, d.cantidad, d.errores) for nombre, d in self._operaciones.items()
+            }
+        lineas = [
+            "# HELP rifa_operacion_segundos Duración de las operaciones de la rifa.",
+            "# TYPE rifa_operacion_segundos histogram",
+        ]
+        for nombre, (cubetas, suma, cantidad, _) in sorted(copias.items()):
+            acumulado = 0
+            for limite, n in zip(LIMITES_SEG + ("+Inf",), cubetas):
+                acumulado += n
+                lineas.append(f'rifa_operacion_segundos_bucket{{operacion="{nombre}",le="{limite}"}} {acumulado}')
+            lineas.append(f'rifa_operacion_segundos_sum{{operacion="{nombre}"}} {suma:.6f}')
+            lineas.append(f'rifa_operacion_segundos_count{{operacion="{nombre}"}} {cantidad}')
+        lineas += [
+            "# HELP rifa_operacion_errores_total Operaciones que terminaron con una excepción.",
+            "# TYPE rifa_operacion_errores_total counter",
+        ]
+        lineas += [
+            f'rifa_operacion_errores_total{{operacion="{nombre}"}} {errores}'
+            for nombre, (_, _, _, errores) in sorted(copias.items())
+        ]
+        return "\n".join(lineas) + "\n"
+    def reiniciar(self):
+        with self._lock:
+            self._operaciones.clear()
+METRICAS = RegistroMetricas()
+def medir(operacion):
+    return METRICAS.medir(operacion)
+def medido(operacion):
+    """Decorador que mide cada llamada a la función cuando las métricas están activas"""
+    def decorar(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not METRICAS.activas:
+                return funcion(*args, **kwargs)
+            with _Medicion(METRICAS, operacion):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorar
+# ----------------------------
+# ENDPOINT /metrics
+# ----------------------------
+def _crear_manejador(registro):
+    from http.server import BaseHTTPRequestHandler
+    class Manejador(BaseHTTPRequestHandler):
+        def log_message(self, formato, *args):
+            logger.debug(formato % args)
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            datos = registro.texto_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+    return Manejador
+def iniciar_servidor(registro=METRICAS, host="127.0.0.1", puerto=9108):
+    """Sirve /metrics en un hilo de fondo; devuelve el servidor"""
+    from http.server import ThreadingHTTPServer
+    servidor = ThreadingHTTPServer((host, puerto), _crear_manejador(registro))
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name="metricas", daemon=True).start()
+    logger.info(f"Métricas disponibles en http://{host}:{servidor.server_address[1]}/metrics")
+    return servidor
+_servidor = None
+_endpoint_intentado = False
+_configurar_lock = threading.Lock()
+def configurar(config, puerto=None):
+    """Activa las métricas según la configuración e inicia el endpoint una sola vez por proceso"""
+    global _servidor, _endpoint_intentado
+    METRICAS.activas = config["METRICAS"]
+    METRICAS.lento_seg = config["METRICAS_LENTO_MS"] / 1000
+    puerto = config["METRICAS_PUERTO"] if puerto is None else puerto
+    if not METRICAS.activas or not puerto or _endpoint_intentado:
+        return _servidor
+    with _configurar_lock:
+        if not _endpoint_intentado:
+            _endpoint_intentado = True
+            try:
+                _servidor = iniciar_servidor(METRICAS, config["METRICAS_HOST"], puerto)
+            except OSError as e:
+                logger.error(f"No se pudo abrir el endpoint de métricas en el puerto {puerto}: {e}")
+    return _servidor
@@ -0,0 +1,149 @@
+import logging
+import re
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from rifa.metricas import medido
+from rifa.pagos import crear_sesion
+logger = logging.getLogger(__name__)
+# ----------------------------
+# CANALES DE ENVÍO
+# ----------------------------
+TWILIO_API_URL = "https://api.twilio.com"
+def normalizar_whatsapp(telefono):
+    """Convierte un teléfono en destino de WhatsApp (whatsapp:+549...)"""
+    return "whatsapp:+" + re.sub(r"[^\d]", "", telefono.lstrip("+"))
+class CanalEmail:
+    """Envío de emails por SMTP reutilizando una conexión autenticada"""
+    def __init__(self, servidor, puerto, usuario, password, usar_tls=True, timeout=30):
+        self.servidor = servidor
+        self.puerto = puerto
+        self.usuario = usuario
+        self.password = password
+        self.usar_tls = usar_tls
+        self.timeout = timeout
+    def configurado(self):
+        return bool(self.usuario)
+    @medido("smtp_conexion")
+    def conectar(self):
+        """Abre y autentica una conexión SMTP"""
+        conexion = smtplib.SMTP(self.servidor, self.puerto, timeout=self.timeout)
+        if self.usar_tls:
+            conexion.starttls()
+        if self.password:
+            conexion.login(self.usuario, self.password)
+        return conexion
+    def construir(self, destinatario, asunto, cuerpo):
+        msg = MIMEMultipart()
+        msg['From'] = self.usuario
+        msg['To'] = destinatario
+        msg['Subject'] = asunto
+        msg.attach(MIMEText(cuerpo, 'plain', 'utf-8'))
+        return msg
+    @medido("smtp_envio")
+    def enviar(self, conexion, destinatario, asunto, cuerpo):
+        conexion.send_message(self.construir(destinatario, asunto, cuerpo))
+class CanalWhatsApp:
+    """Envío de WhatsApp por la API REST de Twilio con sesión HTTP persistente"""
+    def __init__(self, account_sid, auth_token, remitente, api_url=TWILIO_API_URL, timeout=15, sesion=None):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.remitente = remitente
+        self.api_url = api_url.rstrip("/")
+        self.timeout = timeout
+        self.sesion = sesion or crear_sesion(reintentos=2)
+    def configurado(self):
+        return bool(self.account_sid and self.auth_token and self.remitente)
+    @medido("twilio_envio")
+    def enviar(self, telefono, cuerpo):
+        """Envía un mensaje y devuelve el SID de Twilio"""
+        response = self.sesion.post(
+            f"{self.api_url}/2010-04-01/Accounts/{self.account_sid}/Messages.json",
+            data={"From": self.remitente, "To": normalizar_whatsapp(telefono), "Body": cuerpo},
+            auth=(self.account_sid, self.auth_token),
+            timeout=self.timeout
+        )
+        if response.status_code not in (200, 201):
+            raise RuntimeError(f"Twilio ({response.status_code}): {response.text[:200]}")
+        return response.json().get("sid", "")
+# ----------------------------
+# DESPACHADOR POR LOTES
+# ----------------------------
+class LimitadorTasa:
+    """Limita los envíos por segundo de un canal espaciándolos en el tiempo"""
+    def __init__(self, por_segundo):
+        self.intervalo = 1.0 / por_segundo if por_segundo and por_segundo > 0 else 0.0
+        self._siguiente = 0.0
+        self._lock = threading.Lock()
+    def esperar(self):
+        if not self.intervalo:
+            return
+        with self._lock:
+            ahora = time.monotonic()
+            turno = max(ahora, self._siguiente)
+            self._siguiente = turno + self.intervalo
+        if turno > ahora:
+            time.sleep(turno - ahora)
+class DespachadorNotificaciones:
+    """Envía lotes de emails y WhatsApp en paralelo con límites de tasa por canal"""
+    def __init__(self, canal_email=None, canal_whatsapp=None, hilos=4, tasa_email=5.0, tasa_whatsapp=1.0):
+        self.canal_email = canal_email
+        self.canal_whatsapp = canal_whatsapp
+        self.hilos = hilos
+        self._limites = {"email": LimitadorTasa(tasa_email), "whatsapp": LimitadorTasa(tasa_whatsapp)}
+    def enviar_lote(self, mensajes, al_avanzar=None):
+        """Envía mensajes {canal, destino, cuerpo, asunto?, etiqueta?}; devuelve [(mensaje, ok, detalle)]"""
+        local = threading.local()
+        conexiones = []
+        conexiones_lock = threading.Lock()
+        def conexion_smtp():
+            # Una conexión autenticada por hilo, reutilizada durante todo el lote
+            if getattr(local, "smtp", None) is None:
+                local.smtp = self.canal_email.conectar()
+                with conexiones_lock:
+                    conexiones.append(local.smtp)
+            return local.smtp
+        def enviar(mensaje):
+            self._limites[mensaje["canal"]].esperar()
+            if mensaje["canal"] == "email":
+                try:
+                    self.canal_email.enviar(conexion_smtp(), mensaje["destino"], mensaje.get("asunto", ""), mensaje["cuerpo"])
+                except smtplib.SMTPServerDisconnected:
+                    local.smtp = None
+                    self.canal_email.enviar(conexion_smtp(), mensaje["destino"], mensaje.get("asunto", ""), mensaje["cuerpo"])
+                return "Éxito"
+            return self.canal_whatsapp.enviar(mensaje["destino"], mensaje["cuerpo"])
+        resultados = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix="notificaciones") as ejecutor:
+                futuros = {ejecutor.submit(enviar, m): m for m in mensajes}
+                for i, futuro in enumerate(as_completed(futuros), start=1):
+                    mensaje = futuros[futuro]
+                    try:
+                        resultados.append((mensaje, True, futuro.result()))
+                    except Exception as e:
+                        logger.error(f"Error enviando {mensaje['canal']} a {mensaje['destino']}: {e}")
+                        resultados.append((mensaje, False, str(e)))
+                    if al_avanzar:
+                        al_avanzar(i, len(futuros))
+        finally:
+            for conexion in conexiones:
+                try:
+                    conexion.quit()
+                except Exception:
+                    pass
+        return resultados
+def crear_despachador(config):
+    """Arma el despachador con los canales definidos en la configuración"""
+    return DespachadorNotificaciones(
+        CanalEmail(config["SMTP_SERVER"], config["SMTP_PORT"], config["SMTP_EMAIL"], config["SMTP_PASSWORD"],
+                   usar_tls=config["SMTP_TLS"]),
+        CanalWhatsApp(config["TWILIO_ACCOUNT_SID"], config["TWILIO_AUTH_TOKEN"], config["TWILIO_WHATSAPP_FROM"],
+                      api_url=config["TWILIO_API_URL"]),
+        hilos=config["NOTIF_HILOS"],
+        tasa_email=config["NOTIF_TASA_EMAIL"],
+        tasa_whatsapp=config["NOTIF_TASA_WHATSAPP"]
+    )
@@ -0,0 +1,245 @@
+import json
+import logging
+import os
+import shutil
+from datetime import date, datetime
+from rifa.archivos import escribir_json_atomico, leer_json
+from rifa.exportacion import clave_version, iterar_json, iterar_participantes_csv, iterar_resultados_csv, preparar_exportacion
+from rifa.metricas import medido
+from rifa.pagos import cambios_pago_aprobado
+from rifa.sorteo import MENSAJE_EMAIL_POR_DEFECTO, MENSAJE_WHATSAPP_POR_DEFECTO, hora_argentina
+logger = logging.getLogger(__name__)
+# ----------------------------
+# OPERACIONES DE UNA RIFA (SIN INTERFAZ: LAS USAN LA APP Y `python -m rifa`)
+# ----------------------------
+# Reciben el ContextoRifa (rifa.rifas) y devuelven datos; mostrar el resultado queda a cargo de quien llama.
+MENSAJE_RECORDATORIO_POR_DEFECTO = """Hola {nombre},
+Te recordamos que tu pago para la rifa está pendiente.
+Detalles:
+- Boleto: {boleto}
+- Monto: ${monto}
+- Enlace de pago: {enlace_pago}
+Por favor, realiza el pago para confirmar tu participación.
+¡Gracias!"""
+# --- Premios y plantillas ---
+def cargar_premios(rifa):
+    """Premios de la rifa (lista vacía si no hay archivo)"""
+    return leer_json(rifa.config["RUTA_PREMIOS"], [])
+def guardar_premios(rifa, premios):
+    """Guarda la lista de premios (también la leen el programador y los respaldos)"""
+    escribir_json_atomico(rifa.config["RUTA_PREMIOS"], premios, indent=4)
+    logger.info(f"Premios guardados en {rifa.config['RUTA_PREMIOS']}")
+def cargar_plantillas(rifa):
+    """Plantillas de los avisos a ganadores, con los textos por defecto si no se guardaron"""
+    guardadas = leer_json(rifa.config["RUTA_MENSAJES"], {})
+    return {
+        "mensaje_email": guardadas.get("mensaje_email", MENSAJE_EMAIL_POR_DEFECTO),
+        "mensaje_whatsapp": guardadas.get("mensaje_whatsapp", MENSAJE_WHATSAPP_POR_DEFECTO),
+    }
+def guardar_plantillas(rifa, plantillas):
+    escribir_json_atomico(rifa.config["RUTA_MENSAJES"], plantillas, indent=4)
+# --- Participantes y pagos ---
+def marcar_pagado(rifa, boleto, **datos_pago):
+    """Marca como pagado el participante del boleto; devuelve el registro o None"""
+    cambios = {"estado_pago": "pagado", "fecha_pago": datetime.now().isoformat(), **datos_pago}
+    return rifa.almacen().actualizar(boleto, cambios)
+def guardar_enlaces_pago(rifa, enlaces):
+    """Guarda los enlaces {boleto: enlace} creados en segundo plano"""
+    rifa.almacen().actualizar_muchos({boleto: {"link_pago": enlace} for boleto, enlace in enlaces.items()})
+    logger.info(f"{len(enlaces)} enlaces de pago actualizados")
+def mensaje_boleto_tomado(rifa, boleto):
+    """Mensaje de boleto tomado con los números libres más cercanos"""
+    libres = rifa.cache().sugerir_libres(boleto)
+    sugerencia = f" Libres cercanos: {', '.join(libres)}" if libres else ""
+    return f"Ese boleto ya está tomado. Elige otro.{sugerencia}"
+@medido("registro")
+def registrar_participante(rifa, participante):
+    """Reserva el boleto, crea el enlace de pago y confirma el registro de forma atómica"""
+    almacen = rifa.almacen()
+    boleto = participante["boleto"]
+    diferido = rifa.config["MP_ENLACE_DIFERIDO"]
+    if not almacen.reservar(boleto):
+        return False, mensaje_boleto_tomado(rifa, boleto)
+    try:
+        if diferido:
+            participante["link_pago"] = rifa.config["ENLACE_PAGO_FALLBACK"]
+        else:
+            participante["link_pago"] = rifa.cliente_mp().crear_enlace(
+                boleto, participante["nombre"], participante["email"], rifa.config["MONTO_RIFA"]
+            )
+        if not almacen.confirmar_reserva(participante):
+            return False, mensaje_boleto_tomado(rifa, boleto)
+        if diferido:
+            rifa.cliente_mp().crear_enlaces_en_segundo_plano(
+                [participante], lambda enlaces: guardar_enlaces_pago(rifa, enlaces)
+            )
+        return True, participante["link_pago"]
+    except Exception as e:
+        almacen.liberar_reserva(boleto)
+        logger.error(f"Error registrando boleto {boleto}: {e}")
+        return False, "Error al guardar el registro. Intenta nuevamente."
+def procesar_notificacion_pago(rifa, datos_webhook):
+    """Aplica una notificación de pago de Mercado Pago; devuelve (ok, mensaje)"""
+    try:
+        if datos_webhook.get("type") == "payment":
+            payment_id = datos_webhook.get("data", {}).get("id")
+            if not rifa.config["MP_ACCESS_TOKEN"]:
+                return False, "MP_ACCESS_TOKEN no configurado"
+            cliente_mp = rifa.cliente_mp()
+            pago = cliente_mp.obtener_pago(payment_id)
+            cambios = cambios_pago_aprobado(pago)
+            boleto = cliente_mp.boleto_de_pago(pago) if cambios else None
+            if boleto and rifa.almacen().actualizar(boleto, cambios):
+                logger.info(f"Pago confirmado para boleto {boleto}")
+                return True, "Pago procesado correctamente"
+        return False, "Webhook no procesado"
+    except Exception as e:
+        logger.error(f"Error en webhook: {e}")
+        return False, str(e)
+def importar_participantes_csv(rifa, archivo, al_avanzar=None, al_crear_enlaces=None):
+    """Importa un CSV de participantes y crea sus enlaces de pago; devuelve el resumen de la importación"""
+    from rifa.importacion import importar_csv
+    resumen = importar_csv(archivo, rifa.almacen(), rifa.config["ENLACE_PAGO_FALLBACK"], al_avanzar=al_avanzar)
+    nuevos = resumen.pop("participantes_nuevos", [])
+    if nuevos and rifa.config["MP_ACCESS_TOKEN"]:
+        cliente_mp = rifa.cliente_mp()
+        if rifa.config["MP_ENLACE_DIFERIDO"]:
+            cliente_mp.crear_enlaces_en_segundo_plano(nuevos, lambda enlaces: guardar_enlaces_pago(rifa, enlaces))
+        else:
+            guardar_enlaces_pago(rifa, cliente_mp.crear_enlaces_lote(nuevos, al_avanzar=al_crear_enlaces))
+    return resumen
+def conciliar_pagos(rifa, dias=3, aplicar=True):
+    """Concilia los pagos aprobados en Mercado Pago de los últimos 'dias' días; devuelve el reporte"""
+    from rifa.conciliacion import conciliar, rango_fechas
+    return conciliar(rifa.almacen(), rifa.cliente_mp(), *rango_fechas(dias), aplicar=aplicar)
+# --- Respaldos ---
+def respaldos_anteriores(rifa):
+    """Respaldos en el formato anterior (un único JSON con todo), del más nuevo al más viejo"""
+    carpeta = rifa.config["CARPETA_BACKUPS"]
+    if not os.path.isdir(carpeta):
+        return []
+    return sorted((f for f in os.listdir(carpeta) if f.startswith("backup_") and f.endswith(".json")), reverse=True)
+def crear_respaldo(rifa, forzar_instantanea=False):
+    """Crea un respaldo (delta o instantánea); devuelve su descripción o None si no hubo cambios"""
+    respaldo = rifa.respaldos().respaldar(forzar_instantanea=forzar_instantanea)
+    if respaldo:
+        logger.info(f"Backup creado: {respaldo['archivo']}")
+    return respaldo
+def restaurar_respaldo(rifa, archivo):
+    """Restaura participantes, premios e historial desde un respaldo; devuelve los datos extra restaurados"""
+    if archivo.endswith(".json"):
+        with open(os.path.join(rifa.config["CARPETA_BACKUPS"], archivo), "r", encoding="utf-8") as f:
+            datos = json.load(f)
+        rifa.almacen().reemplazar_todos(datos.get("participantes", []))
+    else:
+        datos = rifa.respaldos().restaurar(archivo)
+    guardar_premios(rifa, datos.get("premios", []))
+    rifa.historial().reemplazar(datos.get("historial_sorteos", []))
+    logger.info(f"Backup restaurado: {archivo}")
+    return datos
+# --- Exportación e importación completa ---
+def datos_exportables(rifa, premios=None, plantillas=None):
+    """Premios y plantillas que acompañan a la exportación JSON (por defecto, los guardados)"""
+    return {
+        "premios": cargar_premios(rifa) if premios is None else premios,
+        **(cargar_plantillas(rifa) if plantillas is None else plantillas),
+    }
+@medido("exportar_json")
+def exportar_json(rifa, premios=None, plantillas=None):
+    """Archivo JSON con todos los datos para la versión actual (se regenera solo si cambiaron)"""
+    extras = datos_exportables(rifa, premios, plantillas)
+    version = clave_version(rifa.almacen().version(), rifa.historial().version(), extras)
+    def bloques():
+        campos = {
+            "rifa_nombre": rifa.config["RIFA_NOMBRE"],
+            "fecha_exportacion": datetime.now().isoformat(),
+            **extras,
+            "historial_sorteos": list(rifa.historial().iterar())
+        }
+        return iterar_json(campos, "participantes", rifa.cache().todos())
+    return preparar_exportacion(rifa.config["CARPETA_EXPORTACIONES"], "rifa_datos", "json", version, bloques)
+@medido("exportar_participantes_csv")
+def exportar_participantes_csv(rifa):
+    """Archivo CSV de participantes para la versión actual de los datos"""
+    return preparar_exportacion(
+        rifa.config["CARPETA_EXPORTACIONES"], "participantes_rifa", "csv", clave_version(rifa.almacen().version()),
+        lambda: iterar_participantes_csv(rifa.cache().todos())
+    )
+@medido("exportar_resultados_csv")
+def exportar_resultados_csv(rifa):
+    """Archivo CSV con los ganadores de todos los sorteos, generado por bloques desde el historial"""
+    historial = rifa.historial()
+    return preparar_exportacion(
+        rifa.config["CARPETA_EXPORTACIONES"], "historial_resultados", "csv", clave_version(historial.version()),
+        lambda: iterar_resultados_csv(historial.iterar())
+    )
+def importar_datos(rifa, datos):
+    """Reemplaza todos los datos de la rifa por los de una exportación JSON; devuelve (premios, plantillas)"""
+    premios = datos.get("premios", [])
+    actuales = cargar_plantillas(rifa)
+    plantillas = {clave: datos.get(clave, valor) for clave, valor in actuales.items()}
+    guardar_premios(rifa, premios)
+    guardar_plantillas(rifa, plantillas)
+    rifa.historial().reemplazar(datos.get("historial_sorteos", []))
+    rifa.almacen().reemplazar_todos(datos.get("participantes", []))
+    logger.info("Datos cargados desde archivo")
+    return premios, plantillas
+def reiniciar(rifa, todo=False):
+    """Borra participantes e historial; con 'todo' también respaldos, premios y plantillas"""
+    rifa.almacen().eliminar_todos()
+    rifa.historial().vaciar()
+    if todo:
+        shutil.rmtree(rifa.config["CARPETA_BACKUPS"], ignore_errors=True)
+        os.makedirs(rifa.config["CARPETA_BACKUPS"], exist_ok=True)
+        for archivo in (rifa.config["RUTA_PREMIOS"], rifa.config["RUTA_MENSAJES"]):
+            if os.path.exists(archivo):
+                os.remove(archivo)
+    logger.info(f"Rifa reiniciada{' por completo' if todo else ''}")
+# --- Sorteo y notificaciones ---
+def realizar_sorteo(rifa, numero_oficial, fecha=None, premios=None, plantillas=None):
+    """Resuelve el sorteo de 'fecha' (hoy por defecto) con el número oficial; devuelve (sorteo, nuevo, avisos)"""
+    from rifa.programador import procesar_sorteo
+    return procesar_sorteo(
+        fecha or hora_argentina().date().isoformat(), numero_oficial, rifa.cache().indice_sorteo(),
+        cargar_premios(rifa) if premios is None else premios, rifa.historial(), rifa.cola(),
+        cargar_plantillas(rifa) if plantillas is None else plantillas
+    )
+def trabajos_recordatorio(rifa, participantes, asunto, plantilla, por_email=True, por_whatsapp=False, tanda=None):
+    """Trabajos de la cola para recordar el pago; la clave incluye la tanda para no repetirlos en el día"""
+    tanda = tanda or date.today().isoformat()
+    trabajos = []
+    for participante in participantes:
+        # Un error en la plantilla (KeyError, ValueError...) se propaga antes de encolar nada
+        mensaje = plantilla.format(
+            nombre=participante['nombre'],
+            boleto=participante['boleto'],
+            monto=rifa.config["MONTO_RIFA"],
+            enlace_pago=participante.get('link_pago', rifa.config["ENLACE_PAGO_FALLBACK"])
+        )
+        if por_email and participante.get('email'):
+            trabajos.append((f"recordatorio:{tanda}:{participante['boleto']}:email", "email", {
+                "destino": participante['email'], "asunto": asunto,
+                "cuerpo": mensaje, "etiqueta": participante['nombre']
+            }))
+        if por_whatsapp and participante.get('telefono'):
+            trabajos.append((f"recordatorio:{tanda}:{participante['boleto']}:whatsapp", "whatsapp", {
+                "destino": participante['telefono'], "cuerpo": mensaje, "etiqueta": participante['nombre']
+            }))
+    return trabajos
+def encolar_recordatorios(rifa, asunto, plantilla=MENSAJE_RECORDATORIO_POR_DEFECTO, por_email=True, por_whatsapp=False):
+    """Encola recordatorios para los pendientes de pago; devuelve (nuevos, total)"""
+    pendientes = rifa.almacen().listar(estado_pago="pendiente")
+    trabajos = trabajos_recordatorio(rifa, pendientes, asunto, plantilla, por_email, por_whatsapp)
+    return rifa.cola().encolar_muchos(trabajos), len(trabajos)
+def enviar_notificaciones(rifa, limite=50):
+    """Envía los trabajos de la cola de esta rifa con su propia configuración; devuelve la cantidad procesada"""
+    from rifa.notificaciones import crear_despachador
+    from rifa.worker import procesar_lote
+    cola = rifa.cola()
+    despachador = crear_despachador(rifa.config)
+    total = 0
+    while True:
+        procesados = procesar_lote(cola, lambda rifa_id: despachador, limite)
+        if not procesados:
+            return total
+        total += procesados
@@ -0,0 +1,185 @@
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from rifa.metricas import medido
+logger = logging.getLogger(__name__)
+# ----------------------------
+# CLIENTE DE MERCADO PAGO (SESIÓN CON POOL DE CONEXIONES)
+# ----------------------------
+MP_API_URL = "https://api.mercadopago.com"
+def crear_sesion(reintentos=3, tamano_pool=20):
+    """Sesión HTTP con keep-alive, pool de conexiones y reintentos con backoff exponencial"""
+    # requests se importa al crear la primera sesión: importar este módulo no la carga
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    retry = Retry(
+        total=reintentos,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "POST"]),
+        raise_on_status=False,
+    )
+    adaptador = HTTPAdapter(pool_connections=tamano_pool, pool_maxsize=tamano_pool, max_retries=retry)
+    sesion = requests.Session()
+    sesion.mount("https://", adaptador)
+    sesion.mount("http://", adaptador)
+    return sesion
+def cambios_pago_aprobado(pago):
+    """Cambios a aplicar al participante por un pago aprobado; None si el pago no corresponde"""
+    if not pago or pago.get("status") != "approved" or not pago.get("external_reference"):
+        return None
+    return {
+        "estado_pago": "pagado",
+        "fecha_pago": datetime.now().isoformat(),
+        "id_pago_mp": str(pago.get("id", "")),
+        "metodo_pago": pago.get("payment_method_id", "")
+    }
+def _dividir_nombre(nombre):
+    partes = nombre.split()
+    return (partes[0] if partes else ""), " ".join(partes[1:])
+class ClienteMercadoPago:
+    """Crea enlaces de pago y consulta pagos reutilizando una sola sesión HTTP"""
+    def __init__(self, access_token, descripcion_rifa, monto, webhook_url="",
+                 enlace_fallback="https://www.mercadopago.com.ar/", api_url=MP_API_URL,
+                 max_concurrencia=8, timeout=10, sesion=None, rifa_id=""):
+        self.access_token = access_token
+        self.descripcion_rifa = descripcion_rifa
+        self.monto = monto
+        self.webhook_url = webhook_url
+        self.enlace_fallback = enlace_fallback
+        # Con varias rifas en un servidor, las referencias y las páginas de retorno llevan el id de la rifa
+        self.rifa_id = rifa_id
+        self.sufijo_rifa = f"&rifa={rifa_id}" if rifa_id else ""
+        self.api_url = api_url.rstrip("/")
+        self.max_concurrencia = max_concurrencia
+        self.timeout = timeout
+        self.sesion = sesion or crear_sesion(tamano_pool=max(max_concurrencia, 10))
+        self._ejecutor_fondo = None
+        self._lock = threading.Lock()
+    def _headers(self, clave_idempotencia=None):
+        headers = {
+            "Authorization": f"Bearer {self.access_token}",
+            "Content-Type": "application/json"
+        }
+        if clave_idempotencia:
+            headers["X-Idempotency-Key"] = clave_idempotencia
+        return headers
+    def referencia(self, boleto):
+        """external_reference del boleto en Mercado Pago"""
+        return f"{self.rifa_id}:{boleto}" if self.rifa_id else boleto
+    def boleto_de_pago(self, pago):
+        """Boleto al que corresponde el pago; None si no tiene referencia o es de otra rifa"""
+        referencia = str(pago.get("external_reference") or "")
+        if not self.rifa_id:
+            return referencia or None
+        prefijo = f"{self.rifa_id}:"
+        return referencia[len(prefijo):] if referencia.startswith(prefijo) else None
+    def _payload_preferencia(self, boleto, nombre, email, monto):
+        nombre_pila, apellido = _dividir_nombre(nombre)
+        return {
+            "transaction_amount": float(monto),
+            "description": f"{self.descripcion_rifa} - Boleto {boleto}",
+            "payment_method_id": "ticket",
+            "payer": {
+                "email": email,
+                "first_name": nombre_pila,
+                "last_name": apellido
+            },
+            "external_reference": self.referencia(boleto),
+            "notification_url": f"{self.webhook_url}/webhook" if self.webhook_url else None,
+            "back_urls": {
+                "success": f"{self.webhook_url}?page=exito&boleto={boleto}{self.sufijo_rifa}",
+                "pending": f"{self.webhook_url}?page=pending{self.sufijo_rifa}",
+                "failure": f"{self.webhook_url}?page=error{self.sufijo_rifa}"
+            },
+            "auto_return": "approved"
+        }
+    @medido("mp_crear_enlace")
+    def crear_enlace(self, boleto, nombre, email, monto=None):
+        """Crea un enlace de pago personalizado; usa el enlace genérico si algo falla"""
+        if not self.access_token:
+            logger.warning("MP_ACCESS_TOKEN no configurado. Usando enlace genérico.")
+            return self.enlace_fallback
+        try:
+            response = self.sesion.post(
+                f"{self.api_url}/checkout/preferences",
+                json=self._payload_preferencia(boleto, nombre, email, monto or self.monto),
+                headers=self._headers(f"preferencia-{self.referencia(boleto)}"),
+                timeout=self.timeout
+            )
+            if response.status_code == 201:
+                return response.json()["init_point"]
+            logger.error(f"Error MP API ({response.status_code}): {response.text[:200]}")
+            return self.enlace_fallback
+        except Exception as e:
+            logger.error(f"Excepción al crear enlace de pago: {e}")
+            return self.enlace_fallback
+    @medido("mp_crear_enlaces_lote")
+    def crear_enlaces_lote(self, solicitudes, al_avanzar=None):
+        """Crea enlaces para muchos boletos con concurrencia acotada; devuelve {boleto: enlace}"""
+        enlaces = {}
+        if not solicitudes:
+            return enlaces
+        with ThreadPoolExecutor(max_workers=self.max_concurrencia) as ejecutor:
+            futuros = {
+                ejecutor.submit(self.crear_enlace, s["boleto"], s.get("nombre", ""), s.get("email", "")): s["boleto"]
+                for s in solicitudes
+            }
+            for i, futuro in enumerate(as_completed(futuros), start=1):
+                enlaces[futuros[futuro]] = futuro.result()
+                if al_avanzar:
+                    al_avanzar(i, len(futuros))
+        return enlaces
+    def crear_enlaces_en_segundo_plano(self, solicitudes, al_terminar):
+        """Crea los enlaces en un hilo de fondo y entrega el resultado a 'al_terminar'"""
+        def tarea():
+            try:
+                al_terminar(self.crear_enlaces_lote(solicitudes))
+            except Exception as e:
+                logger.error(f"Error creando enlaces en segundo plano: {e}")
+        with self._lock:
+            if self._ejecutor_fondo is None:
+                self._ejecutor_fondo = ThreadPoolExecutor(max_workers=2, thread_name_prefix="mp-enlaces")
+        return self._ejecutor_fondo.submit(tarea)
+    @medido("mp_obtener_pago")
+    def obtener_pago(self, payment_id):
+        """Consulta un pago por id; devuelve el dict del pago o None"""
+        response = self.sesion.get(
+            f"{self.api_url}/v1/payments/{payment_id}",
+            headers=self._headers(),
+            timeout=self.timeout
+        )
+        if response.status_code == 200:
+            return response.json()
+        logger.error(f"Error consultando pago {payment_id} ({response.status_code}): {response.text[:200]}")
+        return None
+    def buscar_pagos(self, desde, hasta, offset=0, limite=100):
+        """Una página de la búsqueda de pagos por fecha de creación; devuelve (total, resultados)"""
+        response = self.sesion.get(
+            f"{self.api_url}/v1/payments/search",
+            params={
+                "range": "date_created",
+                "begin_date": desde,
+                "end_date": hasta,
+                "sort": "date_created",
+                "criteria": "asc",
+                "offset": offset,
+                "limit": limite
+            },
+            headers=self._headers(),
+            timeout=self.timeout
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"Error buscando pagos ({response.status_code}): {response.text[:200]}")
+        datos = response.json()
+        return datos.get("paging", {}).get("total", 0), datos.get("results", [])
+    def buscar_todos_pagos(self, desde, hasta, por_pagina=100):
+        """Todos los pagos del rango: lee la primera página y pide el resto en paralelo"""
+        total, pagos = self.buscar_pagos(desde, hasta, 0, por_pagina)
+        offsets = range(por_pagina, total, por_pagina)
+        with ThreadPoolExecutor(max_workers=self.max_concurrencia) as ejecutor:
+            for _, resultados in ejecutor.map(lambda o: self.buscar_pagos(desde, hasta, o, por_pagina), offsets):
+                pagos.extend(resultados)
+        return pagos
@@ -0,0 +1,108 @@
+import argparse
+import logging
+import threading
+from rifa import metricas
+from rifa.almacen import AlmacenParticipantes
+from rifa.archivos import leer_json
+from rifa.cola import ColaTrabajos
+from rifa.config import cargar_configuracion, configuracion_desde_argumentos
+from rifa.historial import HistorialSorteos
+from rifa.resultados import ProveedorResultados, fuentes_desde_config
+from rifa.sorteo import (
+    MENSAJE_EMAIL_POR_DEFECTO, MENSAJE_WHATSAPP_POR_DEFECTO, IndiceSorteo, detallar_ganadores, hora_argentina,
+    momento_sorteo, proximo_sorteo, reglas_desde_premios, registro_sorteo, trabajos_notificacion_ganadores
+)
+logger = logging.getLogger(__name__)
+# ----------------------------
+# PROGRAMADOR DE SORTEOS (PROCESO SEPARADO DE STREAMLIT)
+# ----------------------------
+def procesar_sorteo(fecha, numero_oficial, indice, premios, historial, cola, plantillas):
+    """Resuelve ganadores, registra el sorteo y encola avisos una sola vez por fecha; devuelve (sorteo, nuevo, avisos_nuevos)"""
+    reglas = reglas_desde_premios(premios)
+    ganadores = detallar_ganadores(indice.evaluar(numero_oficial, reglas))
+    sorteo, nuevo = historial.agregar_si_nuevo(registro_sorteo(fecha, numero_oficial, reglas, ganadores))
+    # Las claves de la cola (fecha, boleto, canal) hacen que reintentar no duplique avisos
+    avisos = cola.encolar_muchos(trabajos_notificacion_ganadores(
+        sorteo["ganadores"], fecha, plantillas.get("mensaje_email", MENSAJE_EMAIL_POR_DEFECTO),
+        plantillas.get("mensaje_whatsapp", MENSAJE_WHATSAPP_POR_DEFECTO), sorteo["premio"]
+    ))
+    return sorteo, nuevo, avisos
+class ProgramadorSorteos:
+    """Despierta a la hora del sorteo, consulta el resultado con reintentos y procesa a los ganadores"""
+    def __init__(self, config, espera_inicial=30, espera_maxima=600, plazo_horas=6):
+        self.config = config
+        self.almacen = AlmacenParticipantes(config["RUTA_BD"])
+        self.historial = HistorialSorteos(config["RUTA_BD"])
+        self.cola = ColaTrabajos(config["RUTA_COLA"], max_intentos=config["COLA_MAX_INTENTOS"], espacio=config["COLA_ESPACIO"])
+        self.proveedor = ProveedorResultados(config["RUTA_RESULTADOS"], fuentes_desde_config(config["RESULTADOS_FUENTES"]))
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self.plazo_horas = plazo_horas
+        self._detener = threading.Event()
+    def esperar_numero(self, fecha):
+        """Consulta el resultado con backoff exponencial hasta que aparezca o venza el plazo"""
+        espera = self.espera_inicial
+        limite = momento_sorteo(fecha).timestamp() + self.plazo_horas * 3600
+        while not self._detener.is_set():
+            numero = self.proveedor.obtener(fecha)
+            if numero:
+                return numero
+            if hora_argentina().timestamp() + espera > limite:
+                return None
+            logger.info(f"Resultado del {fecha} aún no publicado; nuevo intento en {espera} s")
+            self._detener.wait(espera)
+            espera = min(espera * 2, self.espera_maxima)
+        return None
+    def ejecutar_fecha(self, fecha):
+        """Procesa el sorteo de 'fecha' si todavía no figura en el historial"""
+        if self.historial.por_fecha(fecha):
+            logger.info(f"El sorteo del {fecha} ya estaba procesado")
+            return None
+        numero = self.esperar_numero(fecha)
+        if not numero:
+            logger.error(f"No se obtuvo el resultado del {fecha} dentro del plazo")
+            return None
+        indice = IndiceSorteo(self.almacen.listar(estado_pago="pagado"))
+        sorteo, nuevo, avisos = procesar_sorteo(
+            fecha, numero, indice, leer_json(self.config["RUTA_PREMIOS"], []), self.historial, self.cola,
+            leer_json(self.config["RUTA_MENSAJES"], {})
+        )
+        logger.info(
+            f"Sorteo del {fecha}: número {sorteo['numero_oficial']}, {len(sorteo['ganadores'])} ganadores, "
+            f"{avisos} avisos encolados{'' if nuevo else ' (ya registrado)'}"
+        )
+        return sorteo
+    def ejecutar(self):
+        """Bucle principal: procesa el sorteo de hoy si ya pasó la hora y luego espera al siguiente"""
+        while not self._detener.is_set():
+            ahora = hora_argentina()
+            hoy = ahora.date().isoformat()
+            if ahora >= momento_sorteo(hoy) and not self.historial.por_fecha(hoy):
+                try:
+                    self.ejecutar_fecha(hoy)
+                except Exception as e:
+                    logger.error(f"Error procesando el sorteo del {hoy}: {e}")
+                    self._detener.wait(self.espera_inicial)
+                    continue
+            siguiente = proximo_sorteo()
+            logger.info(f"Próximo sorteo: {siguiente:%Y-%m-%d %H:%M} (hora Argentina)")
+            self._detener.wait(max((siguiente - hora_argentina()).total_seconds(), 1))
+    def detener(self):
+        self._detener.set()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Procesa automáticamente cada sorteo de la Nocturna")
+    parser.add_argument("--fecha", help="Procesar solo el sorteo de esta fecha (YYYY-MM-DD) y terminar")
+    parser.add_argument("--rifa", help="Id de la rifa (ver RIFAS_ARCHIVO); por defecto la primera")
+    parser.add_argument("--metricas-puerto", type=int, default=0, help="Exponer /metrics en este puerto (con METRICAS=1)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    config = configuracion_desde_argumentos(cargar_configuracion(), args.rifa)
+    metricas.configurar(config, puerto=args.metricas_puerto)
+    programador = ProgramadorSorteos(config)
+    try:
+        if args.fecha:
+            programador.ejecutar_fecha(args.fecha)
+        else:
+            programador.ejecutar()
+    except KeyboardInterrupt:
+        programador.detener()
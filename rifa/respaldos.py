@@ -0,0 +1,228 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import struct
+import threading
+import zlib
+from datetime import datetime
+from rifa.almacen import AlmacenParticipantes
+from rifa.archivos import escribir_atomico
+from rifa.config import cargar_configuracion, configuracion_desde_argumentos
+from rifa.historial import HistorialSorteos
+logger = logging.getLogger(__name__)
+# ----------------------------
+# RESPALDOS: INSTANTÁNEAS COMPLETAS + DELTAS INCREMENTALES
+# ----------------------------
+# Formato .rbk: MAGIA y luego marcos [tipo:1][largo:4][crc32:4][JSON comprimido con zlib]
+#   C  cabecera {tipo: instantanea|delta, base, epoca, rev_desde, rev, fecha, ...}
+#   P  bloque de participantes    B  boletos borrados    E  datos extra (premios, sorteos...)
+#   F  cierre {marcos, participantes, sha256 de todos los marcos anteriores}
+MAGIA = b"RIFARESP1\n"
+EXTENSION = ".rbk"
+_MARCO = struct.Struct(">cII")
+def _marco(tipo, objeto):
+    datos = zlib.compress(json.dumps(objeto, default=str, ensure_ascii=False).encode("utf-8"), 6)
+    return _MARCO.pack(tipo, len(datos), zlib.crc32(datos)) + datos
+def leer_respaldo(ruta, solo_cabecera=False):
+    """Recorre el archivo marco a marco verificando sumas; genera (tipo, objeto)"""
+    huella = hashlib.sha256()
+    marcos = participantes = 0
+    with open(ruta, "rb") as f:
+        if f.read(len(MAGIA)) != MAGIA:
+            raise ValueError(f"{ruta} no es un respaldo válido")
+        while True:
+            encabezado = f.read(_MARCO.size)
+            if len(encabezado) < _MARCO.size:
+                raise ValueError(f"Respaldo incompleto: {ruta}")
+            tipo, largo, crc = _MARCO.unpack(encabezado)
+            datos = f.read(largo)
+            if len(datos) < largo or zlib.crc32(datos) != crc:
+                raise ValueError(f"Respaldo dañado (marco {marcos}): {ruta}")
+            objeto = json.loads(zlib.decompress(datos))
+            if tipo == b"F":
+                if objeto != {"marcos": marcos, "participantes": participantes, "sha256": huella.hexdigest()}:
+                    raise ValueError(f"El cierre no coincide con el contenido: {ruta}")
+                return
+            huella.update(encabezado + datos)
+            marcos += 1
+            if tipo == b"P":
+                participantes += len(objeto)
+            yield tipo.decode(), objeto
+            if solo_cabecera:
+                return
+def leer_cabecera(ruta):
+    for tipo, objeto in leer_respaldo(ruta, solo_cabecera=True):
+        if tipo == "C":
+            return {**objeto, "archivo": os.path.basename(ruta), "bytes": os.path.getsize(ruta)}
+    raise ValueError(f"Respaldo sin cabecera: {ruta}")
+class GestorRespaldos:
+    """Crea, lista, poda y restaura respaldos de un almacén de participantes"""
+    def __init__(self, carpeta, almacen, extras=None, max_deltas=24, max_instantaneas=5):
+        self.carpeta = carpeta
+        self.almacen = almacen
+        self.extras = extras or (lambda: {})
+        self.max_deltas = max_deltas
+        self.max_instantaneas = max_instantaneas
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._detener = threading.Event()
+        os.makedirs(carpeta, exist_ok=True)
+    def listar(self):
+        """Cabeceras de los respaldos, del más antiguo al más reciente"""
+        cabeceras = []
+        for archivo in sorted(os.listdir(self.carpeta)):
+            if archivo.endswith(EXTENSION):
+                try:
+                    cabeceras.append(leer_cabecera(os.path.join(self.carpeta, archivo)))
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Respaldo ignorado {archivo}: {e}")
+        return cabeceras
+    def respaldar(self, extras=None, forzar_instantanea=False):
+        """Crea una instantánea o un delta desde el último respaldo; devuelve su cabecera o None si no hubo cambios"""
+        with self._lock:
+            extras = self.extras() if extras is None else extras
+            huella_extras = hashlib.sha1(json.dumps(extras, default=str, sort_keys=True).encode("utf-8")).hexdigest()
+            respaldos = self.listar()
+            ultimo = respaldos[-1] if respaldos else None
+            base = next((r for r in reversed(respaldos) if r["tipo"] == "instantanea"), None)
+            deltas = sum(1 for r in respaldos if base and r["base"] == base["archivo"] and r["tipo"] == "delta")
+            epoca, rev = self.almacen.version()
+            instantanea = (
+                forzar_instantanea or not ultimo or not base or ultimo["epoca"] != epoca or deltas >= self.max_deltas
+            )
+            if not instantanea and ultimo["rev"] == rev and ultimo["huella_extras"] == huella_extras:
+                return None
+            fecha = datetime.now()
+            tipo = "instantanea" if instantanea else "delta"
+            archivo = f"{fecha:%Y%m%d_%H%M%S_%f}_{tipo}{EXTENSION}"
+            rev_desde = 0 if instantanea else ultimo["rev"]
+            cabecera = {
+                "tipo": tipo,
+                "base": archivo if instantanea else base["archivo"],
+                "fecha": fecha.isoformat(),
+                "rev_desde": rev_desde,
+                "huella_extras": huella_extras,
+            }
+            resumen = {"participantes": 0, "borrados": 0}
+            def marcos():
+                huella = hashlib.sha256()
+                cuenta = 0
+                def emitir(tipo_marco, objeto):
+                    nonlocal cuenta
+                    marco = _marco(tipo_marco, objeto)
+                    huella.update(marco)
+                    cuenta += 1
+                    return marco
+                yield MAGIA
+                for clase, contenido in self.almacen.leer_cambios(rev_desde):
+                    if clase == "version":
+                        cabecera["epoca"], cabecera["rev"] = contenido
+                        yield emitir(b"C", cabecera)
+                        yield emitir(b"E", extras)
+                    elif clase == "participantes":
+                        resumen["participantes"] += len(contenido)
+                        yield emitir(b"P", contenido)
+                    else:
+                        resumen["borrados"] += len(contenido)
+                        yield emitir(b"B", contenido)
+                yield _marco(b"F", {"marcos": cuenta, "participantes": resumen["participantes"], "sha256": huella.hexdigest()})
+            ruta = escribir_atomico(os.path.join(self.carpeta, archivo), marcos(), binario=True)
+            if instantanea:
+                self._podar()
+            logger.info(f"Respaldo {tipo} creado: {ruta} ({resumen['participantes']} participantes, {resumen['borrados']} borrados)")
+            return {**cabecera, **resumen, "archivo": archivo, "bytes": os.path.getsize(ruta)}
+    def _podar(self):
+        """Conserva solo las últimas 'max_instantaneas' instantáneas con sus deltas"""
+        respaldos = self.listar()
+        bases = [r["archivo"] for r in respaldos if r["tipo"] == "instantanea"][-self.max_instantaneas:]
+        for r in respaldos:
+            if r["base"] not in bases:
+                try:
+                    os.remove(os.path.join(self.carpeta, r["archivo"]))
+                except OSError:
+                    pass
+    def cadena(self, archivo):
+        """Archivos a aplicar para restaurar 'archivo': su instantánea base y los deltas hasta él"""
+        objetivo = leer_cabecera(os.path.join(self.carpeta, archivo))
+        return [
+            r["archivo"] for r in self.listar()
+            if r["base"] == objetivo["base"] and r["archivo"] <= archivo
+        ]
+    def restaurar(self, archivo):
+        """Restaura en una sola transacción leyendo los respaldos por marcos; devuelve los datos extra"""
+        cadena = self.cadena(archivo)
+        if not cadena or not cadena[0].endswith(f"_instantanea{EXTENSION}"):
+            raise ValueError(f"No se encontró la instantánea base de {archivo}")
+        extras = {}
+        with self.almacen.lote():
+            self.almacen.eliminar_todos()
+            for nombre in cadena:
+                for tipo, objeto in leer_respaldo(os.path.join(self.carpeta, nombre)):
+                    if tipo == "P":
+                        self.almacen.guardar_muchos(objeto)
+                    elif tipo == "B":
+                        self.almacen.eliminar_muchos(objeto)
+                    elif tipo == "E":
+                        extras = objeto
+        logger.info(f"Respaldo restaurado: {archivo} ({len(cadena)} archivos)")
+        return extras
+    # --- Respaldos programados ---
+    def iniciar_programado(self, intervalo_seg):
+        """Respalda cada 'intervalo_seg' segundos en un hilo de fondo"""
+        if self._hilo and self._hilo.is_alive():
+            return self._hilo
+        def bucle():
+            while not self._detener.wait(intervalo_seg):
+                try:
+                    self.respaldar()
+                except Exception as e:
+                    logger.error(f"Error en respaldo programado: {e}")
+        self._detener.clear()
+        self._hilo = threading.Thread(target=bucle, name="respaldos", daemon=True)
+        self._hilo.start()
+        return self._hilo
+    def detener(self):
+        self._detener.set()
+def extras_persistidos(historial, ruta_premios="premios.json"):
+    """Datos extra que acompañan a cada respaldo: premios y sorteos realizados"""
+    extras = {"historial_sorteos": list(historial.iterar())}
+    if os.path.exists(ruta_premios):
+        with open(ruta_premios, "r", encoding="utf-8") as f:
+            extras["premios"] = json.load(f)
+    return extras
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Respaldos de la rifa (instantáneas + deltas)")
+    parser.add_argument("accion", choices=["crear", "listar", "verificar", "restaurar", "programado"])
+    parser.add_argument("archivo", nargs="?", help="Respaldo a verificar o restaurar")
+    parser.add_argument("--instantanea", action="store_true", help="Forzar una instantánea completa")
+    parser.add_argument("--rifa", help="Id de la rifa (ver RIFAS_ARCHIVO); por defecto la primera")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    config = configuracion_desde_argumentos(cargar_configuracion(), args.rifa)
+    historial = HistorialSorteos(config["RUTA_BD"])
+    gestor = GestorRespaldos(
+        config["CARPETA_BACKUPS"], AlmacenParticipantes(config["RUTA_BD"]),
+        extras=lambda: extras_persistidos(historial, config["RUTA_PREMIOS"]),
+        max_deltas=config["BACKUP_MAX_DELTAS"], max_instantaneas=config["BACKUP_MAX_INSTANTANEAS"]
+    )
+    if args.accion == "crear":
+        print(json.dumps(gestor.respaldar(forzar_instantanea=args.instantanea), indent=2, ensure_ascii=False))
+    elif args.accion == "listar":
+        for r in gestor.listar():
+            print(f"{r['archivo']}  {r['tipo']:<11}  rev {r['rev_desde']}-{r['rev']}  {r['bytes']} bytes")
+    elif args.accion == "verificar":
+        marcos = sum(1 for _ in leer_respaldo(os.path.join(gestor.carpeta, args.archivo)))
+        print(f"OK: {marcos} marcos verificados")
+    elif args.accion == "restaurar":
+        extras = gestor.restaurar(args.archivo)
+        historial.reemplazar(extras.get("historial_sorteos", []))
+        if "premios" in extras:
+            escribir_atomico(config["RUTA_PREMIOS"], json.dumps(extras["premios"], indent=4, ensure_ascii=False))
+    else:
+        gestor.iniciar_programado(config["BACKUP_INTERVALO_MIN"] * 60)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            gestor.detener()
@@ -0,0 +1,251 @@
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from html.parser import HTMLParser
+from rifa.metricas import medido
+from rifa.pagos import crear_sesion
+from rifa.sorteo import hora_argentina, momento_sorteo
+logger = logging.getLogger(__name__)
+# ----------------------------
+# RESULTADOS OFICIALES DE LA LOTERÍA (FUENTES CONCURRENTES + CACHÉ PERSISTENTE)
+# ----------------------------
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS resultados (
+    fecha TEXT PRIMARY KEY,
+    numero TEXT NOT NULL,
+    fuente TEXT NOT NULL,
+    obtenido TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS validadores_http (
+    url TEXT PRIMARY KEY,
+    etag TEXT NOT NULL DEFAULT '',
+    ultima_modificacion TEXT NOT NULL DEFAULT '',
+    numero TEXT NOT NULL DEFAULT '',
+    fecha TEXT NOT NULL DEFAULT ''
+);
+"""
+MESES = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6, "julio": 7,
+    "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
+}
+class _Encontrado(Exception):
+    pass
+class _BuscadorElemento(HTMLParser):
+    """Junta el texto del primer <etiqueta class="clase"> y corta el análisis ahí mismo"""
+    def __init__(self, etiqueta, clase):
+        super().__init__()
+        self.etiqueta = etiqueta
+        self.clase = clase
+        self.profundidad = 0
+        self.texto = []
+    def handle_starttag(self, tag, attrs):
+        if self.profundidad:
+            self.profundidad += tag == self.etiqueta
+        elif tag == self.etiqueta and self.clase in (dict(attrs).get("class") or "").split():
+            self.profundidad = 1
+    def handle_endtag(self, tag):
+        if self.profundidad and tag == self.etiqueta:
+            self.profundidad -= 1
+            if not self.profundidad:
+                raise _Encontrado()
+    def handle_data(self, data):
+        if self.profundidad:
+            self.texto.append(data)
+def _texto_elemento(html, etiqueta, clase):
+    buscador = _BuscadorElemento(etiqueta, clase)
+    try:
+        buscador.feed(html)
+        buscador.close()
+    except _Encontrado:
+        pass
+    return "".join(buscador.texto)
+def extraer_numero(html, etiqueta="span", clase="numero"):
+    """Número de 5 cifras dentro del primer elemento <etiqueta class="clase">, o None"""
+    numero = re.sub(r"\D", "", _texto_elemento(html, etiqueta, clase))
+    return numero if len(numero) == 5 else None
+def interpretar_fecha(texto):
+    """Fecha ISO (YYYY-MM-DD) de textos como "18/10/2026", "2026-10-18" o "domingo 18 de octubre de 2026", o None"""
+    texto = texto.lower()
+    try:
+        if m := re.search(r"(\d{4})-(\d{1,2})-(\d{1,2})", texto):
+            anio, mes, dia = map(int, m.groups())
+        elif m := re.search(r"(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})", texto):
+            dia, mes, anio = map(int, m.groups())
+        elif (m := re.search(r"(\d{1,2})\s+de\s+([a-z]+)\s+(?:de\s+|del\s+)?(\d{4})", texto)) and m.group(2) in MESES:
+            dia, mes, anio = int(m.group(1)), MESES[m.group(2)], int(m.group(3))
+        else:
+            return None
+        return datetime(anio, mes, dia).date().isoformat()
+    except ValueError:
+        return None
+def extraer_fecha(html, etiqueta="span", clase="fecha"):
+    """Fecha del sorteo publicada en el primer elemento <etiqueta class="clase">, o None"""
+    return interpretar_fecha(_texto_elemento(html, etiqueta, clase))
+class FuenteHTML:
+    """Página pública que muestra el número ganador (y, si se indica clase_fecha, la fecha del sorteo)"""
+    def __init__(self, nombre, url, etiqueta="span", clase="numero", etiqueta_fecha="span", clase_fecha=None):
+        self.nombre = nombre
+        self.url = url
+        self.etiqueta = etiqueta
+        self.clase = clase
+        self.etiqueta_fecha = etiqueta_fecha
+        self.clase_fecha = clase_fecha
+    @property
+    def fechada(self):
+        return bool(self.clase_fecha)
+    def extraer(self, html):
+        """(numero, fecha) de la página; la fecha es None si la fuente no la publica o no se pudo leer"""
+        numero = extraer_numero(html, self.etiqueta, self.clase)
+        fecha = extraer_fecha(html, self.etiqueta_fecha, self.clase_fecha) if self.fechada and numero else None
+        return numero, fecha
+FUENTES_POR_DEFECTO = [
+    FuenteHTML("resultadosloterias", "https://www.resultadosloterias.com.ar/cordoba/nocturna/"),
+]
+def fuentes_desde_config(valor):
+    """Fuentes en JSON: [{"nombre", "url", "etiqueta", "clase", "etiqueta_fecha", "clase_fecha"}]; vacío = por defecto"""
+    if not valor:
+        return list(FUENTES_POR_DEFECTO)
+    return [FuenteHTML(**fuente) for fuente in json.loads(valor)]
+class ProveedorResultados:
+    """Obtiene el número de la Nocturna por fecha; los resultados definitivos se guardan para siempre"""
+    def __init__(self, ruta_bd, fuentes=None, sesion=None, timeout=10):
+        self.ruta_bd = ruta_bd
+        self.fuentes = fuentes or list(FUENTES_POR_DEFECTO)
+        self.sesion = sesion or crear_sesion(reintentos=2, tamano_pool=max(len(self.fuentes), 4))
+        self.timeout = timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(ruta_bd)), exist_ok=True)
+        conn = self._conexion()
+        conn.executescript(ESQUEMA)
+    def _conexion(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.ruta_bd, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+    def resultado_guardado(self, fecha):
+        fila = self._conexion().execute("SELECT * FROM resultados WHERE fecha = ?", (fecha,)).fetchone()
+        return dict(fila) if fila else None
+    def guardar_manual(self, fecha, numero):
+        """Registra (o corrige) el número oficial de 'fecha' indicado por el administrador; devuelve el número"""
+        numero = re.sub(r"\D", "", str(numero))
+        if len(numero) != 5:
+            raise ValueError("El número oficial debe tener 5 cifras")
+        fecha = datetime.fromisoformat(fecha).date().isoformat()
+        anterior = self.resultado_guardado(fecha)
+        if anterior and anterior["numero"] != numero:
+            logger.warning(f"Resultado del {fecha} corregido a mano: {anterior['numero']} -> {numero}")
+        self._conexion().execute(
+            "INSERT OR REPLACE INTO resultados (fecha, numero, fuente, obtenido) VALUES (?, ?, 'manual', ?)",
+            (fecha, numero, datetime.now().isoformat()),
+        )
+        return numero
+    def obtener(self, fecha=None, ahora=None):
+        """Número ganador del sorteo de 'fecha' (hoy por defecto), o None si aún no está publicado o no se puede confirmar"""
+        ahora = ahora or hora_argentina()
+        hoy = ahora.date().isoformat()
+        fecha = fecha or hoy
+        guardado = self.resultado_guardado(fecha)
+        if guardado:
+            return guardado["numero"]
+        if ahora < momento_sorteo(fecha):
+            return None
+        # Las páginas muestran solo el último sorteo: para otra fecha hace falta una fuente que publique la suya
+        if fecha != hoy and not any(fuente.fechada for fuente in self.fuentes):
+            logger.warning(f"Ninguna fuente publica la fecha del sorteo; el resultado del {fecha} debe indicarse a mano")
+            return None
+        numero, fuente = self.consultar_fuentes(lambda numero, publicada: self._confirma(fecha, hoy, numero, publicada))
+        if not numero:
+            return None
+        self._conexion().execute(
+            "INSERT OR IGNORE INTO resultados (fecha, numero, fuente, obtenido) VALUES (?, ?, ?, ?)",
+            (fecha, numero, fuente, datetime.now().isoformat()),
+        )
+        return self.resultado_guardado(fecha)["numero"]
+    def _confirma(self, fecha, hoy, numero, publicada):
+        """Indica si el número leído corresponde al sorteo de 'fecha'"""
+        if publicada:
+            if publicada != fecha:
+                logger.info(f"La fuente muestra el sorteo del {publicada} ({numero}), no el del {fecha}")
+            return publicada == fecha
+        if fecha != hoy:
+            return False
+        # Sin fecha publicada se acepta si difiere del resultado de ayer. Si falta el de ayer pero hay otros
+        # anteriores, no se puede descartar que la página muestre el número de ayer (se indica a mano); sin
+        # ningún resultado guardado (primer sorteo) se acepta para iniciar la cadena
+        anterior = self.resultado_guardado((datetime.fromisoformat(fecha) - timedelta(days=1)).date().isoformat())
+        if not anterior:
+            if self._conexion().execute("SELECT 1 FROM resultados WHERE fecha < ? LIMIT 1", (fecha,)).fetchone():
+                logger.warning(
+                    f"Fuente sin fecha y sin el resultado de ayer: no se confirma {numero} para el {fecha} "
+                    f"(indícalo a mano)"
+                )
+                return False
+            logger.warning(f"Primer resultado sin fecha publicada: se acepta {numero} para el {fecha}")
+            return True
+        if anterior["numero"] == numero:
+            logger.info(f"Las fuentes todavía muestran el resultado anterior ({numero})")
+            return False
+        return True
+    def consultar_fuentes(self, confirma=None):
+        """Consulta todas las fuentes en paralelo; devuelve (numero, fuente) de la primera que responda y confirme"""
+        with ThreadPoolExecutor(max_workers=len(self.fuentes), thread_name_prefix="resultados") as ejecutor:
+            futuros = {ejecutor.submit(self.consultar, fuente): fuente for fuente in self.fuentes}
+            for futuro in as_completed(futuros):
+                try:
+                    numero, publicada = futuro.result()
+                except Exception as e:
+                    logger.warning(f"Fuente {futuros[futuro].nombre} sin respuesta: {e}")
+                    continue
+                if numero and (confirma is None or confirma(numero, publicada)):
+                    return numero, futuros[futuro].nombre
+        return None, None
+    @medido("resultados_consulta")
+    def consultar(self, fuente):
+        """GET condicional; devuelve (numero, fecha publicada) y, si la página no cambió (304), reutiliza los ya extraídos"""
+        conn = self._conexion()
+        validador = conn.execute("SELECT * FROM validadores_http WHERE url = ?", (fuente.url,)).fetchone()
+        headers = {"User-Agent": USER_AGENT}
+        if validador and validador["numero"]:
+            if validador["etag"]:
+                headers["If-None-Match"] = validador["etag"]
+            if validador["ultima_modificacion"]:
+                headers["If-Modified-Since"] = validador["ultima_modificacion"]
+        response = self.sesion.get(fuente.url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and validador:
+            return validador["numero"], validador["fecha"] or None
+        response.raise_for_status()
+        numero, publicada = fuente.extraer(response.text)
+        conn.execute(
+            "INSERT OR REPLACE INTO validadores_http (url, etag, ultima_modificacion, numero, fecha) VALUES (?, ?, ?, ?, ?)",
+            (fuente.url, response.headers.get("ETag", ""), response.headers.get("Last-Modified", ""),
+             numero or "", publicada or ""),
+        )
+        return numero, publicada
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extrae el número de la Nocturna de una página guardada o en línea")
+    parser.add_argument("archivo", nargs="?", help="HTML guardado (sin archivo se consultan las fuentes)")
+    parser.add_argument("--etiqueta", default="span")
+    parser.add_argument("--clase", default="numero")
+    parser.add_argument("--etiqueta-fecha", default="span")
+    parser.add_argument("--clase-fecha", help="Clase del elemento con la fecha del sorteo")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.archivo:
+        with open(args.archivo, "r", encoding="utf-8") as f:
+            fuente = FuenteHTML(args.archivo, "", args.etiqueta, args.clase, args.etiqueta_fecha, args.clase_fecha)
+            print(fuente.extraer(f.read()))
+    else:
+        from rifa.config import cargar_configuracion
+        config = cargar_configuracion()
+        proveedor = ProveedorResultados(config["RUTA_BD"], fuentes_desde_config(config["RESULTADOS_FUENTES"]))
+        print(proveedor.consultar_fuentes())
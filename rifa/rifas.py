@@ -0,0 +1,149 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from rifa.almacen import AlmacenParticipantes
+from rifa.cache import CacheParticipantes
+from rifa.cola import ColaTrabajos
+from rifa.config import cargar_definiciones, configuracion_rifa
+from rifa.historial import HistorialSorteos
+from rifa.pagos import ClienteMercadoPago
+from rifa.respaldos import GestorRespaldos, extras_persistidos
+logger = logging.getLogger(__name__)
+# ----------------------------
+# REGISTRO DE RIFAS (VARIAS RIFAS EN UN MISMO PROCESO)
+# ----------------------------
+class RifaCerrada(RuntimeError):
+    """El contexto fue liberado (p. ej. desalojado del registro); hay que pedir uno nuevo al registro"""
+class ContextoRifa:
+    """Recursos de una rifa (almacén, caché, historial, respaldos...) creados a demanda"""
+    def __init__(self, rifa_id, config):
+        self.id = rifa_id
+        self.config = config
+        self.ultimo_uso = time.monotonic()
+        self._recursos = {}
+        self._cerrado = False
+        self._lock = threading.RLock()
+    @property
+    def cerrado(self):
+        return self._cerrado
+    def _recurso(self, nombre, crear):
+        with self._lock:
+            # Un contexto cerrado no vuelve a crear recursos: quedarían (hilos de respaldo incluidos) sin dueño
+            if self._cerrado:
+                raise RifaCerrada(f"La rifa '{self.id}' fue liberada; pide un contexto nuevo al registro")
+            if nombre not in self._recursos:
+                self._recursos[nombre] = crear()
+            return self._recursos[nombre]
+    def almacen(self):
+        # participantes/ es el formato anterior a SQLite y solo existe para la rifa única
+        legado = "participantes" if not self.config["RIFA_ID"] else None
+        return self._recurso("almacen", lambda: AlmacenParticipantes(self.config["RUTA_BD"], carpeta_legado=legado))
+    def cache(self):
+        return self._recurso("cache", lambda: CacheParticipantes(self.almacen()))
+    def historial(self):
+        legado = "historial_sorteos.json" if not self.config["RIFA_ID"] else None
+        return self._recurso("historial", lambda: HistorialSorteos(self.config["RUTA_BD"], archivo_legado=legado))
+    def cola(self):
+        return self._recurso("cola", lambda: ColaTrabajos(
+            self.config["RUTA_COLA"], max_intentos=self.config["COLA_MAX_INTENTOS"], espacio=self.config["COLA_ESPACIO"]
+        ))
+    def cliente_mp(self):
+        return self._recurso("cliente_mp", lambda: ClienteMercadoPago(
+            self.config["MP_ACCESS_TOKEN"], self.config["RIFA_NOMBRE"], self.config["MONTO_RIFA"],
+            webhook_url=self.config["WEBHOOK_URL"],
+            enlace_fallback=self.config["ENLACE_PAGO_FALLBACK"],
+            api_url=self.config["MP_API_URL"],
+            max_concurrencia=self.config["MP_CONCURRENCIA"],
+            rifa_id=self.config["RIFA_ID"]
+        ))
+    def respaldos(self):
+        """Gestor de respaldos de la rifa; inicia los respaldos programados mientras la rifa está activa"""
+        def crear():
+            gestor = GestorRespaldos(
+                self.config["CARPETA_BACKUPS"], self.almacen(),
+                extras=lambda: extras_persistidos(self.historial(), self.config["RUTA_PREMIOS"]),
+                max_deltas=self.config["BACKUP_MAX_DELTAS"], max_instantaneas=self.config["BACKUP_MAX_INSTANTANEAS"]
+            )
+            if self.config["BACKUP_INTERVALO_MIN"] > 0:
+                gestor.iniciar_programado(self.config["BACKUP_INTERVALO_MIN"] * 60)
+            return gestor
+        return self._recurso("respaldos", crear)
+    def cerrar(self):
+        """Detiene los procesos de fondo y suelta los recursos (la memoria de la caché incluida)"""
+        with self._lock:
+            self._cerrado = True
+            gestor = self._recursos.get("respaldos")
+            if gestor:
+                gestor.detener()
+            self._recursos.clear()
+class RegistroRifas:
+    """Rifas servidas por el proceso; solo las usadas recientemente conservan sus datos en memoria (LRU)"""
+    def __init__(self, config, max_activas=8, inactividad_seg=1800):
+        self.config = config
+        self.max_activas = max(max_activas, 1)
+        self.inactividad_seg = inactividad_seg
+        self._activas = OrderedDict()
+        self._lock = threading.Lock()
+        self._firma = None
+        self._definiciones = OrderedDict()
+        self._recargar_definiciones()
+    def _recargar_definiciones(self):
+        """Relee el archivo de rifas si cambió (permite sumar rifas sin reiniciar el proceso)"""
+        ruta = self.config["RIFAS_ARCHIVO"]
+        try:
+            firma = os.stat(ruta).st_mtime_ns
+        except OSError:
+            firma = None
+        if firma != self._firma or not self._definiciones:
+            anteriores, self._definiciones = self._definiciones, cargar_definiciones(self.config)
+            self._firma = firma
+            # Una rifa quitada o modificada se vuelve a armar con su nueva configuración
+            for rifa_id in [r for r in self._activas if self._definiciones.get(r) != anteriores.get(r)]:
+                self._activas.pop(rifa_id).cerrar()
+    @property
+    def por_defecto(self):
+        return next(iter(self._definiciones))
+    def ids(self):
+        with self._lock:
+            self._recargar_definiciones()
+            return list(self._definiciones)
+    def existe(self, rifa_id):
+        return rifa_id in self.ids()
+    def configuracion(self, rifa_id):
+        """Configuración de una rifa sin cargar sus datos (para los procesos de fondo)"""
+        with self._lock:
+            self._recargar_definiciones()
+            return configuracion_rifa(self.config, rifa_id, self._definiciones[rifa_id])
+    def obtener(self, rifa_id=None):
+        """Contexto de la rifa (KeyError si no existe); se crea a demanda y desaloja a la menos usada"""
+        desalojados = []
+        with self._lock:
+            self._recargar_definiciones()
+            rifa_id = rifa_id or self.por_defecto
+            if rifa_id not in self._definiciones:
+                raise KeyError(rifa_id)
+            ahora = time.monotonic()
+            for otro, contexto in list(self._activas.items()):
+                if otro != rifa_id and ahora - contexto.ultimo_uso > self.inactividad_seg:
+                    desalojados.append(self._activas.pop(otro))
+            contexto = self._activas.pop(rifa_id, None)
+            if contexto is None or contexto.cerrado:
+                contexto = ContextoRifa(rifa_id, configuracion_rifa(self.config, rifa_id, self._definiciones[rifa_id]))
+                logger.info(f"Rifa '{rifa_id}' activada")
+            contexto.ultimo_uso = ahora
+            self._activas[rifa_id] = contexto
+            while len(self._activas) > self.max_activas:
+                desalojados.append(self._activas.popitem(last=False)[1])
+        for desalojado in desalojados:
+            desalojado.cerrar()
+            logger.info(f"Rifa '{desalojado.id}' liberada de memoria")
+        return contexto
+    def activas(self):
+        """Rifas con datos en memoria y segundos desde su último uso (la menos reciente primero)"""
+        ahora = time.monotonic()
+        with self._lock:
+            return [(rifa_id, round(ahora - c.ultimo_uso)) for rifa_id, c in self._activas.items()]
+def crear_registro(config):
+    return RegistroRifas(config, config["RIFAS_ACTIVAS_MAX"], config["RIFAS_INACTIVIDAD_MIN"] * 60)
@@ -0,0 +1,112 @@
+import logging
+from datetime import datetime, timedelta
+from rifa.boletos import indice_boleto
+logger = logging.getLogger(__name__)
+# ----------------------------
+# MOTOR DE SORTEO (ÍNDICE DE BOLETOS PAGOS + REGLAS POR TERMINACIÓN)
+# ----------------------------
+PREMIO_POR_DEFECTO = "Premio de la Lotería Nocturna"
+HORA_SORTEO = (21, 30)
+MENSAJE_EMAIL_POR_DEFECTO = "¡Hola {nombre}!\n¡Felicidades! Has ganado el premio: **{premio}** en nuestra rifa.\nDetalles:\n- Boleto: {boleto}\n- Premio: {premio}\nPronto nos pondremos en contacto para coordinar la entrega.\n¡Gracias por participar!"
+MENSAJE_WHATSAPP_POR_DEFECTO = "🎉 ¡Felicidades, {nombre}! Ganaste: *{premio}* en la rifa. Boleto: {boleto}. Pronto te contactaremos."
+# Cifras finales que pueden premiarse; cada premio elige la suya y, si no la indica, es el número exacto.
+# Un premio se guarda como texto (número exacto) o como {"nombre": ..., "digitos": 4}.
+DIGITOS_POR_PUESTO = (5, 4, 3, 2)
+def hora_argentina():
+    return datetime.utcnow() - timedelta(hours=3)
+def momento_sorteo(fecha):
+    """Fecha y hora (Argentina) del sorteo del día 'fecha' (YYYY-MM-DD)"""
+    return datetime.fromisoformat(fecha).replace(hour=HORA_SORTEO[0], minute=HORA_SORTEO[1])
+def proximo_sorteo(ahora=None):
+    """Fecha y hora (Argentina) del próximo sorteo"""
+    ahora = ahora or hora_argentina()
+    sorteo = momento_sorteo(ahora.date().isoformat())
+    return sorteo if sorteo > ahora else sorteo + timedelta(days=1)
+def nombre_premio(premio):
+    return premio.get("nombre", "") if isinstance(premio, dict) else premio
+def digitos_premio(premio):
+    """Cifras finales que deben coincidir para ganar el premio (5 = número exacto, el valor por defecto)"""
+    if not isinstance(premio, dict):
+        return 5
+    digitos = premio.get("digitos", 5)
+    if digitos not in DIGITOS_POR_PUESTO:
+        logger.warning(f"Premio '{nombre_premio(premio)}' con {digitos!r} cifras: se usa el número exacto")
+        return 5
+    return digitos
+def descripcion_regla(digitos):
+    return "exacto" if digitos == 5 else f"últimas {digitos} cifras"
+def crear_premio(nombre, digitos=5):
+    """Premio en el formato guardado: texto si es el número exacto, dict si premia menos cifras"""
+    return nombre if digitos == 5 else {"nombre": nombre, "digitos": digitos}
+def reglas_desde_premios(premios):
+    """Una regla por premio (en orden), con las cifras finales que el propio premio indica"""
+    premios = list(premios) or [PREMIO_POR_DEFECTO]
+    return [
+        {
+            "puesto": puesto,
+            "premio": nombre_premio(premio),
+            "digitos": digitos_premio(premio),
+            "regla": descripcion_regla(digitos_premio(premio))
+        }
+        for puesto, premio in enumerate(premios, start=1)
+    ]
+class IndiceSorteo:
+    """Boletos pagos agrupados por terminación para resolver cada regla con una búsqueda"""
+    def __init__(self, participantes, digitos=DIGITOS_POR_PUESTO):
+        self._por_terminacion = {n: {} for n in digitos}
+        self.total_pagados = 0
+        for p in participantes:
+            boleto = p.get("boleto")
+            if p.get("estado_pago") != "pagado" or indice_boleto(boleto) is None:
+                continue
+            self.total_pagados += 1
+            for n, grupo in self._por_terminacion.items():
+                grupo.setdefault(boleto[-n:], []).append(p)
+    def evaluar(self, numero_oficial, reglas):
+        """Pares (regla, participante) ganadores; cada boleto se lleva solo el mejor premio que le toque"""
+        numero = str(numero_oficial).zfill(5)[-5:]
+        ganadores = []
+        premiados = set()
+        for regla in reglas:
+            grupo = self._por_terminacion.get(regla["digitos"])
+            if grupo is None:
+                raise ValueError(f"El índice no admite reglas de {regla['digitos']} cifras")
+            # Las terminaciones más largas están contenidas en las más cortas: basta filtrar lo ya premiado
+            candidatos = grupo.get(numero[-regla["digitos"]:], ())
+            ganadores.extend((regla, p) for p in candidatos if p["boleto"] not in premiados)
+            premiados.update(p["boleto"] for p in candidatos)
+        return ganadores
+def detallar_ganadores(pares):
+    """Convierte los pares (regla, participante) en registros de ganador para el historial"""
+    return [
+        {**p, "premio": regla["premio"], "puesto": regla["puesto"], "regla": regla["regla"]}
+        for regla, p in pares
+    ]
+def registro_sorteo(fecha, numero_oficial, reglas, ganadores):
+    """Entrada del historial de sorteos"""
+    return {
+        "fecha": fecha,
+        "numero_oficial": numero_oficial,
+        "premio": reglas[0]["premio"] if reglas else PREMIO_POR_DEFECTO,
+        "reglas": reglas,
+        "ganadores": ganadores
+    }
+def trabajos_notificacion_ganadores(ganadores, fecha, plantilla_email, plantilla_whatsapp, premio=PREMIO_POR_DEFECTO):
+    """Trabajos (clave, canal, payload) para avisar a los ganadores; la clave evita duplicados por sorteo"""
+    trabajos = []
+    for g in ganadores:
+        variables = {"nombre": g['nombre'], "premio": g.get('premio', premio), "boleto": g['boleto']}
+        if g.get('email'):
+            trabajos.append((f"ganador:{fecha}:{g['boleto']}:email", "email", {
+                "destino": g['email'],
+                "asunto": "🎉 ¡Felicidades! Ganaste en la rifa",
+                "cuerpo": plantilla_email.format(**variables),
+                "etiqueta": g['nombre']
+            }))
+        if g.get('telefono'):
+            trabajos.append((f"ganador:{fecha}:{g['boleto']}:whatsapp", "whatsapp", {
+                "destino": g['telefono'],
+                "cuerpo": plantilla_whatsapp.format(**variables),
+                "etiqueta": g['nombre']
+            }))
+    return trabajos
@@ -0,0 +1,115 @@
+import argparse
+import itertools
+import json
+import logging
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+logger = logging.getLogger(__name__)
+# ----------------------------
+# SERVIDOR LOCAL QUE IMITA LA API DE MERCADO PAGO (PARA PRUEBAS)
+# ----------------------------
+# Rutas soportadas:
+#   POST /checkout/preferences      -> 201 {"id", "init_point"}
+#   GET  /v1/payments/<id>          -> 200 pago | 404
+#   GET  /v1/payments/search        -> 200 {"paging", "results"} (offset/limit, begin_date/end_date)
+#   POST /_stub/pagos               -> registra un pago de prueba (JSON del pago)
+class EstadoStub:
+    """Datos en memoria del servidor de prueba"""
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.preferencias = {}
+        self.pagos = {}
+        self.solicitudes = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+    def nueva_preferencia(self, payload):
+        with self._lock:
+            pref_id = f"stub-{next(self._ids)}"
+            self.preferencias[pref_id] = payload
+        return {"id": pref_id, "init_point": f"https://stub.mercadopago.local/checkout/{pref_id}"}
+    def agregar_pago(self, pago):
+        with self._lock:
+            pago.setdefault("id", next(self._ids))
+            pago.setdefault("status", "approved")
+            pago.setdefault("date_created", "")
+            self.pagos[str(pago["id"])] = pago
+        return pago
+    def buscar_pagos(self, desde="", hasta="", offset=0, limit=30):
+        with self._lock:
+            pagos = sorted(self.pagos.values(), key=lambda p: (p.get("date_created", ""), str(p["id"])))
+        if desde:
+            pagos = [p for p in pagos if p.get("date_created", "") >= desde]
+        if hasta:
+            pagos = [p for p in pagos if p.get("date_created", "") <= hasta]
+        return {
+            "paging": {"total": len(pagos), "offset": offset, "limit": limit},
+            "results": pagos[offset:offset + limit]
+        }
+def _crear_manejador(estado):
+    class Manejador(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        def log_message(self, formato, *args):
+            logger.debug(formato % args)
+        def _responder(self, codigo, cuerpo):
+            datos = json.dumps(cuerpo).encode("utf-8")
+            self.send_response(codigo)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+        def _leer_json(self):
+            largo = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(largo) or b"{}")
+        def _esperar(self):
+            estado.solicitudes += 1
+            if estado.latencia:
+                time.sleep(estado.latencia)
+        def do_POST(self):
+            self._esperar()
+            ruta = urlparse(self.path).path
+            if ruta == "/checkout/preferences":
+                self._responder(201, estado.nueva_preferencia(self._leer_json()))
+            elif ruta == "/_stub/pagos":
+                self._responder(201, estado.agregar_pago(self._leer_json()))
+            else:
+                self._responder(404, {"message": "not_found"})
+        def do_GET(self):
+            self._esperar()
+            url = urlparse(self.path)
+            if url.path == "/v1/payments/search":
+                q = {k: v[0] for k, v in parse_qs(url.query).items()}
+                self._responder(200, estado.buscar_pagos(
+                    q.get("begin_date", ""), q.get("end_date", ""),
+                    int(q.get("offset", 0)), int(q.get("limit", 30))
+                ))
+                return
+            coincidencia = re.fullmatch(r"/v1/payments/([^/]+)", url.path)
+            pago = estado.pagos.get(coincidencia.group(1)) if coincidencia else None
+            if pago:
+                self._responder(200, pago)
+            else:
+                self._responder(404, {"message": "not_found"})
+    return Manejador
+def iniciar_servidor(host="127.0.0.1", puerto=0, latencia=0.0):
+    """Inicia el servidor de prueba en un hilo; devuelve (servidor, estado, url_base)"""
+    estado = EstadoStub(latencia=latencia)
+    servidor = ThreadingHTTPServer((host, puerto), _crear_manejador(estado))
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, estado, f"http://{host}:{servidor.server_address[1]}"
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API de Mercado Pago simulada para pruebas locales")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--latencia", type=float, default=0.0, help="Segundos de espera por solicitud")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    servidor, _, url = iniciar_servidor(args.host, args.puerto, args.latencia)
+    logger.info(f"Stub de Mercado Pago escuchando en {url} (usar MP_API_URL={url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.shutdown()
@@ -0,0 +1,212 @@
+import argparse
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from rifa.almacen import AlmacenParticipantes
+from rifa.config import cargar_configuracion, configuracion_desde_argumentos
+from rifa.pagos import ClienteMercadoPago, cambios_pago_aprobado
+logger = logging.getLogger(__name__)
+# ----------------------------
+# RECEPTOR DE WEBHOOKS DE MERCADO PAGO (PROCESO SEPARADO DE STREAMLIT)
+# ----------------------------
+# Rutas:
+#   POST /webhook   -> 200 inmediato; el pago se consulta y aplica desde la cola (401 si la firma no es válida)
+#   GET  /salud     -> 200 {"pendientes", "recibidos", "duplicados", "procesados", "aprobados", "errores", "rechazados"}
+def id_pago_notificacion(cuerpo, parametros):
+    """Extrae el id de pago de una notificación (formato webhook o IPN); None si no es de pagos"""
+    tipo = cuerpo.get("type") or cuerpo.get("topic") or parametros.get("type") or parametros.get("topic")
+    if tipo != "payment":
+        return None
+    payment_id = (cuerpo.get("data") or {}).get("id") or parametros.get("data.id") or parametros.get("id")
+    return str(payment_id) if payment_id else None
+def firma_valida(secreto, firma, id_solicitud, id_dato):
+    """Verifica la cabecera x-signature de MP ("ts=...,v1=...": HMAC-SHA256 del manifiesto con la clave secreta)"""
+    partes = dict(p.strip().split("=", 1) for p in (firma or "").split(",") if "=" in p)
+    ts, v1 = partes.get("ts"), partes.get("v1")
+    if not ts or not v1:
+        return False
+    manifiesto = ""
+    if id_dato:
+        manifiesto += f"id:{str(id_dato).lower()};"
+    if id_solicitud:
+        manifiesto += f"request-id:{id_solicitud};"
+    manifiesto += f"ts:{ts};"
+    esperada = hmac.new(secreto.encode("utf-8"), manifiesto.encode("utf-8"), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(esperada, v1.lower())
+class ProcesadorPagos:
+    """Cola de pagos a consultar, atendida por hilos de fondo; un payment_id aparece a lo sumo una vez en la cola"""
+    def __init__(self, almacen, cliente_mp, hilos=4, reintentos=3, espera_reintento=2.0):
+        self.almacen = almacen
+        self.cliente_mp = cliente_mp
+        self.reintentos = reintentos
+        self.espera_reintento = espera_reintento
+        self._cola = queue.Queue()
+        # payment_id -> "en_cola" | "procesando" | "repetir"; se olvida al terminar de procesarlo, porque
+        # MP notifica cada cambio de estado (p. ej. pendiente y luego aprobado) con el mismo id
+        self._en_curso = {}
+        self._lock = threading.Lock()
+        self.contadores = {
+            "recibidos": 0, "duplicados": 0, "procesados": 0, "aprobados": 0, "errores": 0, "rechazados": 0
+        }
+        self._hilos = [
+            threading.Thread(target=self._atender, name=f"webhook-{i}", daemon=True) for i in range(hilos)
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+    def encolar(self, payment_id):
+        """Encola un pago; devuelve False si ya estaba esperando en la cola"""
+        with self._lock:
+            self.contadores["recibidos"] += 1
+            estado = self._en_curso.get(payment_id)
+            if estado in ("en_cola", "repetir"):
+                self.contadores["duplicados"] += 1
+                return False
+            if estado == "procesando":
+                # La consulta en curso pudo leer el estado anterior: se repite al terminar
+                self._en_curso[payment_id] = "repetir"
+                return True
+            self._en_curso[payment_id] = "en_cola"
+        self._cola.put(payment_id)
+        return True
+    def rechazar(self):
+        """Cuenta una notificación descartada por firma inválida"""
+        with self._lock:
+            self.contadores["rechazados"] += 1
+    def pendientes(self):
+        return self._cola.qsize()
+    def esperar(self):
+        """Bloquea hasta que la cola quede vacía"""
+        self._cola.join()
+    def _atender(self):
+        while True:
+            payment_id = self._cola.get()
+            with self._lock:
+                self._en_curso[payment_id] = "procesando"
+            try:
+                self.procesar(payment_id)
+            except Exception as e:
+                logger.error(f"Error procesando pago {payment_id}: {e}")
+                with self._lock:
+                    self.contadores["errores"] += 1
+            finally:
+                with self._lock:
+                    if self._en_curso.pop(payment_id, None) == "repetir":
+                        self._en_curso[payment_id] = "en_cola"
+                        self._cola.put(payment_id)
+                self._cola.task_done()
+    def procesar(self, payment_id):
+        """Consulta el pago y, si está aprobado, marca pagado el boleto; devuelve el participante o None"""
+        pago = None
+        for intento in range(self.reintentos):
+            pago = self.cliente_mp.obtener_pago(payment_id)
+            if pago:
+                break
+            time.sleep(self.espera_reintento * 2 ** intento)
+        if not pago:
+            raise RuntimeError("no se pudo consultar el pago")
+        with self._lock:
+            self.contadores["procesados"] += 1
+        cambios = cambios_pago_aprobado(pago)
+        boleto = self.cliente_mp.boleto_de_pago(pago) if cambios else None
+        if not boleto:
+            return None
+        # Leer y actualizar en la misma transacción: el boleto queda bloqueado frente a la app
+        with self.almacen.lote():
+            actual = self.almacen.obtener(boleto)
+            if not actual:
+                logger.warning(f"Pago {payment_id} aprobado para boleto inexistente {boleto}")
+                return None
+            if actual.get("estado_pago") == "pagado" and actual.get("id_pago_mp") == cambios["id_pago_mp"]:
+                return actual
+            participante = self.almacen.actualizar(boleto, cambios)
+        with self._lock:
+            self.contadores["aprobados"] += 1
+        logger.info(f"Pago confirmado para boleto {boleto}")
+        return participante
+    def estado(self):
+        with self._lock:
+            return {"pendientes": self.pendientes(), **self.contadores}
+def _crear_manejador(procesador, secreto=""):
+    class Manejador(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        def log_message(self, formato, *args):
+            logger.debug(formato % args)
+        def _responder(self, codigo, cuerpo):
+            datos = json.dumps(cuerpo).encode("utf-8")
+            self.send_response(codigo)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path.rstrip("/") != "/webhook":
+                self._responder(404, {"message": "not_found"})
+                return
+            largo = int(self.headers.get("Content-Length") or 0)
+            try:
+                cuerpo = json.loads(self.rfile.read(largo) or b"{}")
+            except ValueError:
+                cuerpo = {}
+            parametros = {k: v[0] for k, v in parse_qs(url.query).items()}
+            cuerpo = cuerpo if isinstance(cuerpo, dict) else {}
+            if secreto:
+                id_dato = parametros.get("data.id") or (cuerpo.get("data") or {}).get("id")
+                if not firma_valida(secreto, self.headers.get("x-signature"), self.headers.get("x-request-id"), id_dato):
+                    logger.warning(f"Notificación con firma inválida descartada (data.id={id_dato})")
+                    procesador.rechazar()
+                    self._responder(401, {"message": "invalid_signature"})
+                    return
+            payment_id = id_pago_notificacion(cuerpo, parametros)
+            if payment_id:
+                procesador.encolar(payment_id)
+            # Se confirma siempre de inmediato: MP reintenta si no recibe 200/201 a tiempo
+            self._responder(200, {"status": "ok"})
+        def do_GET(self):
+            if urlparse(self.path).path == "/salud":
+                self._responder(200, procesador.estado())
+            else:
+                self._responder(404, {"message": "not_found"})
+    return Manejador
+def iniciar_servidor(procesador, host="127.0.0.1", puerto=0, secreto=""):
+    """Inicia el receptor en un hilo (con secreto, exige la firma de MP); devuelve (servidor, url_base)"""
+    servidor = ThreadingHTTPServer((host, puerto), _crear_manejador(procesador, secreto))
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://{host}:{servidor.server_address[1]}"
+def crear_procesador(config, hilos=4):
+    """Arma el procesador con el almacén y el cliente de Mercado Pago de la configuración"""
+    cliente_mp = ClienteMercadoPago(
+        config["MP_ACCESS_TOKEN"], config["RIFA_NOMBRE"], config["MONTO_RIFA"],
+        webhook_url=config["WEBHOOK_URL"],
+        enlace_fallback=config["ENLACE_PAGO_FALLBACK"],
+        api_url=config["MP_API_URL"],
+        max_concurrencia=hilos,
+        rifa_id=config["RIFA_ID"]
+    )
+    return ProcesadorPagos(AlmacenParticipantes(config["RUTA_BD"]), cliente_mp, hilos=hilos)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recibe las notificaciones de pago de Mercado Pago")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--puerto", type=int, default=8080)
+    parser.add_argument("--hilos", type=int, default=4, help="Hilos que consultan pagos a Mercado Pago")
+    parser.add_argument("--rifa", help="Id de la rifa (ver RIFAS_ARCHIVO); por defecto la primera")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    config = configuracion_desde_argumentos(cargar_configuracion(), args.rifa)
+    servidor, url = iniciar_servidor(
+        crear_procesador(config, args.hilos), args.host, args.puerto, config["MP_WEBHOOK_SECRET"]
+    )
+    logger.info(f"Receptor de webhooks escuchando en {url}/webhook")
+    if not config["MP_WEBHOOK_SECRET"]:
+        logger.warning("MP_WEBHOOK_SECRET vacío: no se verifica la firma de las notificaciones")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.shutdown()
@@ -0,0 +1,66 @@
+import argparse
+import logging
+import time
+from rifa.cola import ColaTrabajos
+from rifa import metricas
+from rifa.config import cargar_configuracion, cargar_definiciones, configuracion_rifa
+from rifa.notificaciones import crear_despachador
+logger = logging.getLogger(__name__)
+# ----------------------------
+# WORKER DE NOTIFICACIONES (PROCESO SEPARADO DE STREAMLIT)
+# ----------------------------
+def despachadores_por_rifa(config):
+    """Función rifa_id -> despachador con la configuración de esa rifa (sus propios SMTP_* y TWILIO_*, si los fija)"""
+    creados = {}
+    def obtener(rifa_id):
+        definicion = cargar_definiciones(config).get(rifa_id) if rifa_id else None
+        if rifa_id and definicion is None:
+            logger.warning(f"Trabajos de la rifa desconocida '{rifa_id}': se envían con la configuración global")
+        # Se rearma si la definición de la rifa cambió desde el último lote
+        if rifa_id not in creados or creados[rifa_id][0] != definicion:
+            creados[rifa_id] = definicion, crear_despachador(configuracion_rifa(config, rifa_id, definicion))
+        return creados[rifa_id][1]
+    return obtener
+def procesar_lote(cola, obtener_despachador, limite=50):
+    """Toma un lote, lo envía con el despachador de la rifa de cada trabajo y registra el resultado; devuelve la cantidad"""
+    trabajos = cola.tomar(limite)
+    if not trabajos:
+        return 0
+    por_rifa = {}
+    for t in trabajos:
+        mensaje = {**t["payload"], "canal": t["canal"], "trabajo_id": t["id"]}
+        por_rifa.setdefault(mensaje.get("rifa_id", ""), []).append(mensaje)
+    for rifa_id, mensajes in por_rifa.items():
+        for mensaje, ok, detalle in obtener_despachador(rifa_id).enviar_lote(mensajes):
+            if ok:
+                cola.completar(mensaje["trabajo_id"])
+            elif cola.fallar(mensaje["trabajo_id"], detalle) == "fallido":
+                logger.warning(f"Trabajo {mensaje['trabajo_id']} enviado a la lista de descarte: {detalle}")
+    return len(trabajos)
+def ejecutar(config, intervalo=2.0, limite=50, una_vez=False):
+    """Bucle principal: procesa la cola de todas las rifas hasta que se interrumpa"""
+    cola = ColaTrabajos(config["RUTA_COLA"], max_intentos=config["COLA_MAX_INTENTOS"])
+    obtener_despachador = despachadores_por_rifa(config)
+    logger.info(f"Worker de notificaciones iniciado (cola: {config['RUTA_COLA']})")
+    while True:
+        procesados = procesar_lote(cola, obtener_despachador, limite)
+        if procesados:
+            logger.info(f"{procesados} notificaciones procesadas")
+        elif una_vez:
+            return
+        else:
+            time.sleep(intervalo)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Procesa la cola persistente de notificaciones")
+    parser.add_argument("--intervalo", type=float, default=2.0, help="Segundos de espera con la cola vacía")
+    parser.add_argument("--lote", type=int, default=50, help="Trabajos por lote")
+    parser.add_argument("--una-vez", action="store_true", help="Vaciar la cola y terminar")
+    parser.add_argument("--metricas-puerto", type=int, default=0, help="Exponer /metrics en este puerto (con METRICAS=1)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    config = cargar_configuracion()
+    metricas.configurar(config, puerto=args.metricas_puerto)
+    try:
+        ejecutar(config, args.intervalo, args.lote, args.una_vez)
+    except KeyboardInterrupt:
+        logger.info("Worker detenido")
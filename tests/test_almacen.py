@@ -0,0 +1,56 @@
+import threading
+import pytest
+from rifa import almacen as modulo_almacen
+from rifa.almacen import AlmacenParticipantes
+# ----------------------------
+# RESERVAS: DOS CONEXIONES COMPITEN POR EL MISMO BOLETO
+# ----------------------------
+def participante(boleto, nombre):
+    return {"boleto": boleto, "nombre": nombre, "estado_pago": "pendiente"}
+@pytest.fixture
+def ruta(tmp_path):
+    ruta = str(tmp_path / "rifa.db")
+    AlmacenParticipantes(ruta)
+    return ruta
+def test_solo_una_reserva_gana_el_boleto(ruta):
+    # Dos almacenes sobre el mismo archivo, como dos procesos de la app
+    almacenes = [AlmacenParticipantes(ruta) for _ in range(2)]
+    salida = threading.Barrier(8)
+    resultados = []
+    lock = threading.Lock()
+    def intentar(almacen, nombre):
+        salida.wait()
+        ok = almacen.reservar("00042")
+        with lock:
+            resultados.append((nombre, ok))
+    hilos = [
+        threading.Thread(target=intentar, args=(almacenes[i % 2], f"Persona {i}"))
+        for i in range(8)
+    ]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    ganadores = [nombre for nombre, ok in resultados if ok]
+    assert len(ganadores) == 1
+    # Quien ganó la reserva confirma; nadie más puede reservar ni registrarse con ese boleto
+    assert almacenes[0].confirmar_reserva(participante("00042", ganadores[0]))
+    assert not almacenes[1].reservar("00042")
+    assert not almacenes[1].confirmar_reserva(participante("00042", "Otra persona"))
+    assert almacenes[1].obtener("00042")["nombre"] == ganadores[0]
+def test_reserva_liberada_o_vencida_se_puede_tomar(ruta, monkeypatch):
+    uno, otro = AlmacenParticipantes(ruta), AlmacenParticipantes(ruta)
+    ahora = [1000.0]
+    monkeypatch.setattr(modulo_almacen.time, "time", lambda: ahora[0])
+    assert uno.reservar("00007", segundos=60)
+    assert not otro.reservar("00007")
+    ahora[0] += 59
+    assert not otro.reservar("00007")
+    # Pasado el plazo la reserva vence y el boleto vuelve a estar libre
+    ahora[0] += 2
+    assert otro.reservar("00007")
+    assert not uno.reservar("00007")
+    otro.liberar_reserva("00007")
+    assert uno.reservar("00007")
+    assert uno.confirmar_reserva(participante("00007", "Ana"))
+    assert not otro.reservar("00007")
@@ -0,0 +1,71 @@
+import pytest
+from rifa.almacen import AlmacenParticipantes
+from rifa.conciliacion import conciliar
+# ----------------------------
+# CONCILIACIÓN CONTRA EL STUB LOCAL DE MERCADO PAGO
+# ----------------------------
+DESDE = "2026-10-15T00:00:00.000-03:00"
+HASTA = "2026-10-18T23:59:59.000-03:00"
+@pytest.fixture
+def entorno(tmp_path):
+    pytest.importorskip("requests")
+    from rifa.pagos import ClienteMercadoPago
+    from rifa.stub_mp import iniciar_servidor
+    stub, estado_mp, url_mp = iniciar_servidor()
+    almacen = AlmacenParticipantes(str(tmp_path / "rifa.db"))
+    almacen.insertar({"boleto": "00001", "nombre": "Ana", "estado_pago": "pendiente"})
+    almacen.insertar({"boleto": "00002", "nombre": "Beto", "estado_pago": "pagado", "id_pago_mp": "900"})
+    almacen.insertar({"boleto": "00003", "nombre": "Carla", "estado_pago": "pendiente"})
+    pagos = [
+        {"id": 901, "status": "approved", "external_reference": "norte:00001", "payment_method_id": "visa",
+         "date_created": "2026-10-16T10:00:00.000-03:00", "date_approved": "2026-10-16T10:01:00.000-03:00"},
+        {"id": 902, "status": "approved", "external_reference": "norte:00002",
+         "date_created": "2026-10-16T11:00:00.000-03:00"},
+        {"id": 903, "status": "pending", "external_reference": "norte:00003",
+         "date_created": "2026-10-16T12:00:00.000-03:00"},
+        {"id": 904, "status": "approved", "external_reference": "norte:00099",
+         "date_created": "2026-10-17T09:00:00.000-03:00"},
+        {"id": 905, "status": "approved", "external_reference": "sur:00003",
+         "date_created": "2026-10-17T10:00:00.000-03:00"},
+        {"id": 906, "status": "approved", "external_reference": "norte:00003",
+         "date_created": "2026-10-10T10:00:00.000-03:00"},
+    ]
+    for pago in pagos:
+        estado_mp.agregar_pago(pago)
+    yield almacen, ClienteMercadoPago("TEST-token", "Rifa", 1000, api_url=url_mp, rifa_id="norte")
+    stub.shutdown()
+def test_pago_aprobado_marca_el_boleto_pendiente(entorno):
+    almacen, cliente = entorno
+    reporte = conciliar(almacen, cliente, DESDE, HASTA)
+    # El pago 906 es anterior al rango: no se consulta
+    assert reporte["pagos_consultados"] == 5
+    assert reporte["marcados"] == [{"boleto": "00001", "antes": "pendiente", "despues": "pagado", "id_pago_mp": "901"}]
+    pagado = almacen.obtener("00001")
+    assert pagado["estado_pago"] == "pagado"
+    assert pagado["id_pago_mp"] == "901" and pagado["metodo_pago"] == "visa"
+    assert pagado["fecha_pago"] == "2026-10-16T10:01:00.000-03:00"
+    # Pendiente en MP y pago de otra rifa: el boleto 00003 no cambia
+    assert almacen.obtener("00003")["estado_pago"] == "pendiente"
+def test_boletos_ya_pagados_no_se_tocan(entorno):
+    almacen, cliente = entorno
+    antes = almacen.obtener("00002")
+    reporte = conciliar(almacen, cliente, DESDE, HASTA)
+    assert reporte["ya_pagados"] == 1
+    assert almacen.obtener("00002") == antes
+    # Una segunda pasada no encuentra nada nuevo ni escribe
+    version = almacen.version()
+    repetido = conciliar(almacen, cliente, DESDE, HASTA)
+    assert repetido["marcados"] == [] and repetido["ya_pagados"] == 2
+    assert almacen.version() == version
+def test_boleto_desconocido_se_reporta(entorno):
+    almacen, cliente = entorno
+    reporte = conciliar(almacen, cliente, DESDE, HASTA)
+    assert reporte["sin_participante"] == [{"boleto": "00099", "id_pago_mp": "904"}]
+    assert almacen.obtener("00099") is None
+def test_simulacion_no_aplica_cambios(entorno):
+    almacen, cliente = entorno
+    version = almacen.version()
+    reporte = conciliar(almacen, cliente, DESDE, HASTA, aplicar=False)
+    assert not reporte["aplicado"] and len(reporte["marcados"]) == 1
+    assert almacen.obtener("00001")["estado_pago"] == "pendiente"
+    assert almacen.version() == version
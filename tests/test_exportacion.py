@@ -0,0 +1,24 @@
+import os
+from rifa.exportacion import iterar_participantes_csv, preparar_exportacion
+# ----------------------------
+# EXPORTACIONES VERSIONADAS
+# ----------------------------
+def test_se_conservan_las_versiones_recientes(tmp_path):
+    carpeta = str(tmp_path)
+    generadas = []
+    for version in range(5):
+        ruta = preparar_exportacion(carpeta, "participantes", "csv", f"v{version}", lambda: iter(["a,b\n"]), conservar=2)
+        # mtime explícito: en algunos sistemas de archivos dos escrituras seguidas comparten la marca de tiempo
+        os.utime(ruta, (version, version))
+        generadas.append(ruta)
+    # La versión anterior sigue disponible para quien la esté descargando
+    assert sorted(os.listdir(carpeta)) == ["participantes_v3.csv", "participantes_v4.csv"]
+    # Misma versión: se reutiliza el archivo sin regenerarlo
+    assert preparar_exportacion(carpeta, "participantes", "csv", "v4", lambda: iter(["otro\n"])) == generadas[-1]
+    with open(generadas[-1], encoding="utf-8") as f:
+        assert f.read() == "a,b\n"
+def test_csv_de_participantes_por_bloques():
+    participantes = [{"nombre": f"P{i}", "boleto": f"{i:05d}"} for i in range(5)]
+    bloques = list(iterar_participantes_csv(participantes, filas_por_bloque=2))
+    assert len(bloques) == 3
+    assert "".join(bloques).splitlines()[1].startswith("P0,00000")
@@ -0,0 +1,52 @@
+import io
+import pytest
+from rifa.almacen import AlmacenParticipantes
+# ----------------------------
+# IMPORTACIÓN DE CSV POR BLOQUES E IDEMPOTENCIA POR HUELLA
+# ----------------------------
+pytest.importorskip("pandas")
+from rifa.importacion import importar_csv
+ENLACE = "https://pago.ejemplo/"
+CSV = (
+    "Nombre,Boleto,Email,Telefono,Ciudad\n"
+    "Ana,7,ana@ejemplo.com,351 555-1234,Córdoba\n"
+    "Beto,00008,beto@ejemplo,,Córdoba\n"
+    "Carla,,carla@ejemplo.com,,Villa María\n"
+    "Dani,00009,,12,Río Cuarto\n"
+    "Eva,00007,,,Córdoba\n"
+    "Fede,00010,,,Córdoba\n"
+    "Gabi,00001,,,Córdoba\n"
+)
+@pytest.fixture
+def almacen(tmp_path):
+    almacen = AlmacenParticipantes(str(tmp_path / "rifa.db"))
+    almacen.insertar({"boleto": "00001", "nombre": "Ya registrado"})
+    return almacen
+def archivo(texto):
+    return io.BytesIO(texto.encode("utf-8"))
+def test_importar_csv_valida_y_registra(almacen):
+    avances = []
+    resumen = importar_csv(archivo(CSV), almacen, ENLACE, filas_por_bloque=3, al_avanzar=lambda f, p: avances.append(f))
+    assert (resumen["nuevos"], resumen["duplicados"], resumen["errores"], resumen["filas"]) == (2, 2, 3, 7)
+    assert not resumen["repetida"]
+    assert avances == [3, 6, 7]
+    assert {p["boleto"] for p in resumen["participantes_nuevos"]} == {"00007", "00010"}
+    ana = almacen.obtener("00007")
+    assert ana["nombre"] == "Ana" and ana["telefono"] == "+3515551234" and ana["link_pago"] == ENLACE
+    # La fila sin boleto no se descarta en silencio: se informa con su línea del archivo
+    assert resumen["detalles"][:3] == ["❌ Email inválido: 00008", "❌ Boleto vacío: fila 4", "❌ Teléfono inválido: 00009"]
+    assert "⚠️ Boleto duplicado: 00007" in resumen["detalles"]
+    assert "⚠️ Boleto duplicado: 00001" in resumen["detalles"]
+    assert almacen.obtener("00001")["nombre"] == "Ya registrado"
+def test_archivo_repetido_no_se_reprocesa(almacen):
+    primero = importar_csv(archivo(CSV), almacen, ENLACE)
+    version = almacen.version()
+    # Mismo contenido (misma SHA-256): devuelve el resumen guardado sin tocar el almacén
+    repetido = importar_csv(archivo(CSV), almacen, ENLACE)
+    assert repetido["repetida"]
+    assert (repetido["nuevos"], repetido["errores"]) == (primero["nuevos"], primero["errores"])
+    assert almacen.version() == version
+    # Un byte distinto es otro archivo y se procesa: sus boletos ya están registrados
+    distinto = importar_csv(archivo(CSV + "Hugo,00011,,,Córdoba\n"), almacen, ENLACE)
+    assert not distinto["repetida"]
+    assert (distinto["nuevos"], distinto["duplicados"]) == (1, 4)
@@ -0,0 +1,129 @@
+import base64
+import email
+import json
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+import pytest
+from rifa.notificaciones import CanalEmail, CanalWhatsApp, DespachadorNotificaciones, normalizar_whatsapp
+# ----------------------------
+# SUMIDERO SMTP Y TWILIO FALSO (LOCALES, EN HILOS)
+# ----------------------------
+class SumideroSMTP(socketserver.ThreadingTCPServer):
+    """Servidor SMTP mínimo que guarda los mensajes recibidos y cuenta las conexiones"""
+    daemon_threads = True
+    allow_reuse_address = True
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SesionSMTP)
+        self.mensajes = []
+        self.conexiones = 0
+        self.lock = threading.Lock()
+class _SesionSMTP(socketserver.StreamRequestHandler):
+    def responder(self, linea):
+        self.wfile.write(f"{linea}\r\n".encode("ascii"))
+    def handle(self):
+        with self.server.lock:
+            self.server.conexiones += 1
+        self.responder("220 sumidero listo")
+        destinatarios = []
+        while linea := self.rfile.readline():
+            comando = linea.decode("ascii").strip().upper()
+            if comando.startswith(("EHLO", "HELO")):
+                self.responder("250 sumidero")
+            elif comando.startswith("MAIL"):
+                destinatarios = []
+                self.responder("250 OK")
+            elif comando.startswith("RCPT"):
+                destinatarios.append(linea.decode("ascii").split(":", 1)[1].strip(" <>\r\n"))
+                self.responder("250 OK")
+            elif comando == "DATA":
+                self.responder("354 fin con <CRLF>.<CRLF>")
+                lineas = []
+                while (linea := self.rfile.readline()) not in (b".\r\n", b""):
+                    lineas.append(linea)
+                datos = b"".join(lineas)
+                with self.server.lock:
+                    self.server.mensajes.append((destinatarios, email.message_from_bytes(datos)))
+                self.responder("250 OK")
+            elif comando == "QUIT":
+                self.responder("221 chau")
+                return
+            else:
+                self.responder("250 OK")
+class _ManejadorTwilio(BaseHTTPRequestHandler):
+    def log_message(self, formato, *args):
+        pass
+    def do_POST(self):
+        largo = int(self.headers.get("Content-Length") or 0)
+        datos = {k: v[0] for k, v in parse_qs(self.rfile.read(largo).decode("utf-8")).items()}
+        with self.server.lock:
+            self.server.pedidos.append((self.path, self.headers.get("Authorization"), datos))
+            sid = f"SM{len(self.server.pedidos):032d}"
+        codigo, cuerpo = (400, {"message": "número inválido"}) if datos["To"].endswith("0000") else (201, {"sid": sid})
+        respuesta = json.dumps(cuerpo).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(respuesta)))
+        self.end_headers()
+        self.wfile.write(respuesta)
+def iniciar(servidor):
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+@pytest.fixture
+def sumidero():
+    servidor = iniciar(SumideroSMTP())
+    yield servidor
+    servidor.shutdown()
+@pytest.fixture
+def twilio():
+    pytest.importorskip("requests")
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _ManejadorTwilio)
+    servidor.daemon_threads = True
+    servidor.pedidos = []
+    servidor.lock = threading.Lock()
+    iniciar(servidor)
+    yield servidor
+    servidor.shutdown()
+def canal_email(sumidero):
+    return CanalEmail("127.0.0.1", sumidero.server_address[1], "rifa@ejemplo.com", "", usar_tls=False)
+def canal_whatsapp(twilio):
+    return CanalWhatsApp("AC123", "secreto", "whatsapp:+14155238886", api_url=f"http://127.0.0.1:{twilio.server_address[1]}")
+def test_lote_de_emails_reutiliza_una_conexion_por_hilo(sumidero):
+    mensajes = [
+        {"canal": "email", "destino": f"p{i}@ejemplo.com", "asunto": "Recordatorio", "cuerpo": f"Hola {i} ñandú"}
+        for i in range(30)
+    ]
+    avances = []
+    despachador = DespachadorNotificaciones(canal_email(sumidero), hilos=3, tasa_email=0)
+    resultados = despachador.enviar_lote(mensajes, lambda i, total: avances.append((i, total)))
+    assert all(ok for _, ok, _ in resultados)
+    assert avances[-1] == (30, 30)
+    assert 1 <= sumidero.conexiones <= 3
+    assert sorted(d[0] for d, _ in sumidero.mensajes) == sorted(m["destino"] for m in mensajes)
+    _, recibido = sumidero.mensajes[0]
+    assert recibido["Subject"] == "Recordatorio"
+    assert "ñandú" in recibido.get_payload()[0].get_payload(decode=True).decode("utf-8")
+def test_whatsapp_por_la_api_de_twilio(twilio):
+    despachador = DespachadorNotificaciones(canal_whatsapp=canal_whatsapp(twilio), hilos=2, tasa_whatsapp=0)
+    resultados = despachador.enviar_lote([
+        {"canal": "whatsapp", "destino": "+54 9 11 5555-1234", "cuerpo": "¡Ganaste!"},
+        {"canal": "whatsapp", "destino": "+54 9 11 5555-0000", "cuerpo": "¡Ganaste!"},
+    ])
+    por_destino = {m["destino"]: (ok, detalle) for m, ok, detalle in resultados}
+    assert por_destino["+54 9 11 5555-1234"][0] and por_destino["+54 9 11 5555-1234"][1].startswith("SM")
+    assert not por_destino["+54 9 11 5555-0000"][0]
+    ruta, autorizacion, datos = next(p for p in twilio.pedidos if p[2]["To"].endswith("1234"))
+    assert ruta == "/2010-04-01/Accounts/AC123/Messages.json"
+    assert autorizacion == "Basic " + base64.b64encode(b"AC123:secreto").decode("ascii")
+    assert datos == {"From": "whatsapp:+14155238886", "To": "whatsapp:+5491155551234", "Body": "¡Ganaste!"}
+def test_lote_mixto(sumidero, twilio):
+    despachador = DespachadorNotificaciones(canal_email(sumidero), canal_whatsapp(twilio), hilos=4, tasa_email=0, tasa_whatsapp=0)
+    resultados = despachador.enviar_lote([
+        {"canal": "email", "destino": "ana@ejemplo.com", "asunto": "Premio", "cuerpo": "¡Ganaste!"},
+        {"canal": "whatsapp", "destino": "+5491155551234", "cuerpo": "¡Ganaste!"},
+    ])
+    assert all(ok for _, ok, _ in resultados)
+    assert len(sumidero.mensajes) == 1 and len(twilio.pedidos) == 1
+def test_normalizar_whatsapp():
+    assert normalizar_whatsapp("+54 (351) 555-1234") == "whatsapp:+543515551234"
@@ -0,0 +1,55 @@
+import threading
+import time
+import pytest
+from rifa.pagos import ClienteMercadoPago
+from rifa.stub_mp import iniciar_servidor
+# ----------------------------
+# ENLACES DE PAGO CONTRA EL STUB LOCAL DE MERCADO PAGO
+# ----------------------------
+pytest.importorskip("requests")
+FALLBACK = "https://fallback.ejemplo/"
+@pytest.fixture
+def stub():
+    servidor, estado, url = iniciar_servidor(latencia=0.05)
+    yield estado, url
+    servidor.shutdown()
+def cliente(url, **opciones):
+    return ClienteMercadoPago("TEST-token", "Rifa de prueba", 1000, enlace_fallback=FALLBACK, api_url=url, **opciones)
+def solicitudes(cantidad):
+    return [{"boleto": f"{i:05d}", "nombre": f"Persona {i}", "email": f"p{i}@ejemplo.com"} for i in range(cantidad)]
+def test_crear_enlace_devuelve_init_point(stub):
+    estado, url = stub
+    enlace = cliente(url, rifa_id="norte").crear_enlace("00042", "Ana María Pérez", "ana@ejemplo.com")
+    assert enlace.startswith("https://stub.mercadopago.local/checkout/stub-")
+    preferencia = next(iter(estado.preferencias.values()))
+    assert preferencia["external_reference"] == "norte:00042"
+    assert preferencia["payer"]["last_name"] == "María Pérez"
+def test_enlaces_lote_concurrentes(stub):
+    estado, url = stub
+    avances = []
+    inicio = time.perf_counter()
+    enlaces = cliente(url, max_concurrencia=8).crear_enlaces_lote(solicitudes(40), lambda i, total: avances.append(i))
+    duracion = time.perf_counter() - inicio
+    assert set(enlaces) == {s["boleto"] for s in solicitudes(40)}
+    assert len(set(enlaces.values())) == 40
+    assert all(e.startswith("https://stub.mercadopago.local/checkout/") for e in enlaces.values())
+    assert estado.solicitudes == 40
+    assert avances == list(range(1, 41))
+    # 40 solicitudes de 50 ms en serie tardarían 2 s; con 8 en paralelo, unas 5 tandas
+    assert duracion < 1.5
+def test_enlaces_en_segundo_plano(stub):
+    _, url = stub
+    listo = threading.Event()
+    recibidos = {}
+    def al_terminar(enlaces):
+        recibidos.update(enlaces)
+        listo.set()
+    cliente(url).crear_enlaces_en_segundo_plano(solicitudes(5), al_terminar)
+    assert listo.wait(10)
+    assert len(recibidos) == 5
+def test_sin_token_o_con_error_usa_el_enlace_generico(stub):
+    estado, url = stub
+    sin_token = ClienteMercadoPago("", "Rifa", 1000, enlace_fallback=FALLBACK, api_url=url)
+    assert sin_token.crear_enlace("00001", "Ana", "ana@ejemplo.com") == FALLBACK
+    assert estado.solicitudes == 0
+    assert cliente(f"{url}/inexistente").crear_enlace("00001", "Ana", "ana@ejemplo.com") == FALLBACK
@@ -0,0 +1,101 @@
+import json
+import os
+import zlib
+import pytest
+from rifa.almacen import AlmacenParticipantes
+from rifa.respaldos import MAGIA, GestorRespaldos, _MARCO, _marco, leer_respaldo
+# ----------------------------
+# RESPALDOS: INSTANTÁNEA + DELTAS, VERIFICACIÓN Y PODA
+# ----------------------------
+def participante(boleto, estado_pago="pendiente"):
+    return {"boleto": boleto, "nombre": f"Persona {boleto}", "estado_pago": estado_pago}
+def contenido(almacen):
+    """Filas y boletos borrados (lápidas) del almacén"""
+    filas, borrados = almacen.cambios_desde(0)
+    return sorted(filas, key=lambda p: p["boleto"]), set(borrados)
+@pytest.fixture
+def origen(tmp_path):
+    almacen = AlmacenParticipantes(str(tmp_path / "rifa.db"))
+    almacen.guardar_muchos([participante(f"{i:05d}") for i in range(1, 6)])
+    return almacen, GestorRespaldos(str(tmp_path / "respaldos"), almacen)
+def marcos(ruta):
+    """Divide un respaldo en sus marcos crudos (tipo, bytes del marco)"""
+    with open(ruta, "rb") as f:
+        datos = f.read()[len(MAGIA):]
+    partes = []
+    while datos:
+        tipo, largo, _ = _MARCO.unpack(datos[:_MARCO.size])
+        partes.append((tipo, datos[:_MARCO.size + largo]))
+        datos = datos[_MARCO.size + largo:]
+    return partes
+def test_instantanea_y_delta_restauran_filas_y_borrados(origen, tmp_path):
+    almacen, gestor = origen
+    instantanea = gestor.respaldar(extras={"premios": ["Moto"]})
+    assert instantanea["tipo"] == "instantanea" and instantanea["participantes"] == 5
+    almacen.actualizar("00002", {"estado_pago": "pagado"})
+    almacen.eliminar_muchos(["00003"])
+    almacen.guardar(participante("00006"))
+    delta = gestor.respaldar(extras={"premios": ["Moto", "Bici"]})
+    assert delta["tipo"] == "delta" and delta["base"] == instantanea["archivo"]
+    assert (delta["participantes"], delta["borrados"]) == (2, 1)
+    # Sin cambios no se crea otro delta
+    assert gestor.respaldar(extras={"premios": ["Moto", "Bici"]}) is None
+    destino = AlmacenParticipantes(str(tmp_path / "restaurada.db"))
+    destino.guardar(participante("99999"))
+    extras = GestorRespaldos(gestor.carpeta, destino).restaurar(delta["archivo"])
+    assert extras == {"premios": ["Moto", "Bici"]}
+    assert contenido(destino) == contenido(almacen)
+    assert destino.obtener("00003") is None and destino.obtener("99999") is None
+    # Restaurar la instantánea sola vuelve al estado anterior al delta
+    GestorRespaldos(gestor.carpeta, destino).restaurar(instantanea["archivo"])
+    assert destino.obtener("00003") is not None and destino.obtener("00006") is None
+@pytest.mark.parametrize("dano", ["marco", "cierre", "truncado"])
+def test_respaldo_danado_se_rechaza_sin_tocar_el_almacen(origen, tmp_path, dano):
+    almacen, gestor = origen
+    archivo = gestor.respaldar()["archivo"]
+    ruta = os.path.join(gestor.carpeta, archivo)
+    partes = marcos(ruta)
+    if dano == "marco":
+        # Un byte cambiado en los datos de participantes: falla el CRC del marco
+        i = next(i for i, (tipo, _) in enumerate(partes) if tipo == b"P")
+        marco = bytearray(partes[i][1])
+        marco[-1] ^= 0xFF
+        partes[i] = (b"P", bytes(marco))
+    elif dano == "cierre":
+        # Cierre con CRC correcto pero una suma SHA-256 que no coincide con el contenido
+        cierre = json.loads(zlib.decompress(partes[-1][1][_MARCO.size:]))
+        partes[-1] = (b"F", _marco(b"F", {**cierre, "sha256": "0" * 64}))
+    else:
+        partes = partes[:-1]
+    with open(ruta, "wb") as f:
+        f.write(MAGIA + b"".join(marco for _, marco in partes))
+    with pytest.raises(ValueError):
+        list(leer_respaldo(ruta))
+    destino = AlmacenParticipantes(str(tmp_path / "restaurada.db"))
+    destino.guardar(participante("99999"))
+    with pytest.raises(ValueError):
+        GestorRespaldos(gestor.carpeta, destino).restaurar(archivo)
+    # La restauración es una sola transacción: el almacén queda como estaba
+    assert [p["boleto"] for p in contenido(destino)[0]] == ["99999"]
+def test_podar_conserva_la_instantanea_de_cada_delta(origen):
+    almacen, gestor = origen
+    gestor.max_instantaneas = 2
+    creados = []
+    for vuelta in range(3):
+        creados.append(gestor.respaldar(forzar_instantanea=True))
+        almacen.guardar(participante(f"1000{vuelta}"))
+        creados.append(gestor.respaldar())
+    restantes = gestor.listar()
+    archivos = {r["archivo"] for r in restantes}
+    assert archivos == {r["archivo"] for r in creados[2:]}
+    # Cada respaldo que queda tiene su instantánea base y se puede restaurar
+    assert all(r["base"] in archivos for r in restantes)
+    assert [r["tipo"] for r in restantes].count("instantanea") == 2
+    # Una instantánea nueva poda la más antigua junto con su delta
+    almacen.guardar(participante("20000"))
+    gestor.respaldar(forzar_instantanea=True)
+    restantes = gestor.listar()
+    assert creados[2]["archivo"] not in {r["archivo"] for r in restantes}
+    assert all(r["base"] in {x["archivo"] for x in restantes} for r in restantes)
+    gestor.restaurar(creados[-1]["archivo"])
+    assert almacen.obtener("10002") is not None and almacen.obtener("20000") is None
@@ -0,0 +1,117 @@
+import os
+from datetime import datetime
+import pytest
+from rifa.resultados import (
+    FuenteHTML, ProveedorResultados, extraer_fecha, extraer_numero, fuentes_desde_config, interpretar_fecha
+)
+# ----------------------------
+# EXTRACCIÓN DEL NÚMERO Y LA FECHA SOBRE PÁGINAS GUARDADAS
+# ----------------------------
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+URL = "https://resultados.ejemplo/nocturna"
+DOMINGO_2145 = datetime(2026, 10, 18, 21, 45)
+def pagina(nombre):
+    with open(os.path.join(FIXTURES, nombre), "r", encoding="utf-8") as f:
+        return f.read()
+class Respuesta:
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+class SesionFalsa:
+    """Sirve páginas guardadas; con la misma ETag responde 304 como un servidor real"""
+    def __init__(self, html, etag='"v1"'):
+        self.html = html
+        self.etag = etag
+        self.pedidos = []
+    def get(self, url, headers=None, timeout=None):
+        self.pedidos.append(dict(headers or {}))
+        if self.etag and (headers or {}).get("If-None-Match") == self.etag:
+            return Respuesta(304)
+        return Respuesta(200, self.html, {"ETag": self.etag} if self.etag else {})
+def proveedor(tmp_path, html, fuente=None, etag='"v1"'):
+    fuente = fuente or FuenteHTML("prueba", URL, clase_fecha="fecha")
+    return ProveedorResultados(str(tmp_path / "resultados.db"), [fuente], sesion=SesionFalsa(html, etag))
+def test_extraer_numero_toma_el_primer_elemento_con_la_clase():
+    assert extraer_numero(pagina("nocturna_2026-10-18.html")) == "04712"
+    assert extraer_numero(pagina("nocturna_sin_fecha.html")) == "12345"
+    assert extraer_numero(pagina("nocturna_2026-10-18.html"), clase="inexistente") is None
+def test_extraer_fecha_en_distintos_formatos():
+    assert extraer_fecha(pagina("nocturna_2026-10-18.html")) == "2026-10-18"
+    assert extraer_fecha(pagina("nocturna_2026-10-17.html")) == "2026-10-17"
+    assert extraer_fecha(pagina("nocturna_sin_fecha.html")) is None
+    assert interpretar_fecha("2026-10-18") == "2026-10-18"
+    assert interpretar_fecha("sábado 1 de setiembre del 2026") == "2026-09-01"
+    assert interpretar_fecha("31/02/2026") is None
+def test_fuente_html_devuelve_numero_y_fecha():
+    assert FuenteHTML("f", URL, clase_fecha="fecha").extraer(pagina("nocturna_2026-10-18.html")) == ("04712", "2026-10-18")
+    assert FuenteHTML("f", URL).extraer(pagina("nocturna_2026-10-18.html")) == ("04712", None)
+def test_get_condicional_reutiliza_numero_y_fecha_con_304(tmp_path):
+    p = proveedor(tmp_path, pagina("nocturna_2026-10-18.html"))
+    fuente = p.fuentes[0]
+    assert p.consultar(fuente) == ("04712", "2026-10-18")
+    # La segunda consulta envía la ETag guardada; el 304 no trae cuerpo y se reutiliza lo extraído
+    p.sesion.html = ""
+    assert p.consultar(fuente) == ("04712", "2026-10-18")
+    assert "If-None-Match" not in p.sesion.pedidos[0]
+    assert p.sesion.pedidos[1]["If-None-Match"] == '"v1"'
+def test_pagina_desactualizada_no_se_guarda(tmp_path):
+    p = proveedor(tmp_path, pagina("nocturna_2026-10-17.html"))
+    assert p.obtener("2026-10-18", ahora=DOMINGO_2145) is None
+    assert p.resultado_guardado("2026-10-18") is None
+    # La página se actualiza: mismo proveedor, nueva versión
+    p.sesion.html, p.sesion.etag = pagina("nocturna_2026-10-18.html"), '"v2"'
+    assert p.obtener("2026-10-18", ahora=DOMINGO_2145) == "04712"
+    assert p.resultado_guardado("2026-10-18")["fuente"] == "prueba"
+def test_pagina_desactualizada_tras_304(tmp_path):
+    p = proveedor(tmp_path, pagina("nocturna_2026-10-17.html"))
+    assert p.consultar(p.fuentes[0]) == ("12345", "2026-10-17")
+    assert p.obtener("2026-10-18", ahora=DOMINGO_2145) is None
+    assert p.sesion.pedidos[-1]["If-None-Match"] == '"v1"'
+def test_fecha_pasada_solo_con_la_fecha_publicada(tmp_path):
+    p = proveedor(tmp_path, pagina("nocturna_2026-10-18.html"))
+    assert p.obtener("2025-01-01", ahora=DOMINGO_2145) is None
+    assert p.resultado_guardado("2025-01-01") is None
+    # Al día siguiente la página sigue mostrando el sorteo del domingo: vale para esa fecha
+    assert p.obtener("2026-10-18", ahora=datetime(2026, 10, 19, 9, 0)) == "04712"
+def test_fuente_sin_fecha_no_confirma_otro_dia(tmp_path):
+    p = proveedor(tmp_path, pagina("nocturna_sin_fecha.html"), fuente=FuenteHTML("prueba", URL))
+    assert p.obtener("2026-10-17", ahora=DOMINGO_2145) is None
+    assert p.sesion.pedidos == []
+@pytest.mark.parametrize("ayer, esperado", [("12345", None), ("99999", "12345")])
+def test_fuente_sin_fecha_compara_con_el_resultado_de_ayer(tmp_path, ayer, esperado):
+    p = proveedor(tmp_path, pagina("nocturna_sin_fecha.html"), fuente=FuenteHTML("prueba", URL))
+    p.guardar_manual("2026-10-17", ayer)
+    assert p.obtener("2026-10-18", ahora=DOMINGO_2145) == esperado
+    assert (p.resultado_guardado("2026-10-18") or {}).get("numero") == esperado
+def test_fuente_sin_fecha_inicia_la_cadena_sin_resultados_previos(tmp_path):
+    p = proveedor(tmp_path, pagina("nocturna_sin_fecha.html"), fuente=FuenteHTML("prueba", URL))
+    assert p.obtener("2026-10-18", ahora=DOMINGO_2145) == "12345"
+    assert p.resultado_guardado("2026-10-18")["fuente"] == "prueba"
+def test_fuente_sin_fecha_no_confirma_si_falta_el_resultado_de_ayer(tmp_path):
+    p = proveedor(tmp_path, pagina("nocturna_sin_fecha.html"), fuente=FuenteHTML("prueba", URL))
+    p.guardar_manual("2026-10-16", "99999")
+    assert p.obtener("2026-10-18", ahora=DOMINGO_2145) is None
+    # El administrador indica el resultado y el programador lo encuentra guardado
+    assert p.guardar_manual("2026-10-18", "1 2 3 4 5") == "12345"
+    assert p.obtener("2026-10-18", ahora=DOMINGO_2145) == "12345"
+    assert p.resultado_guardado("2026-10-18")["fuente"] == "manual"
+def test_guardar_manual_valida_y_corrige(tmp_path):
+    p = proveedor(tmp_path, pagina("nocturna_2026-10-18.html"))
+    with pytest.raises(ValueError):
+        p.guardar_manual("2026-10-18", "1234")
+    p.guardar_manual("2026-10-18", "11111")
+    p.guardar_manual("2026-10-18", "04712")
+    assert p.obtener("2026-10-18", ahora=DOMINGO_2145) == "04712"
+    assert p.sesion.pedidos == []
+def test_fuente_por_defecto_no_exige_fecha():
+    fuente = fuentes_desde_config("")[0]
+    assert not fuente.fechada
+    assert fuente.extraer(pagina("nocturna_sin_fecha.html")) == ("12345", None)
+def test_antes_de_la_hora_del_sorteo_no_consulta(tmp_path):
+    p = proveedor(tmp_path, pagina("nocturna_2026-10-18.html"))
+    assert p.obtener("2026-10-18", ahora=datetime(2026, 10, 18, 21, 0)) is None
+    assert p.sesion.pedidos == []
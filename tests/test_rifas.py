@@ -0,0 +1,38 @@
+import json
+import pytest
+from rifa.config import cargar_configuracion
+from rifa.rifas import RifaCerrada, crear_registro
+# ----------------------------
+# REGISTRO DE RIFAS: DESALOJO Y CONTEXTOS CERRADOS
+# ----------------------------
+@pytest.fixture
+def registro(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "rifas.json").write_text(json.dumps([{"id": "norte"}, {"id": "sur"}]), encoding="utf-8")
+    config = cargar_configuracion()
+    config.update({
+        "RIFAS_ARCHIVO": str(tmp_path / "rifas.json"),
+        "CARPETA_RIFAS": str(tmp_path / "rifas"),
+        "RIFAS_ACTIVAS_MAX": 1,
+        "BACKUP_INTERVALO_MIN": 60,
+    })
+    registro = crear_registro(config)
+    yield registro
+    for rifa_id, _ in registro.activas():
+        registro.obtener(rifa_id).cerrar()
+def test_contexto_desalojado_no_recrea_recursos(registro):
+    norte = registro.obtener("norte")
+    gestor = norte.respaldos()
+    registro.obtener("sur")
+    assert norte.cerrado
+    with pytest.raises(RifaCerrada):
+        norte.respaldos()
+    with pytest.raises(RifaCerrada):
+        norte.almacen()
+    nuevo = registro.obtener("norte")
+    assert nuevo is not norte and not nuevo.cerrado
+    assert nuevo.respaldos() is not gestor
+def test_contexto_cerrado_fuera_del_registro_se_reemplaza(registro):
+    norte = registro.obtener("norte")
+    norte.cerrar()
+    assert registro.obtener("norte") is not norte
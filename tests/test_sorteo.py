@@ -0,0 +1,50 @@
+import pytest
+from rifa.sorteo import (
+    PREMIO_POR_DEFECTO, IndiceSorteo, crear_premio, detallar_ganadores, digitos_premio, reglas_desde_premios
+)
+# ----------------------------
+# REGLAS POR PREMIO E ÍNDICE DE BOLETOS PAGOS
+# ----------------------------
+def participante(boleto, estado_pago="pagado"):
+    return {"boleto": boleto, "nombre": f"Persona {boleto}", "estado_pago": estado_pago}
+def test_premios_de_texto_son_numero_exacto():
+    reglas = reglas_desde_premios(["Moto", "Bicicleta", "Cena", "Remera", "Taza"])
+    assert [r["premio"] for r in reglas] == ["Moto", "Bicicleta", "Cena", "Remera", "Taza"]
+    assert {r["digitos"] for r in reglas} == {5}
+    assert [r["puesto"] for r in reglas] == [1, 2, 3, 4, 5]
+def test_cada_premio_indica_sus_cifras():
+    premios = [crear_premio("Moto"), crear_premio("Bicicleta", 4), {"nombre": "Cena", "digitos": 2}]
+    assert premios[0] == "Moto"
+    reglas = reglas_desde_premios(premios)
+    assert [(r["premio"], r["digitos"], r["regla"]) for r in reglas] == [
+        ("Moto", 5, "exacto"), ("Bicicleta", 4, "últimas 4 cifras"), ("Cena", 2, "últimas 2 cifras")
+    ]
+def test_cifras_invalidas_usan_el_numero_exacto():
+    assert digitos_premio({"nombre": "Taza", "digitos": 7}) == 5
+    assert digitos_premio({"nombre": "Taza"}) == 5
+def test_sin_premios_hay_una_regla_por_defecto():
+    assert reglas_desde_premios([]) == [
+        {"puesto": 1, "premio": PREMIO_POR_DEFECTO, "digitos": 5, "regla": "exacto"}
+    ]
+def test_evaluar_solo_boletos_pagos():
+    indice = IndiceSorteo([participante("12345"), participante("22345"), participante("12345", "pendiente")])
+    assert indice.total_pagados == 2
+    ganadores = indice.evaluar("12345", reglas_desde_premios(["Moto"]))
+    assert [p["boleto"] for _, p in ganadores] == ["12345"]
+def test_cada_boleto_se_lleva_solo_su_mejor_premio():
+    indice = IndiceSorteo([participante(b) for b in ("12345", "92345", "99945", "99999")])
+    reglas = reglas_desde_premios([crear_premio("Moto"), crear_premio("Bici", 4), crear_premio("Cena", 2)])
+    ganadores = detallar_ganadores(indice.evaluar("12345", reglas))
+    assert {g["boleto"]: g["premio"] for g in ganadores} == {"12345": "Moto", "92345": "Bici", "99945": "Cena"}
+    assert len(ganadores) == 3
+def test_el_orden_de_la_lista_define_el_mejor_premio():
+    indice = IndiceSorteo([participante("12345")])
+    reglas = reglas_desde_premios([crear_premio("Cena", 2), crear_premio("Moto")])
+    assert [(regla["premio"], p["boleto"]) for regla, p in indice.evaluar("12345", reglas)] == [("Cena", "12345")]
+def test_numero_oficial_se_normaliza_a_cinco_cifras():
+    indice = IndiceSorteo([participante("00042")])
+    assert len(indice.evaluar(42, reglas_desde_premios(["Moto"]))) == 1
+def test_regla_no_indexada():
+    indice = IndiceSorteo([participante("12345")], digitos=(5,))
+    with pytest.raises(ValueError):
+        indice.evaluar("12345", reglas_desde_premios([crear_premio("Bici", 4)]))
@@ -0,0 +1,106 @@
+import hashlib
+import hmac
+import json
+import urllib.error
+import urllib.request
+import pytest
+from rifa.almacen import AlmacenParticipantes
+from rifa.webhook import ProcesadorPagos, firma_valida, id_pago_notificacion, iniciar_servidor
+# ----------------------------
+# RECEPTOR DE WEBHOOKS: FIRMA Y ACTUALIZACIÓN DEL PAGO CONTRA EL STUB DE MERCADO PAGO
+# ----------------------------
+SECRETO = "clave-de-prueba"
+def firma(id_dato, id_solicitud="solicitud-1", ts="1760800000", secreto=SECRETO):
+    manifiesto = f"id:{id_dato};request-id:{id_solicitud};ts:{ts};"
+    return f"ts={ts},v1={hmac.new(secreto.encode(), manifiesto.encode(), hashlib.sha256).hexdigest()}"
+def test_firma_valida():
+    assert firma_valida(SECRETO, firma("123"), "solicitud-1", "123")
+    assert firma_valida(SECRETO, firma("abc"), "solicitud-1", "ABC")
+    assert not firma_valida(SECRETO, firma("123"), "solicitud-1", "124")
+    assert not firma_valida(SECRETO, firma("123"), "solicitud-2", "123")
+    assert not firma_valida(SECRETO, firma("123", secreto="otra"), "solicitud-1", "123")
+    assert not firma_valida(SECRETO, "ts=1760800000", "solicitud-1", "123")
+    assert not firma_valida(SECRETO, None, "solicitud-1", "123")
+def test_id_pago_notificacion():
+    assert id_pago_notificacion({"type": "payment", "data": {"id": 77}}, {}) == "77"
+    assert id_pago_notificacion({}, {"topic": "payment", "id": "78"}) == "78"
+    assert id_pago_notificacion({"type": "merchant_order", "data": {"id": 79}}, {}) is None
+@pytest.fixture
+def entorno(tmp_path):
+    pytest.importorskip("requests")
+    from rifa.pagos import ClienteMercadoPago
+    from rifa.stub_mp import iniciar_servidor as iniciar_stub
+    stub, estado_mp, url_mp = iniciar_stub()
+    almacen = AlmacenParticipantes(str(tmp_path / "rifa.db"))
+    for boleto in ("00001", "00002"):
+        almacen.insertar({"boleto": boleto, "nombre": f"Persona {boleto}", "estado_pago": "pendiente"})
+    cliente = ClienteMercadoPago("TEST-token", "Rifa", 1000, api_url=url_mp, rifa_id="norte")
+    procesador = ProcesadorPagos(almacen, cliente, hilos=2, reintentos=1, espera_reintento=0)
+    receptor, url = iniciar_servidor(procesador, secreto=SECRETO)
+    yield almacen, procesador, estado_mp, url
+    receptor.shutdown()
+    stub.shutdown()
+def notificar(url, payment_id, encabezados=None):
+    solicitud = urllib.request.Request(
+        f"{url}/webhook?data.id={payment_id}&type=payment",
+        data=json.dumps({"type": "payment", "action": "payment.updated", "data": {"id": str(payment_id)}}).encode(),
+        headers={"Content-Type": "application/json", **(encabezados or {})},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(solicitud, timeout=10) as respuesta:
+            return respuesta.status
+    except urllib.error.HTTPError as e:
+        return e.code
+def firmados(payment_id):
+    return {"x-signature": firma(str(payment_id)), "x-request-id": "solicitud-1"}
+def test_notificacion_sin_firma_valida_se_rechaza(entorno):
+    almacen, procesador, estado_mp, url = entorno
+    estado_mp.agregar_pago({"id": 501, "status": "approved", "external_reference": "norte:00001"})
+    assert notificar(url, 501) == 401
+    assert notificar(url, 501, {"x-signature": firma("502"), "x-request-id": "solicitud-1"}) == 401
+    procesador.esperar()
+    assert procesador.estado()["rechazados"] == 2
+    assert procesador.estado()["recibidos"] == 0
+    assert almacen.obtener("00001")["estado_pago"] == "pendiente"
+def test_pago_aprobado_marca_el_boleto(entorno):
+    almacen, procesador, estado_mp, url = entorno
+    estado_mp.agregar_pago({
+        "id": 601, "status": "approved", "external_reference": "norte:00001", "payment_method_id": "visa"
+    })
+    estado_mp.agregar_pago({"id": 602, "status": "pending", "external_reference": "norte:00002"})
+    estado_mp.agregar_pago({"id": 603, "status": "approved", "external_reference": "sur:00002"})
+    for payment_id in (601, 601, 602, 603):
+        assert notificar(url, payment_id, firmados(payment_id)) == 200
+    procesador.esperar()
+    pagado = almacen.obtener("00001")
+    assert pagado["estado_pago"] == "pagado"
+    assert pagado["id_pago_mp"] == "601" and pagado["metodo_pago"] == "visa"
+    # Pendiente en MP y pago de otra rifa: el boleto 00002 no cambia
+    assert almacen.obtener("00002")["estado_pago"] == "pendiente"
+    estado = procesador.estado()
+    assert (estado["recibidos"], estado["aprobados"], estado["errores"]) == (4, 1, 0)
+def test_pago_pendiente_que_luego_se_aprueba(entorno):
+    almacen, procesador, estado_mp, url = entorno
+    estado_mp.agregar_pago({"id": 701, "status": "pending", "external_reference": "norte:00002"})
+    assert notificar(url, 701, firmados(701)) == 200
+    procesador.esperar()
+    assert almacen.obtener("00002")["estado_pago"] == "pendiente"
+    # MP vuelve a notificar el mismo id cuando el pago cambia de estado
+    estado_mp.pagos["701"]["status"] = "approved"
+    assert notificar(url, 701, firmados(701)) == 200
+    procesador.esperar()
+    assert almacen.obtener("00002")["estado_pago"] == "pagado"
+    assert procesador.estado()["aprobados"] == 1
+def test_solo_se_agrupan_los_ids_que_esperan_en_la_cola(tmp_path):
+    procesador = ProcesadorPagos(AlmacenParticipantes(str(tmp_path / "rifa.db")), None, hilos=0)
+    assert procesador.encolar("801")
+    assert not procesador.encolar("801")
+    assert procesador.encolar("802")
+    assert procesador.estado()["duplicados"] == 1
+    assert procesador.pendientes() == 2
+def test_pago_inexistente_cuenta_como_error(entorno):
+    _, procesador, _, url = entorno
+    assert notificar(url, 999, firmados(999)) == 200
+    procesador.esperar()
+    assert procesador.estado()["errores"] == 1
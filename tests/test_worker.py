@@ -0,0 +1,65 @@
+import json
+import pytest
+from rifa import worker
+from rifa.cola import ColaTrabajos
+from rifa.config import cargar_configuracion, configuracion_desde_argumentos
+# ----------------------------
+# WORKER: CADA TRABAJO SE ENVÍA CON LA CONFIGURACIÓN DE SU RIFA
+# ----------------------------
+class DespachadorFalso:
+    def __init__(self, config):
+        self.remitente = config["SMTP_EMAIL"]
+        self.enviados = []
+    def enviar_lote(self, mensajes):
+        self.enviados.extend(mensajes)
+        return [(m, not m["destino"].startswith("falla"), "rechazado") for m in mensajes]
+@pytest.fixture
+def entorno(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "rifas.json").write_text(json.dumps([
+        {"id": "norte", "SMTP_EMAIL": "norte@ejemplo.com"},
+        {"id": "sur"},
+    ]), encoding="utf-8")
+    config = cargar_configuracion()
+    config.update({
+        "RIFAS_ARCHIVO": str(tmp_path / "rifas.json"),
+        "CARPETA_RIFAS": str(tmp_path / "rifas"),
+        "RUTA_COLA": str(tmp_path / "cola.db"),
+        "SMTP_EMAIL": "global@ejemplo.com",
+    })
+    creados = {}
+    def crear(config_rifa):
+        return creados.setdefault(config_rifa["RIFA_ID"], DespachadorFalso(config_rifa))
+    monkeypatch.setattr(worker, "crear_despachador", crear)
+    return config, creados
+def cola_de(config, rifa_id):
+    propia = configuracion_desde_argumentos(config, rifa_id)
+    return ColaTrabajos(propia["RUTA_COLA"], max_intentos=1, espacio=propia["COLA_ESPACIO"])
+def aviso(destino):
+    return {"destino": destino, "asunto": "Recordatorio", "cuerpo": "Hola"}
+def test_cada_rifa_usa_su_propio_smtp(entorno):
+    config, creados = entorno
+    cola_de(config, "norte").encolar("a", "email", aviso("ana@ejemplo.com"))
+    cola_de(config, "sur").encolar("a", "email", aviso("beto@ejemplo.com"))
+    cola_de(config, "norte").encolar("b", "email", aviso("falla@ejemplo.com"))
+    cola = ColaTrabajos(config["RUTA_COLA"])
+    assert worker.procesar_lote(cola, worker.despachadores_por_rifa(config)) == 3
+    assert creados["norte"].remitente == "norte@ejemplo.com"
+    assert creados["sur"].remitente == "global@ejemplo.com"
+    assert {m["destino"] for m in creados["norte"].enviados} == {"ana@ejemplo.com", "falla@ejemplo.com"}
+    assert [m["destino"] for m in creados["sur"].enviados] == ["beto@ejemplo.com"]
+    assert cola.resumen() == {"pendiente": 0, "en_curso": 0, "hecho": 2, "fallido": 1}
+def test_la_cola_de_una_rifa_solo_toma_sus_trabajos(entorno):
+    config, _ = entorno
+    norte, sur = cola_de(config, "norte"), cola_de(config, "sur")
+    norte.encolar("a", "email", aviso("ana@ejemplo.com"))
+    sur.encolar("a", "email", aviso("beto@ejemplo.com"))
+    tomados = norte.tomar()
+    assert [t["payload"]["rifa_id"] for t in tomados] == ["norte"]
+    assert [t["payload"]["destino"] for t in sur.tomar()] == ["beto@ejemplo.com"]
+def test_trabajos_sin_rifa_usan_la_configuracion_global(entorno):
+    config, creados = entorno
+    cola = ColaTrabajos(config["RUTA_COLA"])
+    cola.encolar("a", "email", aviso("ana@ejemplo.com"))
+    assert worker.procesar_lote(cola, worker.despachadores_por_rifa(config)) == 1
+    assert creados[""].remitente == "global@ejemplo.com"